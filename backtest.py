@@ -0,0 +1,314 @@
+"""
+Backtest della formula del Mostro sulle giornate passate.
+
+Le feature di ogni giocatore sono ricostruite con le sole partite precedenti
+(somme cumulative esclusive, niente look-ahead) e l'intera stagione viene
+valutata in blocco con operazioni vettoriali, senza ripetere la logica di run_app.
+
+Uso: python backtest.py storico/ --arbitri "Il Mostro 5.0.xlsx"
+"""
+import os
+import glob
+import argparse
+from contextlib import nullcontext
+from dataclasses import dataclass, asdict, field
+import numpy as np
+import pandas as pd
+
+from mostro_config import REFEREE_STATS, load_config, referee_severity
+from schema import apply_schema, referee_name_column
+from profiling import profile_session, profiling_enabled
+
+RESULT_COLUMNS = ['Giornata', 'Squadra', 'Player', 'Minuti', 'Gialli', 'Falli']
+
+
+@dataclass
+class FormulaParams:
+    """Parametri della formula del Mostro (valori predefiniti da mostro_config)."""
+    peso_rischio_90s: float
+    peso_rischio_falli: float
+    ritardo_max: float
+    media_partite_per_giallo: float
+    peso_arbitro_gialli: float
+    peso_arbitro_rossi: float
+    peso_arbitro_falli: float
+    base_arbitro_gialli: float
+    base_arbitro_rossi: float
+    base_arbitro_falli: float
+    fattore_arbitro_min: float
+    fattore_arbitro_max: float
+    cartellini_per_partita: float
+
+    @classmethod
+    def from_config(cls, config=None):
+        """Parametri del campionato configurato (load_config se `config` è None)."""
+        config = config or load_config()
+        arbitro = config.arbitro
+        return cls(
+            peso_rischio_90s=config.rischio.peso_rischio_90s,
+            peso_rischio_falli=config.rischio.peso_rischio_falli,
+            ritardo_max=config.rischio.ritardo_max,
+            media_partite_per_giallo=config.campionato.partite_per_giallo,
+            **{f'peso_arbitro_{k}': arbitro.pesi[k] for k in REFEREE_STATS},
+            **{f'base_arbitro_{k}': arbitro.base[k] for k in REFEREE_STATS},
+            fattore_arbitro_min=arbitro.fattore_min,
+            fattore_arbitro_max=arbitro.fattore_max,
+            cartellini_per_partita=config.campionato.cartellini_per_partita,
+        )
+
+    @property
+    def base_arbitro(self):
+        return np.array([getattr(self, f'base_arbitro_{k}') for k in REFEREE_STATS], dtype=float)
+
+    @property
+    def pesi_arbitro(self):
+        return np.array([getattr(self, f'peso_arbitro_{k}') for k in REFEREE_STATS], dtype=float)
+
+
+@dataclass
+class BacktestReport:
+    """Metriche del backtest."""
+    partite: int
+    righe_giocatore: int
+    hit_rate_top4: float
+    brier: float
+    brier_base: float
+    calibrazione: pd.DataFrame = field(repr=False)
+    per_stagione: pd.DataFrame = field(repr=False)
+
+    def to_dict(self):
+        data = asdict(self)
+        data['calibrazione'] = self.calibrazione.to_dict(orient='records')
+        data['per_stagione'] = self.per_stagione.to_dict(orient='records')
+        return data
+
+
+def load_results(path):
+    """Carica i risultati da CSV, Parquet o da una cartella (es. lo storico giornate)."""
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, '**', 'giornata_*.parquet'), recursive=True))
+        files += sorted(glob.glob(os.path.join(path, '**', '*.csv'), recursive=True))
+        frames = [pd.read_parquet(f) if f.endswith('.parquet') else pd.read_csv(f) for f in files]
+        if not frames:
+            raise ValueError(f"Nessun file di risultati trovato in '{path}'.")
+        return pd.concat(frames, ignore_index=True)
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def referee_factors(referees_data, params):
+    """Fattore di severità per arbitro (stessa formula di calculate_referee_factor), vettoriale."""
+    if referees_data is None or referees_data.empty:
+        return pd.Series(dtype=float)
+    referees_data = apply_schema(referees_data, 'referee')
+    ref_col = referee_name_column(referees_data)
+    if ref_col is None:
+        return pd.Series(dtype=float)
+
+    stat_columns = load_config().arbitro.stat_columns
+    stats = referees_data.reindex(columns=list(stat_columns)).apply(pd.to_numeric, errors='coerce')
+    severity = np.clip(
+        referee_severity(stats.to_numpy(dtype=float), params.base_arbitro, params.pesi_arbitro),
+        params.fattore_arbitro_min, params.fattore_arbitro_max
+    )
+    return pd.Series(severity, index=referees_data[ref_col].astype(str).str.strip())
+
+
+def prepare_features(results, referees_data=None, params=None):
+    """
+    Feature per riga giocatore-partita calcolate con le sole partite precedenti.
+    Restituisce un DataFrame con colonne numeriche pronte per `evaluate`.
+    """
+    params = params or FormulaParams.from_config()
+    missing = set(RESULT_COLUMNS) - set(results.columns)
+    if missing:
+        raise ValueError(f"Colonne mancanti nei risultati: {missing}")
+
+    df = results.copy()
+    if 'Stagione' not in df.columns:
+        df['Stagione'] = ''
+    for col in ['Avversario', 'Arbitro']:
+        if col not in df.columns:
+            df[col] = ''
+    df[['Stagione', 'Squadra', 'Player', 'Avversario', 'Arbitro']] = (
+        df[['Stagione', 'Squadra', 'Player', 'Avversario', 'Arbitro']].fillna('').astype(str).apply(lambda c: c.str.strip())
+    )
+    for col in ['Giornata', 'Minuti', 'Gialli', 'Falli']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    df = df.sort_values(['Stagione', 'Giornata'], kind='stable').reset_index(drop=True)
+    player = df.groupby(['Squadra', 'Player'], sort=False).ngroup()
+    booked = (df['Gialli'] > 0).astype(np.int64)
+
+    # Somme cumulative esclusive: solo le partite precedenti
+    grouped = df[['Minuti', 'Gialli', 'Falli']].groupby(player)
+    prior = grouped.cumsum() - df[['Minuti', 'Gialli', 'Falli']]
+    prior_90s = prior['Minuti'] / 90
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        risk_90s = np.where(prior_90s > 0, prior['Gialli'] / prior_90s, 0.0)
+        risk_fouls = np.where(prior['Falli'] > 0, prior['Gialli'] / prior['Falli'], 0.0)
+
+    # Ritardo come nel foglio: 90' giocati dall'ultimo giallo, prima della partita corrente.
+    # Le righe senza minuti (panchina) non azzerano e non aumentano il ritardo
+    booked_played = booked * (df['Minuti'] > 0)
+    yellows_before = booked_played.groupby(player).cumsum() - booked_played
+    nineties = df['Minuti'] / 90
+    since_yellow = nineties.groupby([player, yellows_before]).cumsum() - nineties
+
+    # Partita: coppia di squadre non ordinata nella stessa giornata (altrimenti la sola squadra)
+    home_away = np.where(
+        df['Avversario'] != '',
+        np.where(df['Squadra'] < df['Avversario'], df['Squadra'] + '|' + df['Avversario'], df['Avversario'] + '|' + df['Squadra']),
+        df['Squadra']
+    )
+    match = (df['Stagione'] + '|' + df['Giornata'].astype(int).astype(str) + '|' + home_away)
+
+    ref_map = referee_factors(referees_data, params)
+    ref_factor = df['Arbitro'].map(ref_map).fillna(1.0).to_numpy() if not ref_map.empty else np.ones(len(df))
+
+    return pd.DataFrame({
+        'Stagione': df['Stagione'],
+        'Giornata': df['Giornata'].astype(int),
+        'match_id': pd.factorize(match)[0],
+        'team_id': pd.factorize(df['Squadra'] + '|' + match)[0],
+        'Squadra': df['Squadra'],
+        'Player': df['Player'],
+        'rischio_90s': risk_90s,
+        'rischio_falli': risk_fouls,
+        'ritardo_90s': since_yellow.to_numpy(dtype=float),
+        'fattore_arbitro': ref_factor,
+        'ammonito': booked.to_numpy(),
+    })
+
+
+def score(features, params):
+    """
+    Rischio Finale e probabilità di ammonizione per ogni riga (vettoriale su tutte le partite).
+    `features` può essere il DataFrame di `prepare_features` o un dizionario di array.
+    """
+    # Stessa formula di calculate_enhanced_prediction: ritardo grezzo rispetto alla media di campionato
+    delay_ratio = np.clip(np.asarray(features['ritardo_90s']) / params.media_partite_per_giallo, 0, None)
+    delay_factor = np.minimum(1 + delay_ratio, params.ritardo_max)
+
+    ref_factor = np.asarray(features['fattore_arbitro'])
+    risk = (
+        np.asarray(features['rischio_90s']) * params.peso_rischio_90s +
+        np.asarray(features['rischio_falli']) * params.peso_rischio_falli
+    ) * delay_factor * ref_factor
+
+    # Probabilità: cartellini attesi della partita ripartiti in proporzione al rischio
+    match_id = np.asarray(features['match_id'])
+    match_risk = np.bincount(match_id, weights=risk)[match_id]
+    match_ref = np.bincount(match_id, weights=ref_factor)[match_id] / np.bincount(match_id)[match_id]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected_rate = np.where(match_risk > 0, risk / match_risk, 0.0) * params.cartellini_per_partita * match_ref
+    probability = 1.0 - np.exp(-expected_rate)
+    return risk, probability
+
+
+def _group_rank(groups, values):
+    """Posizione (1 = valore più alto) di ogni elemento all'interno del suo gruppo."""
+    n = len(values)
+    order = np.lexsort((-values, groups))
+    sorted_groups = groups[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_groups)) + 1]
+    position = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = position + 1
+    return rank
+
+
+def top4_mask(features, risk):
+    """Top 4 per partita con il vincolo del 3-1 (massimo 3 giocatori per squadra)."""
+    eligible = _group_rank(np.asarray(features['team_id']), risk) <= 3
+    # I non idonei finiscono in fondo alla classifica della partita
+    match_rank = _group_rank(np.asarray(features['match_id']), np.where(eligible, risk, -np.inf))
+    return eligible & (match_rank <= 4)
+
+
+def quick_metrics(features, params, valid):
+    """Brier score e hit rate del Top 4 sulle righe valide (per la ricerca dei parametri)."""
+    risk, probability = score(features, params)
+    booked = np.asarray(features['ammonito'])
+    picks = top4_mask(features, risk) & valid
+    brier = float(np.mean((probability[valid] - booked[valid]) ** 2))
+    hit_rate = float(booked[picks].mean()) if picks.any() else 0.0
+    return brier, hit_rate
+
+
+def valid_rows(features, warmup_rounds=3):
+    """Righe valutabili: escluse le prime giornate di ogni stagione (servono a costruire lo storico)."""
+    first_round = features.groupby('Stagione')['Giornata'].transform('min')
+    return (features['Giornata'] >= first_round + warmup_rounds).to_numpy()
+
+
+def evaluate(features, params=None, warmup_rounds=3, n_bins=10):
+    """Esegue il backtest: hit rate del Top 4, Brier score e calibrazione."""
+    params = params or FormulaParams.from_config()
+    risk, probability = score(features, params)
+
+    valid = valid_rows(features, warmup_rounds)
+
+    booked = features['ammonito'].to_numpy()
+    picks = top4_mask(features, risk) & valid
+
+    brier = float(np.mean((probability[valid] - booked[valid]) ** 2)) if valid.any() else float('nan')
+    base_rate = booked[valid].mean() if valid.any() else 0.0
+    brier_base = float(np.mean((base_rate - booked[valid]) ** 2)) if valid.any() else float('nan')
+
+    bins = np.minimum((probability[valid] * n_bins).astype(int), n_bins - 1)
+    calibration = pd.DataFrame({'bin': bins, 'p': probability[valid], 'ammonito': booked[valid]}).groupby('bin').agg(
+        prob_media=('p', 'mean'), frequenza=('ammonito', 'mean'), righe=('ammonito', 'size')
+    ).reset_index()
+
+    per_season = pd.DataFrame({
+        'Stagione': features['Stagione'][picks], 'ammonito': booked[picks]
+    }).groupby('Stagione').agg(hit_rate_top4=('ammonito', 'mean'), scelte=('ammonito', 'size')).reset_index()
+
+    return BacktestReport(
+        partite=int(features['match_id'][valid].nunique()),
+        righe_giocatore=int(valid.sum()),
+        hit_rate_top4=float(booked[picks].mean()) if picks.any() else float('nan'),
+        brier=brier,
+        brier_base=brier_base,
+        calibrazione=calibration,
+        per_stagione=per_season
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('risultati', help='File CSV/Parquet o cartella dei risultati per giornata')
+    parser.add_argument('--arbitri', help='Workbook o CSV con le statistiche arbitri')
+    parser.add_argument('--warmup', type=int, default=3, help='Giornate iniziali escluse dalla valutazione')
+    parser.add_argument('--profile', action='store_true', help="Profila il job (cProfile + tracemalloc) in 'profili/'")
+    args = parser.parse_args()
+
+    referees = None
+    if args.arbitri:
+        if args.arbitri.endswith('.csv'):
+            referees = pd.read_csv(args.arbitri)
+        else:
+            sheets = pd.read_excel(args.arbitri, sheet_name=None)
+            referees = next((df for name, df in sheets.items() if 'arbitri' in name.lower()), None)
+
+    profiler = profile_session('backtest', vars(args)) if args.profile or profiling_enabled() else nullcontext()
+    with profiler as run:
+        features = prepare_features(load_results(args.risultati), referees)
+        report = evaluate(features, warmup_rounds=args.warmup)
+    if run is not None:
+        print(f"Profilo salvato in '{run.paths['prof']}'")
+
+    print(f"Partite valutate: {report.partite} ({report.righe_giocatore} righe giocatore)")
+    print(f"Hit rate Top 4: {report.hit_rate_top4:.3f}")
+    print(f"Brier score: {report.brier:.4f} (base costante: {report.brier_base:.4f})")
+    print("\nCalibrazione:")
+    print(report.calibrazione.to_string(index=False))
+    print("\nPer stagione:")
+    print(report.per_stagione.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
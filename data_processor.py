@@ -1,9 +1,101 @@
 import pandas as pd
 import numpy as np
 import streamlit as st
+from dataclasses import dataclass, field
+from mostro_config import load_config
+
+# Colonne sommate nel riassunto, nell'ordine di DataSummary.totals
+SUMMARY_SUM_COLUMNS = ('Cartellini_Gialli', 'Cartellini_Rossi', 'Falli_Commessi')
+
+def _counts(values):
+    """Conteggio dei valori (escluso NaN) con factorize + bincount."""
+    codes, uniques = pd.factorize(values)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    return dict(zip(uniques.tolist(), counts.tolist()))
+
+def _add_counts(a, b, sign=1):
+    merged = dict(a)
+    for key, count in b.items():
+        merged[key] = merged.get(key, 0) + sign * count
+    return {key: count for key, count in merged.items() if count > 0}
+
+@dataclass
+class DataSummary:
+    """
+    Riassunto additivo dei dati giocatori: somme e conteggi, non medie.
+    Si calcola in una passata, si aggiorna con le righe aggiunte o con un foglio
+    ricaricato (sottraendo le righe vecchie) e si unisce tra partizioni con +.
+    """
+    rows: int = 0
+    age_sum: float = 0.0
+    age_count: int = 0
+    totals: np.ndarray = field(default_factory=lambda: np.zeros(len(SUMMARY_SUM_COLUMNS)))
+    team_rows: dict = field(default_factory=dict)
+    position_rows: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Tutte le statistiche in una passata vettoriale sul DataFrame."""
+        if df.empty:
+            return cls()
+        ages = pd.to_numeric(df['Età'], errors='coerce').to_numpy(dtype=float)
+        sums = df.reindex(columns=list(SUMMARY_SUM_COLUMNS)).to_numpy(dtype=float)
+        return cls(
+            rows=len(df),
+            age_sum=float(np.nansum(ages)),
+            age_count=int(np.count_nonzero(~np.isnan(ages))),
+            totals=np.nansum(sums, axis=0),
+            team_rows=_counts(df['Squadra']),
+            position_rows=_counts(df['Posizione'])
+        )
+
+    def _combine(self, other, sign):
+        return DataSummary(
+            rows=self.rows + sign * other.rows,
+            age_sum=self.age_sum + sign * other.age_sum,
+            age_count=self.age_count + sign * other.age_count,
+            totals=self.totals + sign * other.totals,
+            team_rows=_add_counts(self.team_rows, other.team_rows, sign),
+            position_rows=_add_counts(self.position_rows, other.position_rows, sign)
+        )
+
+    def __add__(self, other):
+        return self._combine(other, 1)
+
+    def __sub__(self, other):
+        return self._combine(other, -1)
+
+    def append(self, df_new_rows):
+        """Riassunto con le righe aggiunte."""
+        return self + DataSummary.from_frame(df_new_rows)
+
+    def replace(self, df_old_rows, df_new_rows):
+        """Riassunto dopo aver ricaricato un foglio: tolte le righe vecchie, aggiunte le nuove."""
+        return self - DataSummary.from_frame(df_old_rows) + DataSummary.from_frame(df_new_rows)
+
+    @classmethod
+    def merge(cls, summaries):
+        """Unione dei riassunti di più partizioni (es. campionati diversi)."""
+        merged = cls()
+        for summary in summaries:
+            merged = merged + summary
+        return merged
+
+    def to_dict(self):
+        yellow, red, fouls = self.totals.tolist()
+        return {
+            'total_players': self.rows,
+            'teams': len(self.team_rows),
+            'avg_age': self.age_sum / self.age_count if self.age_count else float('nan'),
+            'total_yellow_cards': yellow,
+            'total_red_cards': red,
+            'total_fouls': fouls,
+            'position_distribution': dict(sorted(self.position_rows.items(), key=lambda item: -item[1]))
+        }
 
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, config=None):
+        self.config = (config or load_config()).dati_giocatori
         self.required_columns = [
             'Nome', 'Squadra', 'Posizione', 'Età', 'Minuti_Giocati',
             'Cartellini_Gialli', 'Cartellini_Rossi', 'Falli_Commessi'
@@ -34,30 +126,20 @@ class DataProcessor:
     def _clean_data(self, df):
         """Pulisce e valida i dati"""
         # Rimuovi righe con valori mancanti critici
-        df = df.dropna(subset=['Nome', 'Squadra', 'Posizione'])
+        df = df.dropna(subset=list(self.config.colonne_obbligatorie)).copy()
         
         # Riempi valori mancanti numerici con 0
-        numeric_cols = ['Età', 'Minuti_Giocati', 'Cartellini_Gialli', 'Cartellini_Rossi', 'Falli_Commessi']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-        
-        # Validazione valori
-        df['Età'] = df['Età'].clip(16, 45)
-        df['Minuti_Giocati'] = df['Minuti_Giocati'].clip(0, 3500)
-        df['Cartellini_Gialli'] = df['Cartellini_Gialli'].clip(0, 20)
-        df['Cartellini_Rossi'] = df['Cartellini_Rossi'].clip(0, 5)
-        df['Falli_Commessi'] = df['Falli_Commessi'].clip(0, 150)
+        present = [i for i, col in enumerate(self.config.colonne_numeriche) if col in df.columns]
+        numeric_cols = [self.config.colonne_numeriche[i] for i in present]
+        df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce').fillna(0)
         
-        # Standardizza posizioni
-        position_mapping = {
-            'GK': 'Portiere', 'Goalkeeper': 'Portiere', 'Portiere': 'Portiere',
-            'DEF': 'Difensore', 'Defender': 'Difensore', 'Difensore': 'Difensore',
-            'MID': 'Centrocampista', 'Midfielder': 'Centrocampista', 'Centrocampista': 'Centrocampista',
-            'FWD': 'Attaccante', 'Forward': 'Attaccante', 'Attaccante': 'Attaccante'
-        }
+        # Validazione valori: limiti per colonna da mostro_config (solo colonne presenti), in un'unica operazione
+        df[numeric_cols] = np.clip(
+            df[numeric_cols].to_numpy(dtype=float), self.config.limiti_min[present], self.config.limiti_max[present]
+        )
         
-        df['Posizione'] = df['Posizione'].map(position_mapping).fillna('Centrocampista')
+        # Standardizza posizioni
+        df['Posizione'] = df['Posizione'].map(self.config.posizioni).fillna(self.config.posizione_predefinita)
         
         return df
     
@@ -153,15 +235,11 @@ class DataProcessor:
         export_df = export_df[column_order]
         return export_df.to_csv(index=False)
     
-    def get_data_summary(self, df):
-        """Restituisce un riassunto dei dati"""
-        summary = {
-            'total_players': len(df),
-            'teams': df['Squadra'].nunique(),
-            'avg_age': df['Età'].mean(),
-            'total_yellow_cards': df['Cartellini_Gialli'].sum(),
-            'total_red_cards': df['Cartellini_Rossi'].sum(),
-            'total_fouls': df['Falli_Commessi'].sum(),
-            'position_distribution': df['Posizione'].value_counts().to_dict()
-        }
-        return summary
\ No newline at end of file
+    def get_data_summary(self, df, summary=None):
+        """
+        Restituisce un riassunto dei dati.
+        Con `summary` (DataSummary già calcolato, es. aggiornato con append/replace) non rilegge df.
+        """
+        if summary is None:
+            summary = DataSummary.from_frame(df)
+        return summary.to_dict()
\ No newline at end of file
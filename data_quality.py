@@ -0,0 +1,122 @@
+"""
+Controllo qualità dei fogli al caricamento, prima del fillna(0).
+
+Per ogni foglio conta valori nulli, zeri, valori non numerici, fuori intervallo,
+giocatori/arbitri duplicati e colonne mancanti, con operazioni vettoriali su
+tutte le colonne controllate insieme. Ogni problema ha una gravità:
+'errore' (la predizione del giocatore è falsata), 'avviso' (viene usato un
+valore di ripiego) o 'info'.
+"""
+import json
+import numpy as np
+import pandas as pd
+
+from player_index import normalize_name
+from schema import PLAYER, POSITION, REFEREE_NAME
+
+SEVERITY_ORDER = {'errore': 0, 'avviso': 1, 'info': 2}
+MAX_EXAMPLES = 3
+
+# Regole per colonna: intervallo ammesso e gravità di nulli e zeri.
+# Medie per cartellino nulle o a zero diventano inf e poi rischio 0 in calculate_enhanced_prediction.
+TEAM_RULES = {
+    'Media 90s per Cartellino Totale': {'range': (0, 200), 'nulli': 'errore', 'zeri': 'errore'},
+    'Media Falli per Cartellino Totale': {'range': (0, 500), 'nulli': 'errore', 'zeri': 'errore'},
+    'Ritardo Cartellino (Partite)': {'range': (0, 100), 'nulli': 'avviso', 'zeri': None},
+    'Cartellini Gialli Totali': {'range': (0, 300), 'nulli': 'avviso', 'zeri': None},
+    '90s Giocati Totali': {'range': (0, 1500), 'nulli': 'avviso', 'zeri': 'info'},
+    'Falli Fatti Totali': {'range': (0, 3000), 'nulli': 'avviso', 'zeri': None},
+}
+TEAM_REQUIRED = {PLAYER: 'errore', POSITION: 'errore', 'Ritardo Cartellino (Partite)': 'avviso'}
+
+# Statistiche arbitro nulle o a zero: si usa la media di riferimento
+REFEREE_RULES = {
+    'Gialli a partita': {'range': (0, 15), 'nulli': 'avviso', 'zeri': 'avviso'},
+    'Rossi a partita': {'range': (0, 3), 'nulli': 'avviso', 'zeri': 'info'},
+    'Falli a partita': {'range': (0, 60), 'nulli': 'avviso', 'zeri': 'avviso'},
+}
+REFEREE_REQUIRED = {REFEREE_NAME: 'errore', 'Gialli a partita': 'avviso'}
+
+
+def _issue(sheet, column, problem, mask, severity, labels):
+    """Problema con conteggio ed esempi (None se la maschera è vuota)."""
+    count = int(mask.sum())
+    if count == 0 or severity is None:
+        return None
+    examples = [str(v) for v in labels[mask][:MAX_EXAMPLES]] if labels is not None else []
+    return {'foglio': sheet, 'colonna': column, 'problema': problem, 'righe': count,
+            'gravita': severity, 'esempi': examples}
+
+
+def check_sheet(sheet, df, kind):
+    """
+    Problemi di un foglio con intestazioni canoniche e valori non ancora riempiti.
+    kind: 'team' o 'referee'. Restituisce una lista di dizionari.
+    """
+    rules, required, name_col = (
+        (TEAM_RULES, TEAM_REQUIRED, PLAYER) if kind == 'team'
+        else (REFEREE_RULES, REFEREE_REQUIRED, REFEREE_NAME)
+    )
+    issues = [
+        {'foglio': sheet, 'colonna': col, 'problema': 'colonna mancante', 'righe': len(df),
+         'gravita': severity, 'esempi': []}
+        for col, severity in required.items() if col not in df.columns
+    ]
+    labels = df[name_col].astype(str).to_numpy() if name_col in df.columns else None
+
+    columns = [col for col in rules if col in df.columns]
+    if columns:
+        raw = df[columns]
+        values = raw.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        null = raw.isna().to_numpy()
+        not_numeric = np.isnan(values) & ~null
+        zero = values == 0
+        lower = np.array([rules[col]['range'][0] for col in columns], dtype=float)
+        upper = np.array([rules[col]['range'][1] for col in columns], dtype=float)
+        with np.errstate(invalid='ignore'):
+            out_of_range = (values < lower) | (values > upper)
+
+        for j, col in enumerate(columns):
+            rule = rules[col]
+            issues += [
+                _issue(sheet, col, 'nulli', null[:, j], rule['nulli'], labels),
+                _issue(sheet, col, 'non numerici', not_numeric[:, j], 'errore', labels),
+                _issue(sheet, col, 'zeri', zero[:, j], rule['zeri'], labels),
+                _issue(sheet, col, 'fuori intervallo', out_of_range[:, j], 'avviso', labels),
+            ]
+
+    if labels is not None:
+        keys = pd.Series([normalize_name(v) for v in labels])
+        issues.append(_issue(sheet, name_col, 'duplicati', keys.duplicated(keep=False).to_numpy(), 'avviso', labels))
+        issues.append(_issue(sheet, name_col, 'nulli', df[name_col].isna().to_numpy(), 'avviso', None))
+
+    return [issue for issue in issues if issue is not None]
+
+
+def report_frame(report):
+    """Rapporto {foglio: [problemi]} come DataFrame ordinato per gravità."""
+    rows = [issue for issues in report.values() for issue in issues]
+    if not rows:
+        return pd.DataFrame(columns=['foglio', 'colonna', 'problema', 'righe', 'gravita', 'esempi'])
+    df = pd.DataFrame(rows)
+    df['esempi'] = df['esempi'].map(', '.join)
+    order = df['gravita'].map(SEVERITY_ORDER)
+    return df.assign(_ordine=order).sort_values(['_ordine', 'foglio', 'colonna']).drop(columns='_ordine').reset_index(drop=True)
+
+
+def severity_counts(report):
+    """Numero di problemi per gravità."""
+    counts = dict.fromkeys(SEVERITY_ORDER, 0)
+    for issues in report.values():
+        for issue in issues:
+            counts[issue['gravita']] += 1
+    return counts
+
+
+def report_json(report, data_version=None):
+    """Rapporto in JSON (per il download o l'archiviazione)."""
+    return json.dumps({
+        'data_version': data_version,
+        'riepilogo': severity_counts(report),
+        'fogli': report,
+    }, indent=2, ensure_ascii=False)
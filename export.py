@@ -0,0 +1,178 @@
+"""
+Esportazione delle predizioni di una giornata (una o più partite).
+
+Le partite arrivano da un iteratore e vengono scritte una alla volta:
+- XLSX con un foglio per partita più un foglio di riepilogo; in modalità
+  streaming (openpyxl write_only) le righe finiscono subito su disco e la
+  memoria non cresce con il numero di partite;
+- Parquet (un row group per partita) e CSV compresso (.csv.gz), con tutte
+  le partite in un'unica tabella e la colonna 'Partita'.
+"""
+import re
+import gzip
+from dataclasses import dataclass
+import pandas as pd
+
+# Colonne della classifica esportate (nomi di calculate_enhanced_prediction)
+EXPORT_COLUMNS = [
+    'Player', 'Squadra', 'Pos', 'Quota (%)', 'Percentile Lega', 'Rischio Finale',
+    'Media 90s/Giallo', 'Media Falli/Giallo', 'Ritardo (Partite)', 'Gialli Tot.'
+]
+SUMMARY_COLUMNS = [
+    'Partita', 'Arbitro', 'Fattore Arbitro', 'Severità', 'Giocatori',
+    'Top 4', 'Rischio Medio Top 4', 'Avviso'
+]
+EXPORT_FORMATS = ('xlsx', 'parquet', 'csv.gz')
+SUMMARY_SHEET = 'Riepilogo'
+
+
+@dataclass
+class FixtureExport:
+    """Predizione di una partita pronta per l'esportazione."""
+    home: str
+    away: str
+    referee: str
+    ref_factor: float
+    ref_category: str
+    df_prediction: pd.DataFrame
+    top4_index: pd.Index
+    error_msg: str = None
+
+    @property
+    def label(self):
+        return f"{self.home} - {self.away}"
+
+    def rows(self):
+        """Classifica della partita con le colonne di esportazione (righe del Top 4 segnate)."""
+        df = self.df_prediction.reindex(columns=EXPORT_COLUMNS)
+        return pd.concat([
+            pd.DataFrame({
+                'Partita': self.label,
+                'Arbitro': str(self.referee),
+                'Fattore Arbitro': float(self.ref_factor),
+                'Severità': str(self.ref_category),
+                'Top 4': df.index.isin(self.top4_index),
+            }, index=df.index),
+            df
+        ], axis=1).reset_index(drop=True)
+
+    def summary(self):
+        top4 = self.df_prediction.loc[self.df_prediction.index.intersection(self.top4_index)]
+        return {
+            'Partita': self.label,
+            'Arbitro': str(self.referee),
+            'Fattore Arbitro': float(self.ref_factor),
+            'Severità': str(self.ref_category),
+            'Giocatori': len(self.df_prediction),
+            'Top 4': ', '.join(top4.get('Player', pd.Series(dtype=str)).astype(str)),
+            'Rischio Medio Top 4': float(top4['Rischio Finale'].mean()) if not top4.empty else None,
+            'Avviso': self.error_msg or '',
+        }
+
+
+def _sheet_title(label, used):
+    """Nome di foglio Excel valido (max 31 caratteri, senza []:*?/\\) e non ripetuto."""
+    title = re.sub(r'[\[\]:*?/\\]', ' ', label).strip()[:31] or 'Partita'
+    base, n = title, 2
+    while title.lower() in used:
+        suffix = f" ({n})"
+        title = base[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(title.lower())
+    return title
+
+
+def _excel_values(df):
+    """Righe con None al posto di NaN e tipi Python (per openpyxl)."""
+    values = df.astype(object).where(df.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+def export_xlsx(fixtures, path, streaming=True):
+    """
+    Un foglio per partita più il riepilogo (primo foglio).
+    streaming=True usa openpyxl in write_only: memoria costante rispetto al numero di partite.
+    Restituisce il numero di partite esportate.
+    """
+    used = {SUMMARY_SHEET.lower()}
+    count = 0
+
+    if not streaming:
+        summaries = []
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            pd.DataFrame(columns=SUMMARY_COLUMNS).to_excel(writer, sheet_name=SUMMARY_SHEET, index=False)
+            for fixture in fixtures:
+                fixture.rows().to_excel(writer, sheet_name=_sheet_title(fixture.label, used), index=False)
+                summaries.append(fixture.summary())
+                count += 1
+            pd.DataFrame(summaries, columns=SUMMARY_COLUMNS).to_excel(writer, sheet_name=SUMMARY_SHEET, index=False)
+        return count
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    summary_sheet = workbook.create_sheet(SUMMARY_SHEET)
+    summary_sheet.append(SUMMARY_COLUMNS)
+    for fixture in fixtures:
+        sheet = workbook.create_sheet(_sheet_title(fixture.label, used))
+        rows = fixture.rows()
+        sheet.append(list(rows.columns))
+        for row in _excel_values(rows):
+            sheet.append(row)
+        summary = fixture.summary()
+        summary_sheet.append([summary[col] for col in SUMMARY_COLUMNS])
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def export_parquet(fixtures, path):
+    """Tutte le partite in un file Parquet, un row group per partita."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    count = 0
+    try:
+        for fixture in fixtures:
+            rows = fixture.rows()
+            for col in ('Player', 'Squadra', 'Pos'):
+                rows[col] = rows[col].astype(str)
+            if writer is None:
+                table = pa.Table.from_pandas(rows, preserve_index=False)
+                # Colonne numeriche sempre float: una partita con soli interi non deve cambiare lo schema
+                schema = pa.schema([
+                    pa.field(f.name, pa.float64()) if pa.types.is_integer(f.type) else f
+                    for f in table.schema
+                ]).remove_metadata()
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.Table.from_pandas(rows, schema=writer.schema, preserve_index=False))
+            count += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def export_csv_gz(fixtures, path):
+    """Tutte le partite in un CSV compresso con gzip, scritto una partita alla volta."""
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        for fixture in fixtures:
+            fixture.rows().to_csv(f, index=False, header=count == 0)
+            count += 1
+    return count
+
+
+EXPORTERS = {
+    'xlsx': export_xlsx,
+    'parquet': export_parquet,
+    'csv.gz': export_csv_gz,
+}
+
+
+def export_round(fixtures, path, fmt='xlsx'):
+    """Esporta le partite nel formato richiesto; restituisce il numero di partite scritte."""
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Formato di esportazione non supportato: {fmt}")
+    return EXPORTERS[fmt](fixtures, path)
@@ -0,0 +1,100 @@
+"""
+Feature store del modello cartellini.
+
+Le feature di base (tassi per 90', fattori età e posizione, indice di
+aggressività, trend recente) dipendono solo dai dati dei giocatori e dallo
+storico: vengono calcolate una volta per versione dei dati e insieme di righe
+in una tabella di sole colonne float64, allineata all'indice del DataFrame di origine.
+Punteggi e addestramento leggono la tabella per riferimento: non va modificata.
+"""
+from collections import OrderedDict
+import hashlib
+import numpy as np
+import pandas as pd
+
+from shared_store import frame_version
+
+RATE_COLUMNS = ('Falli_per_90min', 'Gialli_per_90min', 'Rossi_per_90min')
+FEATURE_COLUMNS = RATE_COLUMNS + ('Fattore_Eta', 'Fattore_Posizione', 'Indice_Aggressivita', 'Trend_Recente')
+SOURCE_COLUMNS = ('Falli_Commessi', 'Cartellini_Gialli', 'Cartellini_Rossi')
+IDENTITY_COLUMNS = ('Squadra', 'Nome')
+
+
+def row_identity(df):
+    """Hash delle righe di df (indice, squadra e nome): distingue sottoinsiemi della stessa versione dati."""
+    columns = [column for column in IDENTITY_COLUMNS if column in df.columns]
+    hashes = pd.util.hash_pandas_object(df[columns], index=True).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:16]
+
+
+class PlayerFeatureStore:
+    """Tabelle di feature per versione dei dati e righe (LRU), condivise tra predizione e addestramento."""
+
+    def __init__(self, config, history=None, max_versions=4):
+        self.config = config # ModelloCartelliniConfig
+        self.history = history
+        self.max_versions = max_versions
+        self._tables = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def _key(self, df, version):
+        history_version = self.history.version if self.history is not None and not self.history.is_empty else None
+        # La versione identifica i dati, non le righe: squadre diverse dello stesso snapshot condividono la versione
+        return (version or frame_version(df), row_identity(df), history_version)
+
+    def features(self, df, version=None):
+        """
+        Tabella delle feature per df. `version` identifica i dati (es. data_version dello snapshot);
+        se manca si usa l'hash del contenuto.
+        """
+        key = self._key(df, version)
+        table = self._tables.get(key)
+        if table is not None:
+            self._tables.move_to_end(key)
+            self.stats['hits'] += 1
+            return table
+
+        self.stats['misses'] += 1
+        table = self._compute(df)
+        self._tables[key] = table
+        while len(self._tables) > self.max_versions:
+            self._tables.popitem(last=False)
+        return table
+
+    def _compute(self, df):
+        """Tutte le feature con operazioni sulle sole colonne necessarie, senza copiare il DataFrame."""
+        minutes = pd.to_numeric(df['Minuti_Giocati'], errors='coerce').to_numpy(dtype=float)
+        counts = df[list(SOURCE_COLUMNS)].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+        # Normalizzazione per minuti giocati; senza minuti (o con valori mancanti) il tasso è 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = counts / minutes[:, None] * 90
+        rates = np.where(np.isfinite(rates), rates, 0.0)
+
+        # Fattore età (giocatori giovani e vecchi più inclini ai cartellini); età mancante = 0
+        ages = np.nan_to_num(pd.to_numeric(df['Età'], errors='coerce').to_numpy(dtype=float), nan=0.0)
+        age_factor = np.where(
+            (ages < self.config.eta_giovane) | (ages > self.config.eta_esperto), self.config.fattore_eta, 1.0
+        )
+
+        position_factor = df['Posizione'].map(self.config.rischio_posizione).fillna(1.0).to_numpy(dtype=float)
+        aggression = rates @ self.config.pesi_aggressivita_array
+
+        # Trend recente: ultime 5 partite rispetto a tutto lo storico (neutro senza storico)
+        if self.history is not None and not self.history.is_empty:
+            trend = self.history.trend_factor(df['Squadra'], df['Nome'], window=5)
+        else:
+            trend = np.ones(len(df))
+        trend = np.clip(np.asarray(trend, dtype=float), 0.5, 1.5)
+
+        return pd.DataFrame(
+            np.column_stack([rates, age_factor, position_factor, aggression, trend]),
+            index=df.index, columns=list(FEATURE_COLUMNS), dtype=np.float64
+        )
+
+    def training_matrix(self, df, version=None):
+        """Matrice (giocatori × feature) per l'addestramento, nell'ordine di FEATURE_COLUMNS."""
+        return self.features(df, version).to_numpy()
+
+    def clear(self):
+        self._tables.clear()
@@ -0,0 +1,223 @@
+"""
+Archivio partizionato dei dati di campionato: lega / stagione / squadra.
+
+Ogni partizione (lega, stagione) è una cartella con un file Parquet per squadra,
+il file degli arbitri e un manifest JSON con le versioni dei fogli. All'apertura
+si leggono solo il manifest e la colonna dei nomi giocatori; i fogli squadra
+vengono caricati alla prima richiesta. Memoria e tempo di avvio dipendono quindi
+dalle squadre effettivamente usate, non dalla dimensione dell'archivio.
+
+Uso: python league_store.py "Il Mostro 5.0.xlsx" --lega "Serie A" --stagione 2025-26
+"""
+import os
+import glob
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections.abc import Mapping
+import pandas as pd
+
+from player_index import PlayerIndex, normalize_name
+from shared_store import frame_version
+
+ARCHIVE_DIR = 'archivio'
+MANIFEST_FILE = '_manifest.json'
+REFEREES_FILE = 'arbitri.parquet'
+TEAMS_DIR = 'squadre'
+
+
+def partition_slug(name):
+    """Nome di cartella/file sicuro e stabile per lega, stagione o squadra."""
+    return normalize_name(name).replace(' ', '_') or '_'
+
+
+def _parquet_ready(df):
+    """Colonne object con tipi misti (es. 0 e testo dopo fillna) convertite in stringhe per Parquet."""
+    df = df.reset_index(drop=True)
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].astype(str)
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+
+def _write_parquet(df, path):
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+class LazyTeamFrames(Mapping):
+    """
+    Fogli squadra di una partizione, letti dal disco al primo accesso.
+    Thread-safe: più sessioni possono condividere la stessa istanza.
+    """
+
+    def __init__(self, paths, player_ids):
+        self._paths = dict(paths)
+        self._player_ids = dict(player_ids)
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, team):
+        frame = self._frames.get(team)
+        if frame is not None:
+            return frame
+        path = self._paths[team]
+        with self._lock:
+            if team not in self._frames:
+                df = pd.read_parquet(path)
+                df['player_id'] = self._player_ids[team]
+                self._frames[team] = df
+            return self._frames[team]
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, team):
+        return team in self._paths
+
+    @property
+    def loaded(self):
+        """Squadre già lette dal disco."""
+        return sorted(self._frames)
+
+
+class LeagueArchive:
+    """Archivio su disco delle partizioni (lega, stagione)."""
+
+    def __init__(self, base_dir=ARCHIVE_DIR):
+        self.base_dir = base_dir
+
+    def partition_dir(self, league, season):
+        return os.path.join(self.base_dir, partition_slug(league), partition_slug(season))
+
+    def manifest(self, league, season):
+        """Manifest della partizione o None se non esiste."""
+        path = os.path.join(self.partition_dir(league, season), MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def partitions(self):
+        """Elenco ordinato delle partizioni presenti: [(lega, stagione), ...]."""
+        found = []
+        for path in glob.glob(os.path.join(self.base_dir, '*', '*', MANIFEST_FILE)):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    manifest = json.load(f)
+                found.append((manifest['lega'], manifest['stagione']))
+            except (OSError, ValueError, KeyError):
+                continue
+        return sorted(found)
+
+    def leagues(self):
+        return sorted({league for league, _ in self.partitions()})
+
+    def seasons(self, league):
+        return sorted(season for lg, season in self.partitions() if lg == league)
+
+    def write_partition(self, league, season, teams_data, referees_data=None, source=None, quality_report=None):
+        """
+        Scrive (o sostituisce) una partizione: un file Parquet per squadra più gli arbitri.
+        I file di squadre non più presenti vengono rimossi. Restituisce il manifest.
+        """
+        if not teams_data:
+            raise ValueError("Nessuna squadra da archiviare.")
+        part_dir = self.partition_dir(league, season)
+        teams_dir = os.path.join(part_dir, TEAMS_DIR)
+        os.makedirs(teams_dir, exist_ok=True)
+
+        teams = {}
+        for team in sorted(teams_data):
+            df = _parquet_ready(teams_data[team].drop(columns=['player_id'], errors='ignore'))
+            filename = f"{partition_slug(team)}.parquet"
+            if any(entry['file'] == filename for entry in teams.values()):
+                filename = f"{partition_slug(team)}_{len(teams)}.parquet"
+            _write_parquet(df, os.path.join(teams_dir, filename))
+            teams[team] = {'file': filename, 'versione': frame_version(df), 'righe': len(df)}
+
+        for path in glob.glob(os.path.join(teams_dir, '*.parquet')):
+            if os.path.basename(path) not in {entry['file'] for entry in teams.values()}:
+                os.remove(path)
+
+        referees_version = ''
+        referees_path = os.path.join(part_dir, REFEREES_FILE)
+        if referees_data is not None and not referees_data.empty:
+            referees = _parquet_ready(referees_data)
+            _write_parquet(referees, referees_path)
+            referees_version = frame_version(referees)
+        elif os.path.exists(referees_path):
+            os.remove(referees_path)
+
+        versions = sorted(entry['versione'] for entry in teams.values()) + [referees_version]
+        manifest = {
+            'lega': str(league),
+            'stagione': str(season),
+            'versione': hashlib.sha1('|'.join(versions).encode('utf-8')).hexdigest()[:16],
+            'squadre': teams,
+            'arbitri': referees_version,
+            'sorgente': source,
+            'qualita': dict(quality_report or {}),
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        tmp_path = os.path.join(part_dir, f"{MANIFEST_FILE}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(part_dir, MANIFEST_FILE))
+        return manifest
+
+    def open_partition(self, league, season, name_column='Player'):
+        """
+        Apre una partizione senza leggere i fogli squadra.
+        Restituisce (manifest, squadre_lazy, arbitri, player_index): l'indice giocatori
+        è costruito leggendo dal Parquet la sola colonna dei nomi.
+        """
+        manifest = self.manifest(league, season)
+        if manifest is None:
+            raise ValueError(f"Partizione non trovata: {league} {season}")
+        part_dir = self.partition_dir(league, season)
+
+        paths = {}
+        player_ids = {}
+        player_index = PlayerIndex()
+        for team in sorted(manifest['squadre']):
+            path = os.path.join(part_dir, TEAMS_DIR, manifest['squadre'][team]['file'])
+            names = pd.read_parquet(path, columns=[name_column])[name_column]
+            paths[team] = path
+            player_ids[team] = player_index.add_team(team, names)
+
+        referees_path = os.path.join(part_dir, REFEREES_FILE)
+        referees = pd.read_parquet(referees_path) if os.path.exists(referees_path) else pd.DataFrame()
+        return manifest, LazyTeamFrames(paths, player_ids), referees, player_index
+
+
+def main():
+    from mostrominimal import EnhancedMostroPredictor
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('workbook', help='Workbook del Mostro da archiviare')
+    parser.add_argument('--lega', required=True)
+    parser.add_argument('--stagione', required=True)
+    parser.add_argument('--archivio', default=ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    predictor = EnhancedMostroPredictor()
+    sheets = predictor.parse_workbook_sheets(args.workbook, pd.ExcelFile(args.workbook).sheet_names)
+    teams_data = {name: df for name, (kind, df) in sheets.items() if kind == 'team'}
+    referees = next((df for kind, df in sheets.values() if kind == 'referee'), None)
+
+    manifest = LeagueArchive(args.archivio).write_partition(
+        args.lega, args.stagione, teams_data, referees, source=os.path.basename(args.workbook)
+    )
+    print(f"Partizione {manifest['lega']} {manifest['stagione']}: {len(manifest['squadre'])} squadre "
+          f"(versione {manifest['versione']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Formazioni probabili di una giornata (CSV: Squadra, Player, Minuti Attesi).
+
+I giocatori vengono risolti una volta sola sugli ID di PlayerIndex; durante la
+predizione pesi e maschera si ottengono con un'unica lettura vettoriale
+sull'array dei minuti attesi indicizzato per ID. Per le squadre presenti nel
+file i giocatori non elencati (infortunati, squalificati, panchina lunga)
+hanno 0 minuti e vengono esclusi; le squadre assenti dal file restano invariate.
+"""
+import numpy as np
+import pandas as pd
+
+from player_index import normalize_name
+from schema import PLAYER, TEAM, apply_schema
+from shared_store import frame_version
+
+EXPECTED_MINUTES = 'Minuti Attesi'
+FULL_MATCH_MINUTES = 90.0
+
+
+class ProbableLineups:
+    """Minuti attesi per ID giocatore e squadre coperte dal file delle formazioni."""
+
+    def __init__(self, minutes_by_id, covered_teams, unmatched=(), version=''):
+        self.minutes_by_id = minutes_by_id
+        self.covered_teams = frozenset(covered_teams)
+        self.unmatched = list(unmatched)
+        self.version = version
+
+    @classmethod
+    def from_frame(cls, df_lineup, player_index):
+        """Formazioni da un DataFrame; i nomi sono risolti con PlayerIndex (accenti e maiuscole ignorati)."""
+        df = apply_schema(df_lineup, 'lineups')
+        missing = [col for col in (TEAM, PLAYER) if col not in df.columns]
+        if missing:
+            raise ValueError(f"Colonne mancanti nelle formazioni: {missing}")
+        df = df.dropna(subset=[TEAM, PLAYER])
+        if df.empty:
+            raise ValueError("Il file delle formazioni non contiene righe valide.")
+
+        if EXPECTED_MINUTES in df.columns:
+            minutes = pd.to_numeric(df[EXPECTED_MINUTES], errors='coerce').fillna(FULL_MATCH_MINUTES)
+        else:
+            minutes = pd.Series(FULL_MATCH_MINUTES, index=df.index)
+        minutes = minutes.clip(0, FULL_MATCH_MINUTES).to_numpy(dtype=float)
+
+        ids = player_index.lookup_many(df[TEAM], df[PLAYER])
+        known = ids >= 0
+        # Ultima cella per l'ID -1: giocatore sconosciuto, nessun minuto dichiarato
+        minutes_by_id = np.full(len(player_index) + 1, np.nan)
+        minutes_by_id[ids[known]] = minutes[known]
+
+        unmatched = [f"{player} ({team})" for team, player in zip(df[TEAM][~known], df[PLAYER][~known])]
+        covered_teams = {normalize_name(team) for team in df[TEAM]}
+        return cls(minutes_by_id, covered_teams, unmatched, frame_version(df[[TEAM, PLAYER]].assign(_min=minutes)))
+
+    @classmethod
+    def from_csv(cls, file, player_index):
+        return cls.from_frame(pd.read_csv(file), player_index)
+
+    def expected_minutes(self, player_ids, teams):
+        """Minuti attesi per giocatore: dal file, 0 se la squadra è coperta ma il giocatore manca, 90 altrimenti."""
+        ids = pd.Series(player_ids).fillna(-1).to_numpy(dtype=np.int64)
+        ids = np.where((ids >= 0) & (ids < len(self.minutes_by_id) - 1), ids, -1)
+        minutes = self.minutes_by_id[ids]
+        team_codes, team_names = pd.factorize(np.asarray(teams))
+        covered = np.array([normalize_name(team) in self.covered_teams for team in team_names] + [False])
+        is_covered = covered[team_codes]
+        return np.where(is_covered, np.nan_to_num(minutes, nan=0.0), FULL_MATCH_MINUTES)
+
+    def weights(self, player_ids, teams):
+        """Peso del rischio per minuti attesi (0 = fuori formazione, 1 = partita intera)."""
+        return self.expected_minutes(player_ids, teams) / FULL_MATCH_MINUTES
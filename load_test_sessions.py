@@ -0,0 +1,94 @@
+"""
+Test di carico simulato per sessioni Streamlit concorrenti.
+
+Confronta il comportamento per-sessione (ogni sessione carica il workbook e
+ricalcola le predizioni) con lo snapshot e la cache risultati condivisi
+(SharedDataStore). Le sessioni restano vive fino alla fine, come su un server reale.
+
+Uso: python load_test_sessions.py --sessions 20
+"""
+import argparse
+import time
+import tracemalloc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from mostrominimal import EnhancedMostroPredictor, load_workbook_snapshot
+from schema import referee_name_column
+from shared_store import SharedDataStore
+from state_store import make_fixture_key
+
+
+def _pick_fixture(predictor, session_id):
+    """Partita e arbitro deterministici per sessione (poche partite, molte sessioni)."""
+    teams = sorted(predictor.teams_data.keys())
+    referee_col = referee_name_column(predictor.referees_data)
+    referees = sorted(predictor.referees_data[referee_col].unique()) if referee_col else ['Arbitro Non Caricato']
+    home = teams[session_id % 3]
+    away = teams[-1 - (session_id % 3)]
+    return home, away, referees[session_id % len(referees)]
+
+
+def run_isolated_session(session_id, live_sessions, lock):
+    """Sessione senza condivisione: carica tutto e ricalcola."""
+    start = time.perf_counter()
+    predictor = EnhancedMostroPredictor()
+    predictor.auto_load_excel_data()
+    home, away, referee = _pick_fixture(predictor, session_id)
+    result = predictor.predict_fixture(home, away, referee)
+    with lock:
+        live_sessions.append((predictor, result))
+    return time.perf_counter() - start
+
+
+def run_shared_session(session_id, live_sessions, lock, store):
+    """Sessione con snapshot e cache risultati condivisi."""
+    start = time.perf_counter()
+    predictor = EnhancedMostroPredictor()
+    predictor.attach_snapshot(store.get_snapshot(load_workbook_snapshot))
+    home, away, referee = _pick_fixture(predictor, session_id)
+    fixture_key = make_fixture_key(home, away, referee)
+    result = store.get_result(predictor.data_version, fixture_key)
+    if result is None:
+        result = predictor.predict_fixture(home, away, referee)
+        store.put_result(predictor.data_version, fixture_key, result)
+    with lock:
+        live_sessions.append((predictor, result))
+    return time.perf_counter() - start
+
+
+def measure(label, n_sessions, workers, session_fn, *args):
+    live_sessions = []
+    lock = threading.Lock()
+
+    tracemalloc.start()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(lambda i: session_fn(i, live_sessions, lock, *args), range(n_sessions)))
+    wall = time.perf_counter() - wall_start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies) * 1000
+    print(
+        f"{label:<12} sessioni={n_sessions:<4} "
+        f"memoria viva={current / 1e6:8.1f} MB  picco={peak / 1e6:8.1f} MB  "
+        f"latenza p50={np.percentile(latencies, 50):8.1f} ms  p95={np.percentile(latencies, 95):8.1f} ms  "
+        f"totale={wall:6.2f} s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=20, help='Numero di sessioni simulate')
+    parser.add_argument('--workers', type=int, default=8, help='Sessioni eseguite in parallelo')
+    args = parser.parse_args()
+
+    measure('per-sessione', args.sessions, args.workers, run_isolated_session)
+    measure('condiviso', args.sessions, args.workers, run_shared_session, SharedDataStore())
+
+
+if __name__ == '__main__':
+    main()
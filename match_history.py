@@ -0,0 +1,331 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+
+# Colonne dello storico: una riga per giocatore per giornata
+HISTORY_KEY_COLUMNS = ['Giornata', 'Data', 'Squadra', 'Player']
+HISTORY_STAT_COLUMNS = ['Minuti', 'Gialli', 'Rossi', 'Falli']
+HISTORY_OPTIONAL_COLUMNS = ['Avversario', 'Arbitro']
+
+# Finestre mobili (ultime N partite del giocatore)
+ROLLING_WINDOWS = (3, 5, 10)
+
+ROUND_FILE_PATTERN = 'giornata_{:04d}.parquet'
+CHECKPOINT_FILE = '_stato.npz'
+SUMMARY_FILE = '_riepilogo.parquet'
+
+
+def round_files(base_dir):
+    """Restituisce {giornata: percorso} dei file presenti su disco."""
+    files = {}
+    for path in glob.glob(os.path.join(base_dir, 'giornata_*.parquet')):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        try:
+            files[int(stem.split('_')[1])] = path
+        except (IndexError, ValueError):
+            continue
+    return files
+
+
+def stored_rounds(base_dir='storico'):
+    """Giornate salvate su disco, ordinate (versione economica per riconoscere aggiunte di altri processi)."""
+    return tuple(sorted(round_files(base_dir)))
+
+
+class MatchHistoryStore:
+    """
+    Storico append-only delle giornate in formato colonnare (Parquet).
+    Ogni giornata è un file separato; gli aggregati mobili (ultime 3/5/10 partite)
+    sono mantenuti in memoria e aggiornati solo con le righe nuove, quindi le
+    giornate vanno aggiunte in ordine crescente.
+    """
+
+    def __init__(self, base_dir='storico'):
+        self.base_dir = base_dir
+        self._reset_state()
+        if os.path.isdir(self.base_dir):
+            self._restore()
+
+    def _reset_state(self):
+        """Stato incrementale vuoto (nessuna giornata applicata)."""
+        self.rounds = []
+        self.player_keys = {}
+        self._keys = []
+
+        n_stats = len(HISTORY_STAT_COLUMNS)
+        self._max_window = max(ROLLING_WINDOWS)
+        self._buffer = np.zeros((0, self._max_window, n_stats))
+        self._played = np.zeros(0, dtype=np.int64)
+        self._totals = np.zeros((0, n_stats))
+        self._rolling = {w: np.zeros((0, n_stats)) for w in ROLLING_WINDOWS}
+        # 90' giocati dall'ultimo giallo (contatore del ritardo, stessa scala del foglio)
+        self._since_yellow = np.zeros(0)
+
+        # Riepilogo per giornata e squadra (alimenta il grafico del trend)
+        self.round_summary = pd.DataFrame(
+            columns=['Giornata', 'Data', 'Squadra', 'Presenze'] + HISTORY_STAT_COLUMNS
+        )
+
+    # --- PERSISTENZA ---
+
+    def _round_path(self, giornata):
+        return os.path.join(self.base_dir, ROUND_FILE_PATTERN.format(int(giornata)))
+
+    def _round_files(self):
+        return round_files(self.base_dir)
+
+    def _restore(self):
+        """Ripristina lo stato dal checkpoint e riapplica solo le giornate successive."""
+        checkpoint = os.path.join(self.base_dir, CHECKPOINT_FILE)
+        if os.path.exists(checkpoint):
+            with np.load(checkpoint, allow_pickle=False) as state:
+                if set(self._state_arrays()) <= set(state.files):
+                    self._load_state(state)
+            summary_path = os.path.join(self.base_dir, SUMMARY_FILE)
+            if self.rounds and os.path.exists(summary_path):
+                self.round_summary = pd.read_parquet(summary_path)
+
+        pending = sorted(g for g in self._round_files() if g not in set(self.rounds))
+        if pending and self.rounds and pending[0] < max(self.rounds):
+            # Giornata precedente all'ultima applicata (es. file copiato a mano): i buffer
+            # circolari vanno ricostruiti da capo rileggendo tutte le giornate in ordine
+            self._reset_state()
+            pending = sorted(self._round_files())
+        for giornata in pending:
+            self._apply_round(pd.read_parquet(self._round_path(giornata)), giornata)
+
+        if pending:
+            self._save_checkpoint()
+
+    def _state_arrays(self):
+        """Stato incrementale come dizionario di array (per il checkpoint)."""
+        teams = np.array([k[0] for k in self._keys], dtype=str)
+        players = np.array([k[1] for k in self._keys], dtype=str)
+        state = {
+            'rounds': np.array(self.rounds, dtype=np.int64),
+            'key_teams': teams,
+            'key_players': players,
+            'buffer': self._buffer,
+            'played': self._played,
+            'totals': self._totals,
+            'since_yellow_90s': self._since_yellow,
+        }
+        for w in ROLLING_WINDOWS:
+            state[f'rolling_{w}'] = self._rolling[w]
+        return state
+
+    def _load_state(self, state):
+        self.rounds = [int(g) for g in state['rounds']]
+        self._keys = list(zip(state['key_teams'].tolist(), state['key_players'].tolist()))
+        self.player_keys = {key: i for i, key in enumerate(self._keys)}
+        self._buffer = state['buffer']
+        self._played = state['played']
+        self._totals = state['totals']
+        self._since_yellow = state['since_yellow_90s']
+        self._rolling = {w: state[f'rolling_{w}'] for w in ROLLING_WINDOWS}
+
+    def _save_checkpoint(self):
+        os.makedirs(self.base_dir, exist_ok=True)
+        tmp_path = os.path.join(self.base_dir, '_stato.tmp.npz')
+        np.savez(tmp_path, **self._state_arrays())
+        os.replace(tmp_path, os.path.join(self.base_dir, CHECKPOINT_FILE))
+        self.round_summary.to_parquet(os.path.join(self.base_dir, SUMMARY_FILE), index=False)
+
+    # --- AGGIORNAMENTO INCREMENTALE ---
+
+    def _normalize_round(self, df_round, giornata, data):
+        """Valida e normalizza le righe di una giornata."""
+        df = df_round.copy()
+        df.columns = [str(c).replace('\n', ' ').strip() for c in df.columns]
+
+        missing = {'Squadra', 'Player'} - set(df.columns)
+        if missing:
+            raise ValueError(f"Colonne mancanti nello storico: {missing}")
+
+        df['Giornata'] = int(giornata)
+        if data is not None:
+            df['Data'] = pd.to_datetime(data, errors='coerce')
+        elif 'Data' in df.columns:
+            df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
+        else:
+            df['Data'] = pd.NaT
+        for col in HISTORY_STAT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0) if col in df.columns else 0.0
+        for col in HISTORY_OPTIONAL_COLUMNS:
+            if col not in df.columns:
+                df[col] = ''
+        df['Squadra'] = df['Squadra'].astype(str).str.strip()
+        df['Player'] = df['Player'].astype(str).str.strip()
+
+        # Una sola riga per giocatore per giornata
+        df = df.groupby(['Squadra', 'Player'], as_index=False, sort=False).agg(
+            {**{c: 'sum' for c in HISTORY_STAT_COLUMNS},
+             **{c: 'first' for c in ['Giornata', 'Data'] + HISTORY_OPTIONAL_COLUMNS}}
+        )
+        return df[HISTORY_KEY_COLUMNS + HISTORY_STAT_COLUMNS + HISTORY_OPTIONAL_COLUMNS]
+
+    def _ensure_players(self, keys):
+        """Assegna un indice ai nuovi giocatori e allarga gli array di stato."""
+        new_keys = [k for k in dict.fromkeys(keys) if k not in self.player_keys]
+        if new_keys:
+            start = len(self._keys)
+            for offset, key in enumerate(new_keys):
+                self.player_keys[key] = start + offset
+            self._keys.extend(new_keys)
+
+            n_new = len(new_keys)
+            n_stats = len(HISTORY_STAT_COLUMNS)
+            self._buffer = np.concatenate([self._buffer, np.zeros((n_new, self._max_window, n_stats))])
+            self._played = np.concatenate([self._played, np.zeros(n_new, dtype=np.int64)])
+            self._totals = np.concatenate([self._totals, np.zeros((n_new, n_stats))])
+            self._since_yellow = np.concatenate([self._since_yellow, np.zeros(n_new)])
+            for w in ROLLING_WINDOWS:
+                self._rolling[w] = np.concatenate([self._rolling[w], np.zeros((n_new, n_stats))])
+
+        return np.array([self.player_keys[k] for k in keys], dtype=np.int64)
+
+    def _apply_round(self, df, giornata):
+        """Aggiorna buffer circolari e somme mobili con le sole righe della giornata: O(righe nuove)."""
+        # Le righe senza minuti (panchina) non sono presenze: non entrano in finestre e ritardo
+        df = df[df['Minuti'] > 0]
+        keys = list(zip(df['Squadra'], df['Player']))
+        idx = self._ensure_players(keys)
+        values = df[HISTORY_STAT_COLUMNS].to_numpy(dtype=float)
+        n_played = self._played[idx]
+
+        for w in ROLLING_WINDOWS:
+            # Valore che esce dalla finestra: la partita giocata w turni fa
+            leaving_pos = (n_played - w) % self._max_window
+            leaving = np.where((n_played >= w)[:, None], self._buffer[idx, leaving_pos], 0.0)
+            self._rolling[w][idx] += values - leaving
+
+        self._buffer[idx, n_played % self._max_window] = values
+        self._played[idx] += 1
+        self._totals[idx] += values
+
+        # Ritardo: si azzera con un giallo, altrimenti crescono i 90' giocati
+        booked = values[:, HISTORY_STAT_COLUMNS.index('Gialli')] > 0
+        nineties = values[:, HISTORY_STAT_COLUMNS.index('Minuti')] / 90
+        self._since_yellow[idx] = np.where(booked, 0.0, self._since_yellow[idx] + nineties)
+        self.rounds.append(int(giornata))
+
+        summary = df.groupby('Squadra', as_index=False).agg(
+            {'Data': 'first', 'Player': 'count', **{c: 'sum' for c in HISTORY_STAT_COLUMNS}}
+        ).rename(columns={'Player': 'Presenze'})
+        summary.insert(0, 'Giornata', int(giornata))
+        frames = [f for f in (self.round_summary, summary) if not f.empty]
+        self.round_summary = pd.concat(frames, ignore_index=True) if frames else summary
+
+    def append_round(self, df_round, giornata=None, data=None):
+        """Aggiunge una giornata allo storico (append-only) e aggiorna gli aggregati."""
+        if giornata is None:
+            giornata = (max(self.rounds) + 1) if self.rounds else 1
+        if int(giornata) in self.rounds:
+            raise ValueError(f"La giornata {giornata} è già presente nello storico.")
+        if self.rounds and int(giornata) < max(self.rounds):
+            # Somme mobili e ritardo dipendono dall'ordine delle partite: niente inserimenti nel passato
+            raise ValueError(
+                f"La giornata {giornata} è precedente all'ultima dello storico ({max(self.rounds)}): "
+                "le giornate vanno aggiunte in ordine."
+            )
+
+        df = self._normalize_round(df_round, giornata, data)
+        if df.empty:
+            raise ValueError("La giornata non contiene righe valide.")
+
+        os.makedirs(self.base_dir, exist_ok=True)
+        df.to_parquet(self._round_path(giornata), index=False)
+        self._apply_round(df, giornata)
+        self._save_checkpoint()
+        return int(giornata)
+
+    # --- LETTURA ---
+
+    @property
+    def is_empty(self):
+        return len(self.rounds) == 0
+
+    @property
+    def version(self):
+        """Versione dello storico: numero e ultima giornata caricata."""
+        return f"{len(self.rounds)}.{max(self.rounds) if self.rounds else 0}"
+
+    def match_log(self, columns=None):
+        """Righe di tutte le giornate su disco (solo le colonne richieste, lettura colonnare)."""
+        files = self._round_files()
+        if not files:
+            return pd.DataFrame(columns=columns or HISTORY_KEY_COLUMNS + HISTORY_STAT_COLUMNS + HISTORY_OPTIONAL_COLUMNS)
+        return pd.concat(
+            [pd.read_parquet(files[g], columns=columns) for g in sorted(files)], ignore_index=True
+        )
+
+    def _lookup(self, teams, players):
+        """Indici dei giocatori richiesti (-1 se assenti dallo storico)."""
+        return np.array(
+            [self.player_keys.get((str(t).strip(), str(p).strip()), -1) for t, p in zip(teams, players)],
+            dtype=np.int64
+        )
+
+    def rolling_stats(self, window=5):
+        """Aggregati sulle ultime `window` partite di ogni giocatore."""
+        if window not in self._rolling:
+            raise ValueError(f"Finestra non supportata: {window}. Disponibili: {ROLLING_WINDOWS}")
+        df = pd.DataFrame(self._rolling[window], columns=HISTORY_STAT_COLUMNS)
+        df.insert(0, 'Player', [k[1] for k in self._keys])
+        df.insert(0, 'Squadra', [k[0] for k in self._keys])
+        df['Partite'] = np.minimum(self._played, window)
+        return df
+
+    def trend_factor(self, teams, players, window=5, lower=0.5, upper=1.5):
+        """
+        Rapporto tra il tasso cartellini/90' recente (ultime `window` partite)
+        e quello di tutto lo storico. 1.0 per i giocatori senza storico.
+        """
+        idx = self._lookup(teams, players)
+        factor = np.ones(len(idx))
+        known = idx >= 0
+        if not known.any():
+            return factor
+
+        cards = [HISTORY_STAT_COLUMNS.index('Gialli'), HISTORY_STAT_COLUMNS.index('Rossi')]
+        minutes = HISTORY_STAT_COLUMNS.index('Minuti')
+        recent = self._rolling[window][idx[known]]
+        total = self._totals[idx[known]]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            recent_rate = recent[:, cards].sum(axis=1) / recent[:, minutes] * 90
+            season_rate = total[:, cards].sum(axis=1) / total[:, minutes] * 90
+            ratio = recent_rate / season_rate
+
+        # Senza minuti o senza cartellini in carriera il trend resta neutro
+        ratio = np.where(np.isfinite(ratio), ratio, 1.0)
+        factor[known] = np.clip(ratio, lower, upper)
+        return factor
+
+    def card_delay(self, teams, players):
+        """
+        Ritardo cartellino: 90' giocati dall'ultimo giallo, sulla stessa scala di
+        'Ritardo Cartellino (Partite)' del foglio. NaN se il giocatore non è nello storico.
+        """
+        idx = self._lookup(teams, players)
+        since = np.full(len(idx), np.nan)
+        known = idx >= 0
+        since[known] = self._since_yellow[idx[known]]
+        return since
+
+    def team_trend(self, teams=None):
+        """Serie per giornata dei cartellini ogni 90' (gialli e rossi) per le squadre indicate."""
+        summary = self.round_summary
+        if teams is not None:
+            summary = summary[summary['Squadra'].isin(list(teams))]
+        if summary.empty:
+            return pd.DataFrame(columns=['Giornata', 'Data', 'Gialli per 90', 'Rossi per 90'])
+
+        trend = summary.groupby('Giornata', as_index=False).agg(
+            {'Data': 'first', 'Minuti': 'sum', 'Gialli': 'sum', 'Rossi': 'sum'}
+        ).sort_values('Giornata')
+        minutes = trend['Minuti'].replace(0, np.nan)
+        trend['Gialli per 90'] = (trend['Gialli'] / minutes * 90).fillna(0)
+        trend['Rossi per 90'] = (trend['Rossi'] / minutes * 90).fillna(0)
+        return trend[['Giornata', 'Data', 'Gialli per 90', 'Rossi per 90']]
@@ -0,0 +1,96 @@
+import time
+from dataclasses import dataclass, field
+import numpy as np
+
+# Gialli medi a partita in campionato (stessa base di calculate_referee_factor)
+LEAGUE_CARDS_PER_MATCH = 4.5
+
+
+def risk_to_probability(risk, expected_cards):
+    """
+    Converte il rischio dei giocatori in probabilità di ammonizione.
+    Il totale atteso di cartellini della partita viene ripartito in proporzione
+    al rischio (λ_i) e ogni giocatore è trattato come un processo di Poisson:
+    p_i = 1 - exp(-λ_i).
+    """
+    risk = np.clip(np.nan_to_num(np.asarray(risk, dtype=float), posinf=0.0), 0, None)
+    total = risk.sum()
+    if total <= 0:
+        return np.zeros_like(risk)
+    expected_rate = risk / total * expected_cards
+    return 1.0 - np.exp(-expected_rate)
+
+
+@dataclass
+class MatchSimulation:
+    """Distribuzioni simulate per una partita (probabilità indicizzate per numero di cartellini)."""
+    n_sims: int
+    total_cards: np.ndarray
+    team_cards: dict
+    top_k_hits: np.ndarray
+    probabilities: np.ndarray
+    elapsed: float = 0.0
+    teams: list = field(default_factory=list)
+
+    @staticmethod
+    def prob_at_least(distribution, k):
+        """P(X >= k) da una distribuzione discreta."""
+        return float(distribution[k:].sum()) if k < len(distribution) else 0.0
+
+    @staticmethod
+    def expected(distribution):
+        return float(np.dot(np.arange(len(distribution)), distribution))
+
+
+def simulate_match(probabilities, teams, top_k_idx, n_sims=100_000, batch_size=25_000, seed=None):
+    """
+    Simula `n_sims` partite con estrazioni NumPy a blocchi.
+    probabilities: probabilità di ammonizione per giocatore;
+    teams: squadra di ogni giocatore; top_k_idx: posizioni dei giocatori del Top-K.
+    """
+    start_time = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    p = np.asarray(probabilities, dtype=np.float32)
+    n_players = len(p)
+    top_k_idx = np.asarray(top_k_idx, dtype=np.int64)
+
+    team_names, team_codes = np.unique(np.asarray(teams), return_inverse=True)
+    # Matrice one-hot giocatore -> squadra per i conteggi per squadra in un solo prodotto
+    team_onehot = np.zeros((n_players, len(team_names)), dtype=np.float32)
+    team_onehot[np.arange(n_players), team_codes] = 1.0
+
+    total_counts = np.zeros(n_players + 1, dtype=np.int64)
+    team_counts = np.zeros((len(team_names), n_players + 1), dtype=np.int64)
+    top_k_counts = np.zeros(len(top_k_idx) + 1, dtype=np.int64)
+
+    for batch_start in range(0, n_sims, batch_size):
+        size = min(batch_size, n_sims - batch_start)
+        booked = rng.random((size, n_players), dtype=np.float32) < p
+
+        total_counts += np.bincount(booked.sum(axis=1), minlength=n_players + 1)
+        per_team = (booked.astype(np.float32) @ team_onehot).astype(np.int64)
+        for t in range(len(team_names)):
+            team_counts[t] += np.bincount(per_team[:, t], minlength=n_players + 1)
+        top_k_counts += np.bincount(booked[:, top_k_idx].sum(axis=1), minlength=len(top_k_idx) + 1)
+
+    return MatchSimulation(
+        n_sims=n_sims,
+        total_cards=total_counts / n_sims,
+        team_cards={str(team): team_counts[t] / n_sims for t, team in enumerate(team_names)},
+        top_k_hits=top_k_counts / n_sims,
+        probabilities=p.astype(float),
+        elapsed=time.perf_counter() - start_time,
+        teams=[str(t) for t in team_names]
+    )
+
+
+def simulate_fixture(df_ranked, df_top_k, referee_factor, n_sims=100_000, seed=None,
+                     cards_per_match=LEAGUE_CARDS_PER_MATCH):
+    """
+    Simulazione a partire dalla classifica di una partita (colonna 'Rischio Finale')
+    e dal Top-K selezionato. Il totale atteso di cartellini scala con il fattore arbitro.
+    """
+    expected_cards = cards_per_match * referee_factor
+    probabilities = risk_to_probability(df_ranked['Rischio Finale'].to_numpy(), expected_cards)
+    top_k_idx = np.flatnonzero(df_ranked.index.isin(df_top_k.index))
+    return simulate_match(probabilities, df_ranked['Squadra'].to_numpy(), top_k_idx, n_sims=n_sims, seed=seed)
@@ -0,0 +1,338 @@
+"""
+Configurazione del Mostro: quote, medie di campionato, pesi della formula,
+parametri arbitro e nomi delle colonne.
+
+La configurazione viene letta una sola volta da un file JSON o TOML
+(predefinito 'mostro_config.json', oppure la variabile d'ambiente MOSTRO_CONFIG;
+il TOML richiede Python 3.11+)
+e convertita in array NumPy usati direttamente dai calcoli vettoriali.
+Per cambiare campionato basta puntare a un altro file.
+"""
+import os
+import json
+import hashlib
+from dataclasses import dataclass, field, fields, is_dataclass
+from functools import cached_property, lru_cache
+from types import MappingProxyType
+import numpy as np
+
+try:
+    import tomllib # Python 3.11+
+except ImportError:
+    tomllib = None
+
+CONFIG_PATH = 'mostro_config.json'
+CONFIG_ENV_VAR = 'MOSTRO_CONFIG'
+
+# Statistiche arbitro usate dalla formula (ordine degli array compilati)
+REFEREE_STATS = ('gialli', 'rossi', 'falli')
+
+# Scala della 'Quota (%)': sulla singola partita o sul percentile di campionato
+QUOTA_MODES = ('partita', 'lega')
+
+
+def referee_severity(stats, base, weights):
+    """
+    Indice di severità: somma di (valore / media di riferimento) · peso.
+    `stats` ha una riga per arbitro e una colonna per statistica; i valori mancanti valgono la media.
+    """
+    stats = np.asarray(stats, dtype=float)
+    stats = np.where(np.isnan(stats), base, stats)
+    return (stats / base) @ weights
+
+
+@dataclass(frozen=True)
+class QuotaConfig:
+    media: float = 28.5
+    massima: float = 41.0
+    minima: float = 15.0
+    modalita: str = 'partita' # 'partita' (scala sul massimo della partita) o 'lega' (percentile di campionato)
+
+
+@dataclass(frozen=True)
+class CampionatoConfig:
+    """Medie di campionato."""
+    partite_per_giallo: float = 5.2
+    falli_per_giallo: float = 6.8
+    cartellini_per_partita: float = 4.5
+
+
+@dataclass(frozen=True)
+class RischioConfig:
+    peso_rischio_90s: float = 0.40
+    peso_rischio_falli: float = 0.40
+    ritardo_max: float = 2.0
+
+
+@dataclass(frozen=True)
+class ArbitroConfig:
+    colonne: dict = field(default_factory=lambda: {
+        'gialli': 'Gialli a partita', 'rossi': 'Rossi a partita', 'falli': 'Falli a partita'
+    })
+    base: dict = field(default_factory=lambda: {'gialli': 4.5, 'rossi': 0.2, 'falli': 25.0})
+    pesi: dict = field(default_factory=lambda: {'gialli': 0.65, 'rossi': 0.20, 'falli': 0.15})
+    fattore_min: float = 0.6
+    fattore_max: float = 1.8
+    soglie_severita: tuple = (0.8, 0.9, 1.15, 1.3)
+    categorie_severita: tuple = ('Bassa', 'Media-Bassa', 'Media', 'Alta', 'Molto Alta')
+    parole_chiave_foglio: tuple = ('arbitri', 'referee', 'ref')
+
+    # Array compilati (ordine di REFEREE_STATS)
+    stat_columns: tuple = field(init=False, repr=False, compare=False)
+    base_array: np.ndarray = field(init=False, repr=False, compare=False)
+    pesi_array: np.ndarray = field(init=False, repr=False, compare=False)
+    soglie_array: np.ndarray = field(init=False, repr=False, compare=False)
+    categorie_array: np.ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        for name in ('colonne', 'base', 'pesi'):
+            mapping = getattr(self, name)
+            missing = set(REFEREE_STATS) - set(mapping)
+            if missing:
+                raise ValueError(f"arbitro.{name}: statistiche mancanti {sorted(missing)}")
+            object.__setattr__(self, name, MappingProxyType(dict(mapping)))
+
+        compiled = {
+            'stat_columns': tuple(self.colonne[k] for k in REFEREE_STATS),
+            'base_array': np.array([self.base[k] for k in REFEREE_STATS], dtype=float),
+            'pesi_array': np.array([self.pesi[k] for k in REFEREE_STATS], dtype=float),
+            'soglie_array': np.array(self.soglie_severita, dtype=float),
+            'categorie_array': np.array(self.categorie_severita, dtype=object),
+        }
+        for name, value in compiled.items():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+            object.__setattr__(self, name, value)
+
+    def category(self, severity_index):
+        """
+        Categoria di severità per uno o più indici (ricerca binaria sulle soglie).
+        Come i confronti stretti originali (> 1.3, > 1.15, < 0.8, < 0.9), un indice pari
+        a una soglia resta nella categoria più vicina a quella centrale.
+        """
+        upper = np.searchsorted(self.soglie_array, severity_index, side='left')
+        lower = np.searchsorted(self.soglie_array, severity_index, side='right')
+        center = len(self.categorie_array) // 2
+        return self.categorie_array[np.where(lower <= center, lower, np.maximum(upper, center))]
+
+
+@dataclass(frozen=True)
+class ColonneConfig:
+    """Colonne dei fogli squadra del workbook."""
+    squadra_obbligatorie: tuple = ('Player', 'Pos')
+    numeriche: tuple = (
+        'Cartellini Gialli Totali', '90s Giocati Totali',
+        'Cartellini Gialli 25/26', '90s Giocati 25/26',
+        'Falli Fatti Totali', 'Falli Fatti 25/26',
+        'Media 90s per Cartellino Totale', 'Media 90s per Cartellino 25/26',
+        'Media Falli per Cartellino Totale', 'Media Falli per Cartellino 25/26',
+        'Ritardo Cartellino (Partite)'
+    )
+
+
+@dataclass(frozen=True)
+class ModelloCartelliniConfig:
+    """Costanti di CardPredictionModel."""
+    rischio_posizione: dict = field(default_factory=lambda: {
+        'Difensore': 1.3, 'Centrocampista': 1.2, 'Attaccante': 1.0, 'Portiere': 0.5
+    })
+    eta_giovane: float = 23
+    eta_esperto: float = 32
+    fattore_eta: float = 1.2
+    # Pesi di falli, gialli e rossi per 90' nell'indice di aggressività
+    pesi_aggressivita: tuple = (0.4, 0.4, 0.2)
+
+    pesi_aggressivita_array: np.ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if len(self.pesi_aggressivita) != 3:
+            raise ValueError("modello_cartellini.pesi_aggressivita: servono 3 pesi (falli, gialli, rossi)")
+        object.__setattr__(self, 'rischio_posizione', MappingProxyType(dict(self.rischio_posizione)))
+        weights = np.array(self.pesi_aggressivita, dtype=float)
+        weights.flags.writeable = False
+        object.__setattr__(self, 'pesi_aggressivita_array', weights)
+
+
+@dataclass(frozen=True)
+class DatiGiocatoriConfig:
+    """Colonne, limiti e posizioni del formato giocatori di DataProcessor."""
+    colonne_obbligatorie: tuple = ('Nome', 'Squadra', 'Posizione')
+    limiti: dict = field(default_factory=lambda: {
+        'Età': (16, 45),
+        'Minuti_Giocati': (0, 3500),
+        'Cartellini_Gialli': (0, 20),
+        'Cartellini_Rossi': (0, 5),
+        'Falli_Commessi': (0, 150),
+    })
+    posizioni: dict = field(default_factory=lambda: {
+        'GK': 'Portiere', 'Goalkeeper': 'Portiere', 'Portiere': 'Portiere',
+        'DEF': 'Difensore', 'Defender': 'Difensore', 'Difensore': 'Difensore',
+        'MID': 'Centrocampista', 'Midfielder': 'Centrocampista', 'Centrocampista': 'Centrocampista',
+        'FWD': 'Attaccante', 'Forward': 'Attaccante', 'Attaccante': 'Attaccante'
+    })
+    posizione_predefinita: str = 'Centrocampista'
+
+    colonne_numeriche: tuple = field(init=False, repr=False, compare=False)
+    limiti_min: np.ndarray = field(init=False, repr=False, compare=False)
+    limiti_max: np.ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        bounds = {col: tuple(float(v) for v in pair) for col, pair in self.limiti.items()}
+        for col, pair in bounds.items():
+            if len(pair) != 2 or pair[0] > pair[1]:
+                raise ValueError(f"dati_giocatori.limiti['{col}']: atteso [minimo, massimo]")
+        object.__setattr__(self, 'limiti', MappingProxyType(bounds))
+        object.__setattr__(self, 'posizioni', MappingProxyType(dict(self.posizioni)))
+        object.__setattr__(self, 'colonne_numeriche', tuple(bounds))
+        lower = np.array([pair[0] for pair in bounds.values()], dtype=float)
+        upper = np.array([pair[1] for pair in bounds.values()], dtype=float)
+        lower.flags.writeable = False
+        upper.flags.writeable = False
+        object.__setattr__(self, 'limiti_min', lower)
+        object.__setattr__(self, 'limiti_max', upper)
+
+
+@dataclass(frozen=True)
+class MostroConfig:
+    lega: str = 'Serie A'
+    quota: QuotaConfig = field(default_factory=QuotaConfig)
+    campionato: CampionatoConfig = field(default_factory=CampionatoConfig)
+    rischio: RischioConfig = field(default_factory=RischioConfig)
+    arbitro: ArbitroConfig = field(default_factory=ArbitroConfig)
+    colonne: ColonneConfig = field(default_factory=ColonneConfig)
+    modello_cartellini: ModelloCartelliniConfig = field(default_factory=ModelloCartelliniConfig)
+    dati_giocatori: DatiGiocatoriConfig = field(default_factory=DatiGiocatoriConfig)
+    source_path: str = None
+
+    @property
+    def numeric_columns(self):
+        """Colonne da convertire in numeri: statistiche dei giocatori e degli arbitri."""
+        return self.colonne.numeriche + self.arbitro.stat_columns
+
+    @cached_property
+    def fingerprint(self):
+        """Hash dei valori validati (percorso del file escluso): entra nelle chiavi dei risultati in cache."""
+        payload = json.dumps(_plain(self), sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _plain(value):
+    """Valori di configurazione come tipi JSON (solo i campi dichiarati, non gli array compilati)."""
+    if is_dataclass(value):
+        return {f.name: _plain(getattr(value, f.name)) for f in fields(value) if f.init and f.name != 'source_path'}
+    if isinstance(value, (dict, MappingProxyType)):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (tuple, list)):
+        return [_plain(v) for v in value]
+    return value
+
+
+# --- CARICAMENTO E VALIDAZIONE ---
+
+SECTIONS = {
+    'quota': QuotaConfig,
+    'campionato': CampionatoConfig,
+    'rischio': RischioConfig,
+    'arbitro': ArbitroConfig,
+    'colonne': ColonneConfig,
+    'modello_cartellini': ModelloCartelliniConfig,
+    'dati_giocatori': DatiGiocatoriConfig,
+}
+
+
+def _build_section(name, cls, data):
+    """Crea una sezione controllando chiavi sconosciute e tipi numerici."""
+    if not isinstance(data, dict):
+        raise ValueError(f"Sezione '{name}': atteso un oggetto")
+    known = {f.name: f for f in fields(cls) if f.init}
+    unknown = set(data) - set(known)
+    if unknown:
+        raise ValueError(f"Sezione '{name}': chiavi sconosciute {sorted(unknown)}")
+
+    values = {}
+    for key, value in data.items():
+        default_type = known[key].type
+        if default_type is float:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{name}.{key}: atteso un numero, trovato {value!r}")
+            value = float(value)
+        elif default_type is tuple:
+            if not isinstance(value, list):
+                raise ValueError(f"{name}.{key}: attesa una lista")
+            value = tuple(value)
+        values[key] = value
+    return cls(**values)
+
+
+def validate_config(config):
+    """Controlli di coerenza tra i valori; solleva ValueError al primo errore."""
+    quota = config.quota
+    if not 0 < quota.minima <= quota.media <= quota.massima:
+        raise ValueError("quota: serve 0 < minima <= media <= massima")
+    if quota.modalita not in QUOTA_MODES:
+        raise ValueError(f"quota.modalita: valori ammessi {QUOTA_MODES}")
+
+    for key in ('partite_per_giallo', 'falli_per_giallo', 'cartellini_per_partita'):
+        if getattr(config.campionato, key) <= 0:
+            raise ValueError(f"campionato.{key}: deve essere positivo")
+
+    rischio = config.rischio
+    if rischio.peso_rischio_90s < 0 or rischio.peso_rischio_falli < 0:
+        raise ValueError("rischio: i pesi non possono essere negativi")
+    if rischio.ritardo_max < 1:
+        raise ValueError("rischio.ritardo_max: deve essere almeno 1")
+
+    arbitro = config.arbitro
+    if np.any(arbitro.base_array <= 0):
+        raise ValueError("arbitro.base: le medie di riferimento devono essere positive")
+    if np.any(arbitro.pesi_array < 0):
+        raise ValueError("arbitro.pesi: i pesi non possono essere negativi")
+    if not 0 < arbitro.fattore_min <= arbitro.fattore_max:
+        raise ValueError("arbitro: serve 0 < fattore_min <= fattore_max")
+    if np.any(np.diff(arbitro.soglie_array) <= 0):
+        raise ValueError("arbitro.soglie_severita: le soglie devono essere crescenti")
+    if len(arbitro.categorie_severita) != len(arbitro.soglie_severita) + 1:
+        raise ValueError("arbitro.categorie_severita: serve una categoria in più rispetto alle soglie")
+
+    if not config.colonne.squadra_obbligatorie:
+        raise ValueError("colonne.squadra_obbligatorie: almeno una colonna richiesta")
+
+    dati = config.dati_giocatori
+    if dati.posizione_predefinita not in set(dati.posizioni.values()):
+        raise ValueError("dati_giocatori.posizione_predefinita: non è una delle posizioni mappate")
+    return config
+
+
+def config_from_dict(data, source_path=None):
+    """MostroConfig validato da un dizionario (le sezioni mancanti usano i valori predefiniti)."""
+    unknown = set(data) - set(SECTIONS) - {'lega'}
+    if unknown:
+        raise ValueError(f"Sezioni sconosciute nella configurazione: {sorted(unknown)}")
+    sections = {name: _build_section(name, cls, data[name]) for name, cls in SECTIONS.items() if name in data}
+    config = MostroConfig(lega=str(data.get('lega', MostroConfig.lega)), source_path=source_path, **sections)
+    return validate_config(config)
+
+
+@lru_cache(maxsize=None)
+def _load_config_file(path):
+    if not os.path.exists(path):
+        return validate_config(MostroConfig())
+    if path.endswith('.toml'):
+        if tomllib is None:
+            raise ValueError(f"{path}: i file TOML richiedono Python 3.11 o successivo, usare il formato JSON")
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    return config_from_dict(data, source_path=path)
+
+
+def load_config(path=None):
+    """
+    Configurazione del campionato, letta e validata una sola volta per file.
+    Senza `path` usa MOSTRO_CONFIG o 'mostro_config.json'; se il file non esiste
+    valgono i valori predefiniti (Serie A).
+    """
+    path = path or os.environ.get(CONFIG_ENV_VAR) or CONFIG_PATH
+    return _load_config_file(os.path.abspath(path))
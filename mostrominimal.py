@@ -4,8 +4,36 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from types import MappingProxyType
 import warnings
 import os
+import io
+import hashlib
+import tempfile
+import time
+import uuid
+from match_history import MatchHistoryStore, stored_rounds
+from league_store import LazyTeamFrames, LeagueArchive
+from schema import apply_schema, referee_name_column
+from data_quality import check_sheet, report_frame, report_json, severity_counts
+from export import EXPORT_FORMATS, FixtureExport, export_round
+from table_view import RANKING_FORMATS, number_column_config, paginated_dataframe
+from precompute import SpeculativePrecomputer, likely_fixtures
+from round_optimizer import optimise_round, round_candidates
+from referee_matrix import RefereeTeamMatrix
+from lineups import ProbableLineups
+from odds import VALUE_COLUMNS, OddsBook, read_odds_file
+from similarity import PlayerSimilarityIndex
+from profiling import profile_session, profiling_enabled
+from risk_index import LeagueRiskIndex, apply_quota_mode
+from player_index import PlayerIndex
+from state_store import StateStore, make_fixture_key
+from shared_store import DataSnapshot, SharedDataStore, frame_version
+from monte_carlo import simulate_fixture
+from mostro_config import QUOTA_MODES, load_config, referee_severity
+from tuning import load_tuned_params
+from workbook_watcher import WorkbookWatcher, file_signature, workbook_sheet_hashes
+from visualizations import create_timeline_chart
 warnings.filterwarnings('ignore')
 
 # Configurazione pagina
@@ -125,34 +153,68 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 class EnhancedMostroPredictor:
-    def __init__(self):
+    def __init__(self, config=None):
+        # Configurazione del campionato (mostro_config.json), letta una sola volta
+        self.config = config or load_config()
         self.teams_data = {}
         self.referees_data = pd.DataFrame()
-        self.QUOTA_MEDIA = 28.5
-        self.QUOTA_MASSIMA = 41.0
-        self.QUOTA_MINIMA = 15.0
+        self.player_index = PlayerIndex()
+        self.data_version = None # Hash dei dati caricati (chiave della cache persistente)
+        self.sheet_versions = {} # Hash del contenuto per foglio squadra
+        self.referee_versions = {} # Hash della riga per arbitro
+        self.source_path = None
+        self.source_state = None # (firma file, hash XML fogli, hash stringhe) per il watcher
+        self.quality_report = {} # Problemi di qualità per foglio (data_quality.check_sheet)
+        self.referee_team_matrix = None # Interazione arbitro × squadra dallo storico (RefereeTeamMatrix)
+        self.risk_index = None # Rischio di tutto il campionato, ordinato (LeagueRiskIndex)
+        self.lineups = None # Formazioni probabili della giornata (ProbableLineups)
+        self.QUOTA_MEDIA = self.config.quota.media
+        self.QUOTA_MASSIMA = self.config.quota.massima
+        self.QUOTA_MINIMA = self.config.quota.minima
+        self.QUOTA_MODALITA = self.config.quota.modalita
         
         # Parametri della formula avanzata
-        self.MEDIA_ASSOLUTA_PARTITE_PER_GIALLO = 5.2  # Media campionato
-        self.MEDIA_ASSOLUTA_FALLI_PER_GIALLO = 6.8    # Media campionato
+        self.MEDIA_ASSOLUTA_PARTITE_PER_GIALLO = self.config.campionato.partite_per_giallo
+        self.MEDIA_ASSOLUTA_FALLI_PER_GIALLO = self.config.campionato.falli_per_giallo
+        self.PESO_RISCHIO_90S = self.config.rischio.peso_rischio_90s
+        self.PESO_RISCHIO_FALLI = self.config.rischio.peso_rischio_falli
+        self.FATTORE_RITARDO_MAX = self.config.rischio.ritardo_max
+        self.CARTELLINI_PER_PARTITA = self.config.campionato.cartellini_per_partita
+        
+        # Parametri arbitro: medie di riferimento e pesi (array nell'ordine di config.arbitro.stat_columns)
+        self.BASE_ARBITRO = self.config.arbitro.base_array
+        self.PESI_ARBITRO = self.config.arbitro.pesi_array
+        self.FATTORE_ARBITRO_MIN = self.config.arbitro.fattore_min
+        self.FATTORE_ARBITRO_MAX = self.config.arbitro.fattore_max
+        
+        # Parametri ottimizzati (tuning.py), se presenti per questo campionato
+        self.formula_version = '' # Hash dei parametri applicati ('' = quelli della configurazione)
+        self.apply_formula_params(load_tuned_params(config=self.config))
+    
+    def apply_formula_params(self, params):
+        """Applica un FormulaParams (es. dal file dei parametri ottimizzati)."""
+        if params is None:
+            return
+        self.formula_version = hashlib.sha1(repr(params).encode('utf-8')).hexdigest()[:16]
+        self.MEDIA_ASSOLUTA_PARTITE_PER_GIALLO = params.media_partite_per_giallo
+        self.PESO_RISCHIO_90S = params.peso_rischio_90s
+        self.PESO_RISCHIO_FALLI = params.peso_rischio_falli
+        self.FATTORE_RITARDO_MAX = params.ritardo_max
+        self.CARTELLINI_PER_PARTITA = params.cartellini_per_partita
+        self.BASE_ARBITRO = params.base_arbitro
+        self.PESI_ARBITRO = params.pesi_arbitro
+        self.FATTORE_ARBITRO_MIN = params.fattore_arbitro_min
+        self.FATTORE_ARBITRO_MAX = params.fattore_arbitro_max
     
-    def _process_data_frame(self, df_raw):
-        """Esegue la pulizia e la conversione dei tipi per il DataFrame."""
-        df = df_raw.copy()
-        df.columns = [str(c).replace('\n', ' ').strip() for c in df.columns]
+    def _process_data_frame(self, df_raw, kind):
+        """Esegue la pulizia e la conversione dei tipi per il DataFrame di un foglio `kind` ('team' o 'referee')."""
+        # Intestazioni ricondotte ai nomi canonici (varianti, accenti, sinonimi del tipo di foglio)
+        df = apply_schema(df_raw, kind)
         
         df = df.fillna(0)
         
-        numeric_cols = [
-            'Cartellini Gialli Totali', '90s Giocati Totali', 
-            'Cartellini Gialli 25/26', '90s Giocati 25/26', 
-            'Falli Fatti Totali', 'Falli Fatti 25/26',
-            'Media 90s per Cartellino Totale', 'Media 90s per Cartellino 25/26',
-            'Media Falli per Cartellino Totale', 'Media Falli per Cartellino 25/26',
-            'Ritardo Cartellino (Partite)', # COLONNA CRITICA PER IL RITARDO
-            # Colonne arbitri (per la conversione)
-            'Gialli a partita', 'Rossi a partita', 'Falli a partita'
-        ]
+        # Colonne giocatori (incluso il ritardo) e colonne arbitri, da mostro_config
+        numeric_cols = self.config.numeric_columns
         
         for col in numeric_cols:
             if col in df.columns:
@@ -160,6 +222,69 @@ class EnhancedMostroPredictor:
         
         return df, None
 
+    def _classify_sheet(self, sheet_name, df_raw):
+        """Pulisce un foglio e lo classifica: ('referee', df), ('team', df) o (None, None)."""
+        if df_raw is None or len(df_raw) == 0:
+            return None, None
+            
+        # LOGICA CARICAMENTO ARBITRI (intestazioni lette con i sinonimi dei fogli arbitri)
+        df_referee = apply_schema(df_raw, 'referee')
+        ref_sheet_keywords = self.config.arbitro.parole_chiave_foglio
+        is_referee_sheet_name = any(kw in sheet_name.lower() for kw in ref_sheet_keywords)
+        referee_stats_cols = self.config.arbitro.stat_columns[:2] # Gialli e rossi a partita
+        has_referee_stats = any(col in df_referee.columns for col in referee_stats_cols)
+        ref_col_name = referee_name_column(df_referee)
+
+        if (is_referee_sheet_name or has_referee_stats) and ref_col_name:
+            df, error_msg = self._process_data_frame(df_referee, 'referee')
+            # Controllo qualità sui valori originali, prima del fillna(0)
+            self.quality_report[sheet_name] = check_sheet(sheet_name, df_referee, 'referee')
+            return 'referee', df.copy()
+
+        # LOGICA CARICAMENTO SQUADRE (sinonimi dei fogli squadra)
+        df_raw = apply_schema(df_raw, 'team')
+        df, error_msg = self._process_data_frame(df_raw, 'team')
+        required_cols_team = list(self.config.colonne.squadra_obbligatorie)
+        if all(col in df.columns for col in required_cols_team):
+            df_team = df.dropna(subset=required_cols_team).copy()
+            if len(df_team) > 0:
+                self.quality_report[sheet_name] = check_sheet(sheet_name, df_raw, 'team')
+                return 'team', df_team
+        
+        return None, None
+
+    def _referee_versions(self, referees_data):
+        """Hash della riga di ogni arbitro (per invalidare solo le partite coinvolte)."""
+        ref_col = referee_name_column(referees_data)
+        if ref_col is None or referees_data.empty:
+            return {}
+        row_hashes = pd.util.hash_pandas_object(referees_data, index=False).to_numpy()
+        return {str(name): f"{h:016x}" for name, h in zip(referees_data[ref_col], row_hashes)}
+
+    def _finalize_load(self):
+        """Versioni per foglio/arbitro e indice giocatori, dopo il caricamento completo."""
+        self.sheet_versions = {team: frame_version(df) for team, df in self.teams_data.items()}
+        self.referee_versions = self._referee_versions(self.referees_data)
+        self.player_index = PlayerIndex.from_teams_data(self.teams_data)
+
+    def fixture_version(self, home_team, away_team, referee):
+        """Versione dei dati da cui dipende una partita: due fogli squadra e la riga dell'arbitro."""
+        parts = [
+            self.sheet_versions.get(home_team, ''),
+            self.sheet_versions.get(away_team, ''),
+            self.referee_versions.get(str(referee), '')
+        ]
+        if not any(parts):
+            return self.data_version
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+    def parse_workbook_sheets(self, filename, sheet_names):
+        """Rilegge solo i fogli indicati: {nome_foglio: (tipo, df)}."""
+        if not sheet_names:
+            return {}
+        sheets_dict = pd.read_excel(filename, sheet_name=sorted(sheet_names))
+        return {name: self._classify_sheet(name, df_raw) for name, df_raw in sheets_dict.items()}
+
     def auto_load_excel_data(self):
         """Carica automaticamente il file Excel se presente nella directory, leggendo TUTTI i fogli."""
         excel_files = [
@@ -172,40 +297,31 @@ class EnhancedMostroPredictor:
         for filename in excel_files:
             if os.path.exists(filename):
                 try:
-                    sheets_dict = pd.read_excel(filename, sheet_name=None)
+                    signature = file_signature(filename)
+                    with open(filename, 'rb') as f:
+                        raw_bytes = f.read()
+                    sheets_dict = pd.read_excel(io.BytesIO(raw_bytes), sheet_name=None)
                     
                     teams_loaded_count = 0
                     referee_loaded = False
                     
                     for sheet_name, df_raw in sheets_dict.items():
                         
-                        df, error_msg = self._process_data_frame(df_raw)
+                        kind, df = self._classify_sheet(sheet_name, df_raw)
                         
-                        if df is None or len(df) == 0:
-                            continue
-                            
-                        # LOGICA CARICAMENTO ARBITRI 
-                        ref_sheet_keywords = ['arbitri', 'referee', 'ref']
-                        is_referee_sheet_name = any(kw in sheet_name.lower() for kw in ref_sheet_keywords)
-                        referee_stats_cols = ['Gialli a partita', 'Rossi a partita']
-                        has_referee_stats = any(col in df.columns for col in referee_stats_cols)
-                        ref_col_name = next((col for col in df.columns if 'nome' in col.lower() or 'arbitro' in col.lower()), None)
-
-                        if (is_referee_sheet_name or has_referee_stats) and ref_col_name:
-                            self.referees_data = df.copy()
+                        if kind == 'referee':
+                            self.referees_data = df
                             referee_loaded = True
-                            continue
-
-                        # LOGICA CARICAMENTO SQUADRE 
-                        required_cols_team = ['Player', 'Pos']
-                        if all(col in df.columns for col in required_cols_team):
-                            df_team = df.dropna(subset=['Player', 'Pos']).copy()
-                            if len(df_team) > 0:
-                                self.teams_data[sheet_name] = df_team
-                                teams_loaded_count += 1
+                        elif kind == 'team':
+                            self.teams_data[sheet_name] = df
+                            teams_loaded_count += 1
                                 
                     
                     if teams_loaded_count > 0:
+                        self._finalize_load()
+                        self.data_version = hashlib.sha1(raw_bytes).hexdigest()[:16]
+                        self.source_path = filename
+                        self.source_state = (signature, *workbook_sheet_hashes(io.BytesIO(raw_bytes)))
                         ref_status = "Arbitri caricati" if referee_loaded else "Arbitri NON caricati"
                         return True, f"✅ File '{filename}' caricato. Caricate **{teams_loaded_count}** squadre (da {len(sheets_dict)} fogli). {ref_status}."
                     
@@ -223,9 +339,12 @@ class EnhancedMostroPredictor:
         self.referees_data = pd.DataFrame()
         teams_loaded = 0
         referee_loaded = False
+        version_hash = hashlib.sha1()
 
         for file in uploaded_files:
             try:
+                version_hash.update(file.name.encode('utf-8'))
+                version_hash.update(file.getvalue())
                 if file.name.endswith('.csv'):
                     df_raw = pd.read_csv(file)
                 else:
@@ -233,17 +352,20 @@ class EnhancedMostroPredictor:
 
                 base_name = file.name.split(' - ')[-1].replace('.csv', '').replace('.xlsx', '').strip()
                 
-                df, error_msg = self._process_data_frame(df_raw)
+                is_referee = 'Arbitri' in base_name or 'arbitri' in base_name
+                df, error_msg = self._process_data_frame(df_raw, 'referee' if is_referee else 'team')
                 
                 if error_msg or df is None:
                     st.warning(f"Errore nel processare {file.name}: {error_msg}")
                     continue
 
-                if 'Arbitri' in base_name or 'arbitri' in base_name:
+                if is_referee:
                     self.referees_data = df
+                    self.quality_report[base_name] = check_sheet(base_name, apply_schema(df_raw, 'referee'), 'referee')
                     referee_loaded = True
                 else:
                     self.teams_data[base_name] = df
+                    self.quality_report[base_name] = check_sheet(base_name, apply_schema(df_raw, 'team'), 'team')
                     teams_loaded += 1
                         
             except Exception as e:
@@ -253,6 +375,9 @@ class EnhancedMostroPredictor:
         if teams_loaded == 0 and not referee_loaded:
             return False, "Nessuna squadra o arbitro caricato correttamente."
         
+        self._finalize_load()
+        self.data_version = version_hash.hexdigest()[:16]
+        
         referee_status = "Arbitri caricati" if referee_loaded else "Arbitri NON caricati"
         return True, f"Caricati dati per **{len(self.teams_data)}** squadre e {referee_status}"
 
@@ -262,7 +387,7 @@ class EnhancedMostroPredictor:
             return 1.0, "Media", {}
 
         # CERCA LA COLONNA NOME ARBITRO
-        ref_col = next((col for col in self.referees_data.columns if 'nome' in col.lower() or 'arbitro' in col.lower()), None)
+        ref_col = referee_name_column(self.referees_data)
         
         if ref_col is None:
             # Se la colonna non è stata trovata, usa un default
@@ -275,34 +400,110 @@ class EnhancedMostroPredictor:
         
         referee_row = referee_row.iloc[0]
 
-        yellow_per_match = pd.to_numeric(referee_row.get('Gialli a partita', 4.5), errors='coerce')
-        red_per_match = pd.to_numeric(referee_row.get('Rossi a partita', 0.2), errors='coerce')
-        fouls_per_match = pd.to_numeric(referee_row.get('Falli a partita', 25.0), errors='coerce')
+        stat_values = pd.to_numeric(
+            referee_row.reindex(list(self.config.arbitro.stat_columns)), errors='coerce'
+        ).to_numpy(dtype=float)
+        severity_index = float(referee_severity(stat_values, self.BASE_ARBITRO, self.PESI_ARBITRO))
+        category = str(self.config.arbitro.category(severity_index))
 
-        if pd.isna(yellow_per_match): yellow_per_match = 4.5
-        if pd.isna(red_per_match): red_per_match = 0.2
-        if pd.isna(fouls_per_match): fouls_per_match = 25.0
+        return max(self.FATTORE_ARBITRO_MIN, min(self.FATTORE_ARBITRO_MAX, severity_index)), category, {}
 
-        severity_index = (
-            (yellow_per_match / 4.5) * 0.65 + 
-            (red_per_match / 0.2) * 0.20 + 
-            (fouls_per_match / 25.0) * 0.15
-        )
+    def apply_history_delay(self, df_players, history):
+        """
+        Ricava 'Ritardo Cartellino (Partite)' dallo storico delle giornate: 90' giocati
+        dall'ultimo giallo, come nel foglio (il confronto con la media avviene nella formula).
+        I giocatori assenti dallo storico mantengono il valore del foglio.
+        """
+        ritardo_col = 'Ritardo Cartellino (Partite)'
+        if ritardo_col not in df_players.columns:
+            df_players[ritardo_col] = 0.0
 
-        if severity_index > 1.3:
-            category = "Molto Alta"
-        elif severity_index > 1.15:
-            category = "Alta"
-        elif severity_index < 0.8:
-            category = "Bassa"
-        elif severity_index < 0.9:
-            category = "Media-Bassa"
-        else:
-            category = "Media"
+        if history is None or history.is_empty or df_players.empty:
+            return df_players, 0
 
-        return max(0.6, min(1.8, severity_index)), category, {}
+        delay = history.card_delay(df_players['Squadra'], df_players['Player'])
+        known = ~np.isnan(delay)
+        df_players[ritardo_col] = pd.to_numeric(df_players[ritardo_col], errors='coerce').fillna(0).astype(float)
+        df_players.loc[known, ritardo_col] = delay[known]
+        return df_players, int(known.sum())
 
 
+    def attach_snapshot(self, snapshot):
+        """Usa i dati di uno snapshot condiviso (per riferimento, senza copie)."""
+        self.teams_data = snapshot.teams_data
+        self.referees_data = snapshot.referees_data
+        self.player_index = snapshot.player_index
+        self.data_version = snapshot.data_version
+        self.sheet_versions = snapshot.sheet_versions
+        self.referee_versions = snapshot.referee_versions
+        self.source_path = snapshot.source_path
+        self.source_state = snapshot.source_state
+        self.quality_report = dict(snapshot.quality_report) # Copia: _classify_sheet aggiorna i fogli riletti
+
+    def predict_fixture(self, home_team, away_team, referee, history=None):
+        """
+        Calcola la predizione completa di una partita.
+        Restituisce (df_prediction, ref_factor, ref_category, error_msg): error_msg è None,
+        un avviso (predizione valida) o un errore critico (df_prediction vuoto).
+        """
+        min_quota_perc = self.QUOTA_MINIMA 
+        ref_factor, ref_category, ref_stats = self.calculate_referee_factor(referee)
+        
+        df_home = self.teams_data.get(home_team, pd.DataFrame()).copy()
+        df_away = self.teams_data.get(away_team, pd.DataFrame()).copy()
+        
+        df_home['Squadra'] = home_team
+        df_away['Squadra'] = away_team
+        df_all_players = pd.concat([df_home, df_away], ignore_index=True)
+        
+        # --- CHECK CRITICO DATI RITARDO ---
+        RITARDO_COL_NAME = 'Ritardo Cartellino (Partite)'
+        
+        # Ritardo ricavato dallo storico giornate, se disponibile
+        has_sheet_delay = RITARDO_COL_NAME in df_all_players.columns
+        df_all_players, n_delay_from_history = self.apply_history_delay(df_all_players, history)
+        
+        # Assicurati che la colonna esista nel DF combinato PRIMA di calcolare
+        if not has_sheet_delay and n_delay_from_history == 0:
+            error_msg = f"❌ **ERRORE DATI CRITICI RITARDO:** La colonna '{RITARDO_COL_NAME}' è **mancante** in almeno uno dei fogli squadra. Assicurati che il nome sia corretto (case-sensitive)."
+            return pd.DataFrame(), ref_factor, ref_category, error_msg
+            
+        # Assicurati che il dato non sia composto solo da zeri/NaN
+        error_msg = None
+        ritardo_data = pd.to_numeric(df_all_players[RITARDO_COL_NAME], errors='coerce').fillna(0)
+        if ritardo_data.abs().sum() == 0 and ritardo_data.count() > 0:
+            error_msg = f"⚠️ **AVVISO DATI RITARDO:** La colonna '{RITARDO_COL_NAME}' è presente ma contiene solo valori zero. Il calcolo del Ritardo non sarà efficace."
+            # Continua il calcolo ma avvisa
+
+        # Fattore arbitro per squadra: severità globale × interazione arbitro-squadra dallo storico
+        team_ref_factor = np.full(len(df_all_players), ref_factor)
+        if self.referee_team_matrix is not None:
+            is_home = (df_all_players['Squadra'] == home_team).to_numpy()
+            team_ref_factor = np.where(
+                is_home,
+                ref_factor * self.referee_team_matrix.factor(referee, home_team),
+                ref_factor * self.referee_team_matrix.factor(referee, away_team)
+            )
+        df_all_players['Fattore Arbitro Squadra'] = team_ref_factor
+        
+        # Formazioni probabili: fuori chi non gioca, rischio pesato sui minuti attesi
+        risk_factor = team_ref_factor
+        if self.lineups is not None and 'player_id' in df_all_players.columns:
+            expected_minutes = self.lineups.expected_minutes(df_all_players['player_id'], df_all_players['Squadra'])
+            playing = expected_minutes > 0
+            df_all_players = df_all_players[playing].copy()
+            df_all_players['Minuti Attesi'] = expected_minutes[playing]
+            risk_factor = team_ref_factor[playing] * expected_minutes[playing] / 90.0
+
+        df_prediction = self.calculate_enhanced_prediction(df_all_players, 'Home', risk_factor, min_quota_perc)
+        return df_prediction, ref_factor, ref_category, error_msg
+
+    def add_league_columns(self, df_prediction):
+        """Percentile e quota di campionato (confrontabili tra partite), se l'indice di lega è disponibile."""
+        if self.risk_index is None:
+            return df_prediction
+        return self.risk_index.annotate(df_prediction, self.QUOTA_MINIMA, self.QUOTA_MEDIA, self.QUOTA_MASSIMA)
+
     def calculate_enhanced_prediction(self, df_players, team_type, referee_factor, min_quota_perc):
         """
         Calcola la probabilità avanzata di cartellino giallo per ogni giocatore.
@@ -316,12 +517,12 @@ class EnhancedMostroPredictor:
 
         # 2. Fattore Ritardo (Delay Factor)
         delay_ratio = (df_players['Ritardo Cartellino (Partite)'] / self.MEDIA_ASSOLUTA_PARTITE_PER_GIALLO).clip(lower=0)
-        delay_factor = (1 + delay_ratio).clip(upper=2.0) 
+        delay_factor = (1 + delay_ratio).clip(upper=self.FATTORE_RITARDO_MAX) 
 
         # 3. Calcolo dell'Indice di Rischio Integrato
         df_players['Rischio Integrato'] = (
-            (df_players['Indice Rischio 90s'] * 0.40) +
-            (df_players['Indice Rischio Falli'] * 0.40)
+            (df_players['Indice Rischio 90s'] * self.PESO_RISCHIO_90S) +
+            (df_players['Indice Rischio Falli'] * self.PESO_RISCHIO_FALLI)
         )
         
         # 4. Applico il Fattore Ritardo
@@ -388,21 +589,210 @@ def get_balanced_top_4(df_ranked, home_team, away_team):
         
     return pd.DataFrame(df_top_4_list).sort_values(by='Rischio Finale', ascending=False)
     
+def fixture_result_version(predictor, home, away, referee, history=None):
+    """
+    Chiave di versione del risultato di una partita: fogli coinvolti + storico giornate + formazioni
+    + configurazione del campionato e parametri di tuning.py (i risultati persistono in SQLite tra i riavvii).
+    Include la numerazione dei giocatori: i risultati in cache contengono 'player_id' globali,
+    che cambiano se un giocatore viene aggiunto o rinominato in un qualsiasi foglio.
+    """
+    fixture_data_version = predictor.fixture_version(home, away, referee)
+    if not fixture_data_version:
+        return None
+    version = (
+        f"{fixture_data_version}-{predictor.player_index.version}-{history.version if history is not None else ''}"
+        f"-{predictor.config.fingerprint}-{predictor.formula_version}"
+    )
+    if predictor.lineups is not None:
+        version += f"-{predictor.lineups.version}"
+    return version
+
+def iter_round_predictions(predictor, fixtures, history=None, shared_store=None, quota_mode='partita'):
+    """
+    Predizioni delle partite di una giornata, una alla volta (per l'esportazione in streaming).
+    fixtures: [(casa, trasferta, arbitro), ...]; usa la cache risultati condivisa se disponibile.
+    """
+    for home, away, referee in fixtures:
+        data_version = fixture_result_version(predictor, home, away, referee, history)
+        fixture_key = make_fixture_key(home, away, referee)
+        result = shared_store.get_result(data_version, fixture_key) if shared_store is not None else None
+        if result is None:
+            result = predictor.predict_fixture(home, away, referee, history)
+            if shared_store is not None and not result[0].empty:
+                shared_store.put_result(data_version, fixture_key, result)
+        
+        df_prediction, ref_factor, ref_category, error_msg = result
+        if df_prediction.empty:
+            continue
+        df_prediction = apply_quota_mode(predictor.add_league_columns(df_prediction), quota_mode)
+        df_top_4 = get_balanced_top_4(df_prediction, home, away)
+        yield FixtureExport(home, away, referee, ref_factor, ref_category, df_prediction, df_top_4.index, error_msg)
+
 # --- LOGICA APP STREAMLIT ---
 
 # La funzione exclude_player_callback non è più necessaria e il suo codice è stato integrato in run_app
-def run_app():
+def load_workbook_snapshot():
+    """Carica il workbook in un nuovo snapshot immutabile (None se non disponibile)."""
+    predictor = EnhancedMostroPredictor()
+    success, message = predictor.auto_load_excel_data()
+    if not success:
+        return None
+    return DataSnapshot.from_predictor(predictor, message)
+
+def update_workbook_snapshot(snapshot, changed_sheets, removed_sheets):
+    """
+    Rilegge solo i fogli modificati e costruisce un nuovo snapshot.
+    Restituisce (snapshot, squadre_cambiate, arbitri_cambiati).
+    """
     predictor = EnhancedMostroPredictor()
+    predictor.attach_snapshot(snapshot)
+    
+    teams_data = dict(snapshot.teams_data)
+    sheet_versions = dict(snapshot.sheet_versions)
+    referees_data = snapshot.referees_data
+    referee_versions = dict(snapshot.referee_versions)
+    changed_teams = set()
+    changed_referees = set()
+    
+    for sheet_name, (kind, df) in predictor.parse_workbook_sheets(snapshot.source_path, changed_sheets).items():
+        if kind == 'team':
+            # Stringhe condivise cambiate: si confronta il contenuto effettivo
+            version = frame_version(df)
+            if sheet_versions.get(sheet_name) != version:
+                teams_data[sheet_name] = df
+                sheet_versions[sheet_name] = version
+                changed_teams.add(sheet_name)
+        elif kind == 'referee':
+            new_versions = predictor._referee_versions(df)
+            changed_referees |= {
+                name for name in set(new_versions) | set(referee_versions)
+                if new_versions.get(name) != referee_versions.get(name)
+            }
+            if changed_referees:
+                referees_data = df
+                referee_versions = new_versions
+        elif sheet_name in teams_data:
+            removed_sheets = set(removed_sheets) | {sheet_name}
+    
+    # Rapporto qualità: sostituito per i fogli riletti, rimosso per quelli eliminati
+    quality_report = {**snapshot.quality_report, **predictor.quality_report}
+    for sheet_name in removed_sheets:
+        quality_report.pop(sheet_name, None)
+        if teams_data.pop(sheet_name, None) is not None:
+            sheet_versions.pop(sheet_name, None)
+            changed_teams.add(sheet_name)
+    
+    # Indice esteso (gli ID esistenti non cambiano) e colonna player_id sui soli fogli riletti
+    player_index = snapshot.player_index.copy()
+    for team in sorted(changed_teams & set(teams_data)):
+        teams_data[team]['player_id'] = player_index.add_team(team, teams_data[team]['Player'])
+    
+    new_snapshot = DataSnapshot(
+        teams_data=MappingProxyType(teams_data),
+        referees_data=referees_data,
+        player_index=player_index,
+        data_version=hashlib.sha1('|'.join(sorted(sheet_versions.values())).encode('utf-8')).hexdigest()[:16],
+        sheet_versions=MappingProxyType(sheet_versions),
+        referee_versions=MappingProxyType(referee_versions),
+        source_path=snapshot.source_path,
+        source_state=snapshot.source_state,
+        quality_report=MappingProxyType(quality_report),
+        message=f"{snapshot.message.split(' 🔄')[0]} 🔄 Aggiornati: {', '.join(sorted(changed_teams | ({'Arbitri'} if changed_referees else set()))) or 'nessun foglio'}."
+    )
+    return new_snapshot, changed_teams, changed_referees
+
+@st.cache_resource(max_entries=4)
+def load_partition_snapshot(league, season, version):
+    """
+    Snapshot di una partizione dell'archivio (lega, stagione), condiviso tra le sessioni.
+    I fogli squadra sono letti al primo accesso; `version` invalida la cache se la partizione cambia.
+    """
+    manifest, teams_data, referees_data, player_index = LeagueArchive().open_partition(league, season)
+    predictor = EnhancedMostroPredictor()
+    sheet_versions = {team: entry['versione'] for team, entry in manifest['squadre'].items()}
+    return DataSnapshot(
+        teams_data=teams_data,
+        referees_data=referees_data,
+        player_index=player_index,
+        data_version=manifest['versione'],
+        sheet_versions=MappingProxyType(sheet_versions),
+        referee_versions=MappingProxyType(predictor._referee_versions(referees_data)),
+        source_path=None,
+        source_state=None,
+        quality_report=MappingProxyType(manifest.get('qualita', {})),
+        message=f"🗂️ {league} {season}: **{len(teams_data)}** squadre dall'archivio (caricate al primo utilizzo)."
+    )
+
+@st.cache_resource
+def get_workbook_watcher(path, _shared_store, _source_state):
+    """Watcher di processo sul workbook: applica gli aggiornamenti parziali allo snapshot condiviso."""
+    watcher = WorkbookWatcher(path, *_source_state)
+    watcher.start(lambda changed, removed: _shared_store.apply_update(
+        lambda snapshot: update_workbook_snapshot(snapshot, changed, removed)
+    ))
+    return watcher
+
+@st.cache_resource(max_entries=8)
+def get_referee_team_matrix(base_dir, history_version):
+    """Matrice arbitro × squadra per una versione dello storico (condivisa tra le sessioni)."""
+    return RefereeTeamMatrix.for_history(MatchHistoryStore(base_dir))
+
+@st.cache_resource(max_entries=4)
+def load_lineups(_player_index, data_version, content):
+    """Formazioni probabili risolte sugli ID giocatore (una volta per file e versione dei dati)."""
+    return ProbableLineups.from_csv(io.BytesIO(content), _player_index)
+
+@st.cache_resource(max_entries=4)
+def load_odds(_player_index, data_version, content, file_name):
+    """Quote del bookmaker abbinate agli ID giocatore (una volta per file e versione dei dati)."""
+    return OddsBook.from_frame(read_odds_file(io.BytesIO(content), file_name), _player_index)
+
+@st.cache_resource(max_entries=4)
+def get_similarity_index(_predictor, data_version):
+    """Indice k-NN dei profili cartellini, costruito una volta per versione dei dati."""
+    return PlayerSimilarityIndex.from_teams_data(_predictor.teams_data, data_version)
+
+@st.cache_resource(max_entries=4)
+def get_league_risk_index(_predictor, _history, data_version, history_version, config_version):
+    """Indice del rischio di campionato, ricostruito a ogni nuova versione dei dati, dello storico o della configurazione."""
+    return LeagueRiskIndex.from_predictor(_predictor, _history)
+
+@st.cache_resource
+def get_shared_store():
+    """Archivio dati condiviso: una sola istanza per processo Streamlit."""
+    return SharedDataStore()
+
+@st.cache_resource
+def get_precomputer(_shared_store):
+    """Pool di precalcolo speculativo condiviso dalle sessioni (thread limitati)."""
+    return SpeculativePrecomputer(_shared_store)
+
+@st.cache_resource(max_entries=1)
+def get_match_history(rounds):
+    """Storico giornate condiviso, ricaricato solo quando cambiano le giornate su disco."""
+    return MatchHistoryStore()
+
+@st.cache_resource
+def get_state_store():
+    """Archivio SQLite dello stato: una sola istanza (e una sola inizializzazione) per processo."""
+    return StateStore()
+
+def render_app():
+    predictor = EnhancedMostroPredictor()
+    state_store = get_state_store()
+    shared_store = get_shared_store()
     
     # Inizializzazione Session State per persistenza dei dati e dello stato
     if 'excluded_players' not in st.session_state:
-        st.session_state.excluded_players = []
+        st.session_state.excluded_players = set() # ID giocatore (PlayerIndex)
     if 'prediction_ran' not in st.session_state:
         st.session_state.prediction_ran = False
     if 'df_prediction' not in st.session_state:
         st.session_state.df_prediction = pd.DataFrame()
     if 'prediction_error' not in st.session_state: # Nuovo stato per gli errori
         st.session_state.prediction_error = None
+    if 'session_token' not in st.session_state: # Identifica la sessione per il precalcolo
+        st.session_state.session_token = uuid.uuid4().hex
     if 'last_home_team' not in st.session_state:
         st.session_state.last_home_team = 'Seleziona Squadra'
         st.session_state.last_away_team = 'Seleziona Squadra'
@@ -418,20 +808,162 @@ def run_app():
         accept_multiple_files=True
     )
     
+    # Archivio partizionato (lega / stagione): si carica solo la partizione scelta
+    archive = LeagueArchive()
+    partitions = archive.partitions()
+    archive_box = st.sidebar.expander("🗂️ Archivio Campionati")
+    selected_partition = None
+    with archive_box:
+        if partitions:
+            labels = ["Workbook corrente"] + [f"{league} · {season}" for league, season in partitions]
+            choice = st.selectbox("Campionato", options=range(len(labels)), format_func=labels.__getitem__, key='partition')
+            selected_partition = partitions[choice - 1] if choice else None
+        else:
+            st.caption("Nessuna partizione archiviata.")
+    
     # Tenta caricamento manuale
     if uploaded_files:
         success, message = predictor.load_csv_data(uploaded_files) 
         st.sidebar.info(message)
+    elif selected_partition is not None:
+        league, season = selected_partition
+        manifest = archive.manifest(league, season)
+        snapshot = load_partition_snapshot(league, season, manifest['versione'] if manifest else None)
+        predictor.attach_snapshot(snapshot)
+        st.sidebar.info(snapshot.message)
     
-    # Tenta caricamento automatico
+    # Tenta caricamento automatico (snapshot condiviso da tutte le sessioni del processo)
     if not predictor.teams_data:
-        success_auto, message_auto = predictor.auto_load_excel_data()
-        st.sidebar.info(message_auto)
+        if st.sidebar.button("🔄 Ricarica file Excel"):
+            shared_store.reload(load_workbook_snapshot)
+        snapshot = shared_store.get_snapshot(load_workbook_snapshot)
+        if snapshot is not None:
+            watcher = get_workbook_watcher(snapshot.source_path, shared_store, snapshot.source_state)
+            predictor.attach_snapshot(snapshot)
+            st.sidebar.info(snapshot.message)
+            if watcher.last_error is not None:
+                failed_at, error = watcher.last_error
+                st.sidebar.error(f"⚠️ Aggiornamento automatico del workbook non riuscito ({time.strftime('%H:%M:%S', time.localtime(failed_at))}): {error}")
+        else:
+            st.sidebar.info("❌ Nessun file 'Il Mostro 5.0.xlsx' trovato nella directory o i dati non sono validi.")
+    
+    # Archiviazione dei dati correnti come partizione (lega, stagione)
+    if predictor.teams_data and selected_partition is None:
+        with archive_box:
+            col_league, col_season = st.columns(2)
+            archive_league = col_league.text_input("Lega", value=predictor.config.lega, key='archive_league')
+            archive_season = col_season.text_input("Stagione", value="2025-26", key='archive_season')
+            if st.button("💾 Archivia dati correnti") and archive_league.strip() and archive_season.strip():
+                try:
+                    manifest = archive.write_partition(
+                        archive_league.strip(), archive_season.strip(), predictor.teams_data,
+                        predictor.referees_data, source=predictor.source_path,
+                        quality_report=predictor.quality_report
+                    )
+                    st.success(f"Archiviate {len(manifest['squadre'])} squadre in {manifest['lega']} {manifest['stagione']}.")
+                except (OSError, ValueError) as e:
+                    st.warning(f"Archiviazione non riuscita: {e}")
+        
+    # --- Qualità Dati ---
+    if predictor.quality_report:
+        counts = severity_counts(predictor.quality_report)
+        with st.sidebar.expander(f"🩺 Qualità Dati ({counts['errore']} errori, {counts['avviso']} avvisi)"):
+            df_quality = report_frame(predictor.quality_report)
+            if df_quality.empty:
+                st.success("Nessun problema rilevato nei fogli caricati.")
+            else:
+                severity_filter = st.multiselect(
+                    "Gravità", options=list(counts), default=['errore', 'avviso'], key='quality_severity'
+                )
+                st.dataframe(df_quality[df_quality['gravita'].isin(severity_filter)], hide_index=True)
+            st.download_button(
+                "⬇️ Rapporto JSON",
+                data=report_json(dict(predictor.quality_report), predictor.data_version),
+                file_name="qualita_dati.json",
+                mime="application/json"
+            )
+        
+    # --- Storico Giornate ---
+    history = get_match_history(stored_rounds())
+    with st.sidebar.expander("📅 Storico Giornate"):
+        round_file = st.file_uploader(
+            "Aggiungi giornata (CSV: Squadra, Player, Minuti, Gialli, Rossi, Falli)",
+            type=['csv'],
+            key='round_file'
+        )
+        if round_file is not None and st.button("➕ Aggiungi allo storico"):
+            try:
+                giornata = history.append_round(pd.read_csv(round_file))
+                st.success(f"Giornata {giornata} aggiunta allo storico.")
+            except ValueError as e:
+                st.warning(str(e))
+        st.caption(f"Giornate nello storico: **{len(history.rounds)}**")
+    if not history.is_empty:
+        predictor.referee_team_matrix = get_referee_team_matrix(history.base_dir, history.version)
+    
+    # --- Formazioni Probabili ---
+    with st.sidebar.expander("📋 Formazioni Probabili"):
+        lineup_file = st.file_uploader(
+            "Formazioni della giornata (CSV: Squadra, Player, Minuti Attesi)",
+            type=['csv'],
+            key='lineup_file'
+        )
+        if lineup_file is not None and predictor.teams_data:
+            try:
+                predictor.lineups = load_lineups(predictor.player_index, predictor.data_version, lineup_file.getvalue())
+                st.caption(f"Squadre con formazione: **{len(predictor.lineups.covered_teams)}**")
+                if predictor.lineups.unmatched:
+                    st.warning(f"Giocatori non riconosciuti: {', '.join(predictor.lineups.unmatched[:10])}")
+            except (ValueError, pd.errors.ParserError) as e:
+                st.warning(f"Formazioni non valide: {e}")
+        else:
+            st.caption("Senza formazioni vengono considerati tutti i giocatori dei fogli.")
+    
+    # --- Quote Bookmaker (solo visualizzazione: le predizioni in cache non cambiano) ---
+    odds_book = None
+    with st.sidebar.expander("💶 Quote Bookmaker"):
+        odds_file = st.file_uploader(
+            "Quote 'ammonito' della giornata (CSV/JSON: Player, Squadra, Quota, Quota No)",
+            type=['csv', 'json'],
+            key='odds_file'
+        )
+        if odds_file is not None and predictor.teams_data:
+            try:
+                odds_book = load_odds(predictor.player_index, predictor.data_version, odds_file.getvalue(), odds_file.name)
+                st.caption(f"Giocatori quotati: **{odds_book.matched}**")
+                if odds_book.unmatched:
+                    st.warning(f"Giocatori non riconosciuti: {', '.join(odds_book.unmatched[:10])}")
+            except (ValueError, pd.errors.ParserError) as e:
+                st.warning(f"File quote non valido: {e}")
+    
+    # Scala della quota: singola partita o percentile sull'intero campionato.
+    # L'indice di lega legge tutte le squadre: si costruisce solo se la scala di campionato è scelta
+    quota_mode = st.sidebar.radio(
+        "📏 Scala Quota (%)", options=list(QUOTA_MODES),
+        index=QUOTA_MODES.index(predictor.QUOTA_MODALITA),
+        format_func={'partita': "Partita (max della partita)", 'lega': "Campionato (percentile)"}.get,
+        key='quota_mode'
+    )
+    if quota_mode == 'lega' and predictor.teams_data and predictor.data_version:
+        predictor.risk_index = get_league_risk_index(
+            predictor, history, predictor.data_version, history.version,
+            f"{predictor.config.fingerprint}-{predictor.formula_version}"
+        )
+    
+    # Profilazione dei rerun (rapporti in 'profili/'); contesto salvato con ogni profilo
+    st.sidebar.toggle("🧪 Profilazione (cProfile + tracemalloc)", key='profiling')
+    st.session_state.run_context = {
+        'data_version': predictor.data_version,
+        'history_version': history.version,
+        'lineups_version': predictor.lineups.version if predictor.lineups is not None else None,
+        'config': predictor.config.source_path,
+        'quota_mode': quota_mode,
+    }
         
     team_names = sorted(list(predictor.teams_data.keys()))
     
     referee_names = ['Arbitro Non Caricato']
-    referee_col = next((col for col in predictor.referees_data.columns if 'nome' in col.lower() or 'arbitro' in col.lower()), None)
+    referee_col = referee_name_column(predictor.referees_data)
     
     # Controlla ref_col prima di usarlo per filtrare i nomi
     if not predictor.referees_data.empty and referee_col:
@@ -459,6 +991,23 @@ def run_app():
 
     # --- LOGICA DI RESET E TASTO DI AVVIO ---
     
+    # Versione dei dati della partita: fogli coinvolti + storico giornate (il ritardo dipende da entrambi)
+    data_version = fixture_result_version(predictor, selected_home, selected_away, selected_referee, history)
+    fixture_key = make_fixture_key(selected_home, selected_away, selected_referee)
+    
+    # Precalcolo speculativo delle partite probabili (trasferte e arbitri) nella cache condivisa
+    speculative = likely_fixtures(selected_home, selected_away, selected_referee, team_names, referee_names)
+    if speculative:
+        get_precomputer(shared_store).schedule(
+            st.session_state.session_token,
+            (selected_home, selected_away, selected_referee, data_version),
+            (
+                (fixture_result_version(predictor, home, away, ref, history), make_fixture_key(home, away, ref),
+                 lambda home=home, away=away, ref=ref: predictor.predict_fixture(home, away, ref, history))
+                for home, away, ref in speculative
+            )
+        )
+    
     # Logica di reset: se le selezioni principali sono cambiate, resetta lo stato
     if selected_home != st.session_state.last_home_team or \
        selected_away != st.session_state.last_away_team or \
@@ -468,7 +1017,17 @@ def run_app():
             st.session_state.prediction_ran = False
             st.session_state.df_prediction = pd.DataFrame()
             st.session_state.prediction_error = None
-            st.session_state.excluded_players = []
+            
+            # Ripristino dello stato persistente (esclusioni e predizione in cache)
+            st.session_state.excluded_players = state_store.load_exclusions(fixture_key, predictor.player_index)
+            cached = shared_store.get_result(data_version, fixture_key, include_speculative=False)
+            if cached is None:
+                cached = state_store.load_prediction(data_version, fixture_key)
+                if cached is not None:
+                    shared_store.put_result(data_version, fixture_key, cached)
+            if cached is not None:
+                st.session_state.df_prediction, st.session_state.ref_factor, st.session_state.ref_category, st.session_state.prediction_error = cached
+                st.session_state.prediction_ran = True
             
         st.session_state.last_home_team = selected_home
         st.session_state.last_away_team = selected_away
@@ -483,42 +1042,27 @@ def run_app():
         # Pulsante che attiva il calcolo e aggiorna lo stato
         if st.button("▶️ **Avvia Predizione e Calcolo Ritardo**", type="primary"):
             
-            # 1. Preparazione e Calcolo
-            min_quota_perc = predictor.QUOTA_MINIMA 
-            ref_factor, ref_category, ref_stats = predictor.calculate_referee_factor(selected_referee)
-            
-            df_home = predictor.teams_data.get(selected_home, pd.DataFrame()).copy()
-            df_away = predictor.teams_data.get(selected_away, pd.DataFrame()).copy()
-            
-            df_home['Squadra'] = selected_home
-            df_away['Squadra'] = selected_away
-            df_all_players = pd.concat([df_home, df_away], ignore_index=True)
+            # 1. Calcolo (o recupero dalla cache condivisa tra le sessioni)
+            result = shared_store.get_result(data_version, fixture_key)
+            # Un risultato precalcolato in background diventa definitivo e va salvato
+            store_result = result is None or shared_store.is_speculative(data_version, fixture_key)
+            if result is None:
+                result = predictor.predict_fixture(selected_home, selected_away, selected_referee, history)
+            if store_result and not result[0].empty:
+                shared_store.put_result(data_version, fixture_key, result)
+                state_store.save_prediction(data_version, fixture_key, *result)
             
-            # --- CHECK CRITICO DATI RITARDO ---
-            RITARDO_COL_NAME = 'Ritardo Cartellino (Partite)'
+            df_prediction_result, ref_factor, ref_category, error_msg = result
+            st.session_state.prediction_error = error_msg
+            st.session_state.prediction_ran = True
             
-            # Assicurati che la colonna esista nel DF combinato PRIMA di calcolare
-            if RITARDO_COL_NAME not in df_all_players.columns:
-                st.session_state.prediction_ran = True 
+            if df_prediction_result.empty and error_msg:
                 st.session_state.df_prediction = pd.DataFrame() 
-                st.session_state.prediction_error = f"❌ **ERRORE DATI CRITICI RITARDO:** La colonna '{RITARDO_COL_NAME}' è **mancante** in almeno uno dei fogli squadra. Assicurati che il nome sia corretto (case-sensitive)."
                 st.rerun()
                 return
-                
-            # Assicurati che il dato non sia composto solo da zeri/NaN
-            ritardo_data = pd.to_numeric(df_all_players[RITARDO_COL_NAME], errors='coerce').fillna(0)
-            if ritardo_data.sum() == 0 and ritardo_data.count() > 0:
-                 st.session_state.prediction_ran = True 
-                 st.session_state.df_prediction = pd.DataFrame() 
-                 st.session_state.prediction_error = f"⚠️ **AVVISO DATI RITARDO:** La colonna '{RITARDO_COL_NAME}' è presente ma contiene solo valori zero. Il calcolo del Ritardo non sarà efficace."
-                 # Continua il calcolo ma avvisa
-
-            # 2. Esecuzione Calcolo Predizione
-            df_prediction_result = predictor.calculate_enhanced_prediction(df_all_players, 'Home', ref_factor, min_quota_perc)
             
             # Salva il risultato nel Session State
             st.session_state.df_prediction = df_prediction_result
-            st.session_state.prediction_ran = True
             st.session_state.ref_factor = ref_factor
             st.session_state.ref_category = ref_category
             
@@ -540,14 +1084,48 @@ def run_app():
             st.header(f"🔮 Risultati Predizione: {st.session_state.last_home_team} vs {st.session_state.last_away_team}")
             st.info(f"Fattore Severità Arbitro **{st.session_state.last_referee}**: **{st.session_state.ref_category}** (Fattore: {st.session_state.ref_factor:.2f})")
             
-            # Recupera il df dal session state
-            df_prediction = st.session_state.df_prediction.copy()
+            # Recupera il df dal session state (quota nella scala scelta)
+            df_prediction = apply_quota_mode(predictor.add_league_columns(st.session_state.df_prediction), quota_mode).copy()
+            if odds_book is not None:
+                df_prediction = odds_book.value_columns(
+                    df_prediction, predictor.CARTELLINI_PER_PARTITA * st.session_state.ref_factor
+                )
+            
+            # Fattore per squadra se lo storico indica un'interazione arbitro-squadra
+            if 'Fattore Arbitro Squadra' in df_prediction.columns:
+                team_factors = df_prediction.groupby('Squadra', sort=False)['Fattore Arbitro Squadra'].first()
+                if not np.allclose(team_factors.to_numpy(), st.session_state.ref_factor):
+                    st.caption("Fattore arbitro per squadra (storico arbitro-squadra): " + ", ".join(
+                        f"**{team}** {factor:.2f}" for team, factor in team_factors.items()
+                    ))
             
-            # 4. Applicazione Logica di Esclusione
+            # 4. Applicazione Logica di Esclusione (maschera vettoriale sugli ID)
+            excluded_mask = predictor.player_index.mask(df_prediction['player_id'], st.session_state.excluded_players)
             if st.session_state.excluded_players:
-                df_prediction_filtered = df_prediction[~df_prediction['Player'].isin(st.session_state.excluded_players)]
-                exclusion_list = [f"**{p}**" for p in st.session_state.excluded_players]
+                df_prediction_filtered = df_prediction[~excluded_mask]
+                exclusion_list = [f"**{predictor.player_index.names[p]}**" for p in sorted(st.session_state.excluded_players) if p < len(predictor.player_index)]
                 st.warning(f"❌ Giocatori attualmente esclusi: {', '.join(exclusion_list)}.")
+                
+                # Profili simili agli esclusi in tutto il campionato (chi gioca questa partita è evidenziato)
+                with st.expander("🔍 Giocatori con profilo simile agli esclusi"):
+                    # Con una partizione dell'archivio l'indice caricherebbe tutte le squadre: solo su richiesta
+                    lazy_partition = isinstance(predictor.teams_data, LazyTeamFrames)
+                    search = not lazy_partition or st.toggle(
+                        "Cerca in tutto il campionato (carica tutte le squadre della partizione)", key='similar_search'
+                    )
+                    similarity_index = get_similarity_index(predictor, predictor.data_version) if search else None
+                    in_match = set(df_prediction['player_id'].astype(int))
+                    for player_id in (sorted(st.session_state.excluded_players) if search else []):
+                        similar = similarity_index.neighbours(player_id, k=5)
+                        if similar.empty:
+                            continue
+                        st.markdown(f"**{predictor.player_index.names[player_id]}**")
+                        st.dataframe(
+                            similar.assign(**{'In Partita': np.where(similar['player_id'].isin(in_match), '✅', '')})
+                            .drop(columns='player_id'),
+                            column_config=number_column_config({**RANKING_FORMATS, 'Distanza': "%.2f"}),
+                            hide_index=True
+                        )
             else:
                 df_prediction_filtered = df_prediction.copy()
 
@@ -578,6 +1156,7 @@ def run_app():
                 
                 for i, (index, row) in enumerate(df_top_4.iterrows()):
                     player_name = row['Player']
+                    player_id = int(row['player_id'])
                     
                     col_i = st.columns([0.5, 2.5, 1, 1.5, 1])
                     
@@ -596,16 +1175,57 @@ def run_app():
                     with col_i[4]:
                         if st.button(
                             "❌ Escludi", 
-                            key=f'exclude_{player_name}_{i}'
+                            key=f'exclude_{player_id}'
                         ):
-                            if player_name in st.session_state.excluded_players:
-                                st.session_state.excluded_players.remove(player_name)
-                            else:
-                                st.session_state.excluded_players.append(player_name)
+                            # Toggle O(1) sull'insieme degli ID esclusi
+                            st.session_state.excluded_players ^= {player_id}
+                            state_store.save_exclusions(fixture_key, st.session_state.excluded_players, predictor.player_index)
                             
                             st.rerun()
                     
                 st.markdown("---")
+                
+                # --- SEZIONE 1B: SIMULAZIONE MONTE CARLO ---
+                if not df_top_4.empty:
+                    st.subheader("🎲 Simulazione Monte Carlo (100.000 partite)")
+                    
+                    simulation = simulate_fixture(
+                        df_prediction_filtered, df_top_4, st.session_state.ref_factor,
+                        n_sims=100_000, cards_per_match=predictor.CARTELLINI_PER_PARTITA
+                    )
+                    top_k = len(df_top_4)
+                    
+                    sim_cols = st.columns(4)
+                    sim_cols[0].metric("Cartellini attesi", f"{simulation.expected(simulation.total_cards):.2f}")
+                    sim_cols[1].metric(f"Almeno 2 del Top {top_k}", f"{simulation.prob_at_least(simulation.top_k_hits, 2) * 100:.1f}%")
+                    sim_cols[2].metric(f"Almeno 3 del Top {top_k}", f"{simulation.prob_at_least(simulation.top_k_hits, 3) * 100:.1f}%")
+                    sim_cols[3].metric(f"Tutti i {top_k} del Top {top_k}", f"{simulation.prob_at_least(simulation.top_k_hits, top_k) * 100:.1f}%")
+                    
+                    max_cards = 12
+                    fig_sim = go.Figure()
+                    for team_name, distribution in simulation.team_cards.items():
+                        fig_sim.add_trace(go.Bar(
+                            x=list(range(max_cards + 1)),
+                            y=distribution[:max_cards + 1] * 100,
+                            name=f"{team_name} (attesi {simulation.expected(distribution):.2f})"
+                        ))
+                    fig_sim.add_trace(go.Scatter(
+                        x=list(range(max_cards + 1)),
+                        y=simulation.total_cards[:max_cards + 1] * 100,
+                        mode='lines+markers',
+                        name='Totale partita'
+                    ))
+                    fig_sim.update_layout(
+                        xaxis_title='Numero di cartellini',
+                        yaxis_title='Probabilità (%)',
+                        barmode='group',
+                        template='plotly_white',
+                        height=350
+                    )
+                    st.plotly_chart(fig_sim, use_container_width=True)
+                    st.caption(f"Probabilità per giocatore ricavate dal **Rischio Finale** e dai cartellini attesi con questo arbitro. Tempo di simulazione: {simulation.elapsed * 1000:.0f} ms.")
+                    
+                    st.markdown("---")
 
                 # --- SEZIONE 2: CLASSIFICA RITARDO CARTELLINO ---
                 st.subheader("⏰ Classifica Ritardo Cartellino (Giocatori 'in debito')")
@@ -616,9 +1236,8 @@ def run_app():
                 
                 if not df_delay.empty:
                     st.dataframe(
-                        df_delay[['Player', 'Squadra', 'Pos', 'Ritardo (Partite)', 'Gialli Tot.']].style.format({
-                            'Ritardo (Partite)': "{:.2f}"
-                        }), 
+                        df_delay[['Player', 'Squadra', 'Pos', 'Ritardo (Partite)', 'Gialli Tot.']],
+                        column_config=number_column_config({'Ritardo (Partite)': "%.2f"}),
                         use_container_width=True,
                         hide_index=True
                     )
@@ -632,24 +1251,31 @@ def run_app():
                 st.subheader("Classifica Completa Rischio Cartellini (Tutti i Giocatori)")
                 
                 display_cols = ['Player', 'Squadra', 'Pos', 'Quota (%)', 'Rischio Finale', 'Media 90s/Giallo', 'Media Falli/Giallo', 'Ritardo (Partite)', 'Gialli Tot.']
+                if 'Percentile Lega' in df_prediction.columns:
+                    display_cols.insert(4, 'Percentile Lega')
+                if odds_book is not None:
+                    display_cols += VALUE_COLUMNS
                 
                 display_df = df_prediction[display_cols].copy().rename(columns={
                     'Rischio Finale': 'Rischio'
                 })
                 
-                display_df.insert(0, 'Escluso', display_df['Player'].apply(lambda x: '❌' if x in st.session_state.excluded_players else ''))
-
-                st.dataframe(
-                    display_df.style.format({
-                        'Quota (%)': "{:.2f}", 
-                        'Rischio': "{:.3f}", 
-                        'Media 90s/Giallo': "{:.2f}",
-                        'Media Falli/Giallo': "{:.2f}",
-                        'Ritardo (Partite)': "{:.2f}"
-                    }), 
-                    use_container_width=True,
-                    hide_index=True
+                display_df.insert(0, 'Escluso', np.where(excluded_mask, '❌', ''))
+
+                # Ordinamento, filtri e pagine lato server: al browser arriva solo la pagina visibile
+                paginated_dataframe(
+                    display_df,
+                    key='ranking',
+                    column_config=number_column_config(RANKING_FORMATS),
+                    search_cols=('Player',),
+                    filter_cols=('Squadra',),
+                    default_sort='Rischio'
                 )
+                
+                # --- SEZIONE 4: TREND STORICO ---
+                if not history.is_empty:
+                    st.markdown("---")
+                    st.plotly_chart(create_timeline_chart(df_prediction, history), use_container_width=True)
             
             else:
                 st.warning("Nessun giocatore rientra nei criteri di Quota Minima o la classifica è vuota.")
@@ -657,6 +1283,100 @@ def run_app():
     else:
         st.info("Seleziona la squadra di casa, quella in trasferta e l'arbitro (e assicurati che le squadre siano diverse) e premi il tasto Avvia Predizione.")
 
+    # --- ESPORTAZIONE GIORNATA ---
+    if team_names and referee_names != ['Arbitro Non Caricato']:
+        st.markdown("---")
+        with st.expander("📤 Esporta Predizioni Giornata"):
+            default_round = pd.DataFrame(
+                [[selected_home, selected_away, selected_referee]] if is_ready_to_run else [],
+                columns=['Casa', 'Trasferta', 'Arbitro']
+            )
+            df_round = st.data_editor(
+                default_round,
+                num_rows="dynamic",
+                hide_index=True,
+                key='export_round',
+                column_config={
+                    'Casa': st.column_config.SelectboxColumn("Casa", options=team_names, required=True),
+                    'Trasferta': st.column_config.SelectboxColumn("Trasferta", options=team_names, required=True),
+                    'Arbitro': st.column_config.SelectboxColumn("Arbitro", options=referee_names, required=True),
+                }
+            )
+            export_format = st.radio("Formato", options=list(EXPORT_FORMATS), horizontal=True, key='export_format')
+            
+            fixtures = [
+                (row['Casa'], row['Trasferta'], row['Arbitro'])
+                for _, row in df_round.dropna().iterrows() if row['Casa'] != row['Trasferta']
+            ]
+            if st.button("📦 Genera file", disabled=not fixtures):
+                # Scrittura su file temporaneo, una partita alla volta
+                export_path = os.path.join(tempfile.mkdtemp(prefix='mostro_export_'), f"predizioni_giornata.{export_format}")
+                n_exported = export_round(
+                    iter_round_predictions(predictor, fixtures, history, shared_store, quota_mode), export_path, export_format
+                )
+                st.session_state.export_file = (export_path, n_exported)
+            
+            if st.session_state.get('export_file'):
+                export_path, n_exported = st.session_state.export_file
+                if os.path.exists(export_path):
+                    st.caption(f"{n_exported} partite esportate.")
+                    with open(export_path, 'rb') as f:
+                        st.download_button("⬇️ Scarica", data=f, file_name=os.path.basename(export_path))
+        
+        # --- SELEZIONE GIORNATA ---
+        with st.expander("🎯 Migliori Ammoniti della Giornata"):
+            st.caption("Scelte sulle partite inserite in 'Esporta Predizioni Giornata', con i giocatori esclusi rimossi.")
+            col_n, col_match, col_team, col_quota = st.columns(4)
+            n_picks = col_n.number_input("Scelte", min_value=1, max_value=20, value=4, key='round_picks')
+            max_per_match = col_match.number_input("Max per partita", min_value=1, max_value=6, value=2, key='round_max_match')
+            max_per_team = col_team.number_input("Max per squadra", min_value=1, max_value=6, value=1, key='round_max_team')
+            min_quota = col_quota.number_input("Quota minima (%)", min_value=0.0, value=float(predictor.QUOTA_MINIMA), step=0.5, key='round_min_quota')
+            
+            if st.button("🎯 Calcola selezione", disabled=not fixtures):
+                candidates = round_candidates(
+                    iter_round_predictions(predictor, fixtures, history, shared_store, quota_mode),
+                    predictor.CARTELLINI_PER_PARTITA
+                )
+                st.session_state.round_picks_result = optimise_round(
+                    candidates, int(n_picks), int(max_per_match), int(max_per_team),
+                    excluded_ids=st.session_state.excluded_players, min_quota=min_quota
+                )
+            
+            round_result = st.session_state.get('round_picks_result')
+            if round_result is not None:
+                if round_result.picks.empty:
+                    st.warning("Nessun giocatore rispetta i vincoli scelti.")
+                else:
+                    col_prob, col_hits = st.columns(2)
+                    col_prob.metric("Probabilità combinata", f"{round_result.combined_probability:.2%}")
+                    col_hits.metric("Ammoniti attesi", f"{round_result.expected_hits:.2f} su {len(round_result.picks)}")
+                    st.dataframe(
+                        round_result.picks,
+                        column_config={
+                            **number_column_config(RANKING_FORMATS),
+                            'Probabilità': st.column_config.NumberColumn('Probabilità', format="%.3f"),
+                        },
+                        hide_index=True
+                    )
+                    note = "" if round_result.exact else " ⚠️ Una squadra compare in più partite: selezione non garantita ottimale."
+                    st.caption(f"{round_result.candidates} candidati · {round_result.elapsed * 1000:.1f} ms.{note}")
+
+
+def run_app():
+    """Esegue un rerun dell'app, profilato se richiesto da MOSTRO_PROFILE o dall'interruttore nella sidebar."""
+    if not (profiling_enabled() or st.session_state.get('profiling')):
+        render_app()
+        return
+    
+    with profile_session('rerun') as run:
+        try:
+            render_app()
+        finally:
+            run.metadata.update(st.session_state.get('run_context', {}))
+            run.metadata.update({
+                key: st.session_state.get(key) for key in ('home_team', 'away_team', 'referee', 'prediction_ran')
+            })
+    st.sidebar.caption(f"🧪 Profilo salvato: `{run.paths['prof']}` ({run.elapsed * 1000:.0f} ms)")
 
 if __name__ == '__main__':
     run_app()
@@ -0,0 +1,109 @@
+"""
+Quote dei bookmaker per il mercato "giocatore ammonito" (CSV o JSON per giornata).
+
+Le quote sono abbinate ai giocatori tramite PlayerIndex (squadra + nome
+normalizzato, o solo nome se la squadra manca ed è univoco) e salvate in array
+indicizzati per ID: per una classifica si leggono con un'unica operazione.
+Probabilità implicita = 1 / quota; il margine si toglie con la quota
+"non ammonito" se presente (mercato a due vie), altrimenti con un margine
+forfettario. Il confronto è con la probabilità di ammonizione del Mostro
+(risk_to_probability), non con la 'Quota (%)', che è una scala relativa.
+"""
+import json
+import numpy as np
+import pandas as pd
+
+from monte_carlo import risk_to_probability
+from schema import PLAYER, TEAM, apply_schema
+from shared_store import frame_version
+
+ODDS_YES = 'Quota Ammonito'
+ODDS_NO = 'Quota Non Ammonito'
+DEFAULT_MARGIN = 0.07 # Margine tipico del mercato ammonito senza quota contraria
+VALUE_COLUMNS = ['Quota Book', 'Prob. Book (%)', 'Prob. Mostro (%)', 'Edge (%)', 'Valore Atteso']
+
+
+def fair_probability(odds_yes, odds_no=None, margin=DEFAULT_MARGIN):
+    """Probabilità senza margine: normalizzazione a due vie se c'è la quota contraria, altrimenti margine forfettario."""
+    implied_yes = 1.0 / np.asarray(odds_yes, dtype=float)
+    flat = implied_yes / (1.0 + margin)
+    if odds_no is None:
+        return flat
+    implied_no = 1.0 / np.asarray(odds_no, dtype=float)
+    two_way = implied_yes / (implied_yes + implied_no)
+    return np.where(np.isfinite(implied_no) & (implied_no > 0), two_way, flat)
+
+
+def read_odds_file(file, name=''):
+    """DataFrame delle quote da CSV o JSON (lista di righe o {"quote": [...]})."""
+    if str(name).lower().endswith('.json'):
+        data = json.load(file)
+        return pd.DataFrame(data.get('quote', []) if isinstance(data, dict) else data)
+    return pd.read_csv(file)
+
+
+class OddsBook:
+    """Quote e probabilità senza margine per ID giocatore (NaN se il giocatore non è quotato)."""
+
+    def __init__(self, odds_by_id, fair_by_id, unmatched=(), version=''):
+        self.odds_by_id = odds_by_id
+        self.fair_by_id = fair_by_id
+        self.unmatched = list(unmatched)
+        self.version = version
+
+    @property
+    def matched(self):
+        return int(np.count_nonzero(~np.isnan(self.odds_by_id)))
+
+    @classmethod
+    def from_frame(cls, df_odds, player_index, margin=DEFAULT_MARGIN):
+        df = apply_schema(df_odds, 'odds')
+        missing = [col for col in (PLAYER, ODDS_YES) if col not in df.columns]
+        if missing:
+            raise ValueError(f"Colonne mancanti nel file quote: {missing}")
+        odds_yes = pd.to_numeric(df[ODDS_YES], errors='coerce').to_numpy(dtype=float)
+        valid = odds_yes > 1.0
+        df, odds_yes = df[valid], odds_yes[valid]
+        if df.empty:
+            raise ValueError("Il file quote non contiene quote valide (maggiori di 1).")
+
+        odds_no = pd.to_numeric(df[ODDS_NO], errors='coerce').to_numpy(dtype=float) if ODDS_NO in df.columns else None
+        fair = fair_probability(odds_yes, odds_no, margin)
+
+        if TEAM in df.columns:
+            ids = player_index.lookup_many(df[TEAM], df[PLAYER])
+        else:
+            ids = np.full(len(df), -1, dtype=np.int64)
+        # Senza squadra (o squadra scritta diversamente) si prova il solo nome, se univoco
+        no_team = ids < 0
+        if no_team.any():
+            ids[no_team] = player_index.lookup_names(df[PLAYER].to_numpy()[no_team])
+
+        known = ids >= 0
+        odds_by_id = np.full(len(player_index) + 1, np.nan)
+        fair_by_id = np.full(len(player_index) + 1, np.nan)
+        odds_by_id[ids[known]] = odds_yes[known]
+        fair_by_id[ids[known]] = fair[known]
+        unmatched = [str(name) for name in df[PLAYER].to_numpy()[~known]]
+        return cls(odds_by_id, fair_by_id, unmatched, frame_version(df))
+
+    def _gather(self, values, player_ids):
+        ids = pd.Series(player_ids).fillna(-1).to_numpy(dtype=np.int64)
+        ids = np.where((ids >= 0) & (ids < len(values) - 1), ids, -1)
+        return values[ids]
+
+    def value_columns(self, df_prediction, expected_cards):
+        """
+        Classifica con quota del bookmaker, probabilità senza margine, probabilità del Mostro,
+        edge (differenza in punti percentuali) e valore atteso per unità puntata.
+        """
+        odds = self._gather(self.odds_by_id, df_prediction['player_id'])
+        fair = self._gather(self.fair_by_id, df_prediction['player_id'])
+        model = risk_to_probability(df_prediction['Rischio Finale'].to_numpy(), expected_cards)
+        return df_prediction.assign(**{
+            'Quota Book': odds,
+            'Prob. Book (%)': fair * 100,
+            'Prob. Mostro (%)': model * 100,
+            'Edge (%)': (model - fair) * 100,
+            'Valore Atteso': model * odds - 1.0,
+        })
@@ -0,0 +1,109 @@
+import re
+import hashlib
+import unicodedata
+import numpy as np
+import pandas as pd
+
+
+def normalize_name(name):
+    """Normalizza un nome per il confronto: senza accenti, minuscolo, punteggiatura come spazio."""
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r'[^0-9a-z]+', ' ', text.lower())
+    return ' '.join(text.split())
+
+
+class PlayerIndex:
+    """
+    Indice stabile dei giocatori: (squadra, nome normalizzato) -> ID intero.
+    Costruito al caricamento dei dati; gli ID sono deterministici a parità di dati.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        self.teams = []
+        self.keys = []
+        self._version = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def copy(self):
+        """Copia indipendente: gli ID esistenti restano invariati, i nuovi vengono accodati."""
+        index = PlayerIndex()
+        index.ids = dict(self.ids)
+        index.names = list(self.names)
+        index.teams = list(self.teams)
+        index.keys = list(self.keys)
+        return index
+
+    @classmethod
+    def from_teams_data(cls, teams_data):
+        """Costruisce l'indice e aggiunge la colonna 'player_id' a ogni foglio squadra."""
+        index = cls()
+        for team in sorted(teams_data):
+            df_team = teams_data[team]
+            if 'Player' not in df_team.columns:
+                continue
+            df_team['player_id'] = index.add_team(team, df_team['Player'])
+        return index
+
+    @property
+    def version(self):
+        """Hash della numerazione (ID -> squadra|nome): cambia se un giocatore viene aggiunto o rinominato."""
+        if self._version is None:
+            digest = hashlib.sha1('\n'.join('|'.join(key) for key in self.keys).encode('utf-8'))
+            self._version = digest.hexdigest()[:16]
+        return self._version
+
+    def add_team(self, team, players):
+        """Registra i giocatori di una squadra e restituisce i loro ID."""
+        self._version = None
+        team_key = normalize_name(team)
+        ids = np.empty(len(players), dtype=np.int64)
+        seen = {}
+        for i, name in enumerate(players):
+            name_key = normalize_name(name)
+            # Omonimi nella stessa squadra: suffisso progressivo
+            seen[name_key] = seen.get(name_key, 0) + 1
+            if seen[name_key] > 1:
+                name_key = f"{name_key} #{seen[name_key]}"
+
+            key = (team_key, name_key)
+            if key not in self.ids:
+                self.ids[key] = len(self.names)
+                self.names.append(str(name))
+                self.teams.append(str(team))
+                self.keys.append(key)
+            ids[i] = self.ids[key]
+        return ids
+
+    def lookup(self, team, name):
+        """ID del giocatore o -1 se non presente."""
+        return self.ids.get((normalize_name(team), normalize_name(name)), -1)
+
+    def lookup_many(self, teams, names):
+        """ID per coppie (squadra, nome); -1 per i giocatori non presenti."""
+        return np.array([self.lookup(t, n) for t, n in zip(teams, names)], dtype=np.int64)
+
+    def lookup_names(self, names):
+        """ID per solo nome (qualsiasi squadra); -1 se assente o presente in più squadre."""
+        by_name = {}
+        for player_id, (_, name_key) in enumerate(self.keys):
+            by_name[name_key] = -1 if name_key in by_name else player_id
+        return np.array([by_name.get(normalize_name(n), -1) for n in names], dtype=np.int64)
+
+    def key_of(self, player_id):
+        """Chiave testuale stabile 'squadra|nome' di un ID."""
+        return '|'.join(self.keys[player_id])
+
+    def mask(self, player_ids, selected_ids):
+        """Maschera booleana vettoriale: True per gli ID presenti in `selected_ids`."""
+        bitmask = np.zeros(len(self) + 1, dtype=bool)
+        valid = [i for i in selected_ids if 0 <= i < len(self)]
+        if valid:
+            bitmask[valid] = True
+        # -1 (giocatore sconosciuto) punta all'ultima cella, sempre False
+        player_ids = pd.Series(player_ids).fillna(-1).to_numpy(dtype=np.int64)
+        return bitmask[player_ids]
@@ -0,0 +1,155 @@
+"""
+Precalcolo speculativo delle predizioni in background.
+
+Appena l'utente sceglie la squadra di casa le combinazioni possibili
+(trasferta, arbitro) sono poche: un pool di thread limitato le calcola e le
+mette nella cache risultati condivisa, così il tasto "Avvia Predizione" trova
+quasi sempre il risultato pronto. Quando la selezione cambia i job non ancora
+partiti vengono annullati; quelli già in corso terminano (pochi millisecondi)
+e il loro risultato resta comunque valido in cache. Le sessioni chiuse senza
+annullare (Streamlit non lo segnala) vengono dimenticate dopo `session_ttl` secondi
+di inattività, a job terminati.
+"""
+import time
+import logging
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_TEAM = 'Seleziona Squadra'
+PLACEHOLDER_REFEREE = 'Arbitro Non Caricato'
+
+
+def likely_fixtures(home, away, referee, team_names, referee_names):
+    """
+    Partite probabili dalla selezione corrente, le più vicine per prime:
+    la partita selezionata, poi le altre trasferte con lo stesso arbitro,
+    poi gli altri arbitri per la coppia scelta.
+    """
+    if home == PLACEHOLDER_TEAM:
+        return []
+    referees = [r for r in referee_names if r != PLACEHOLDER_REFEREE]
+    if referee not in referees:
+        return []
+    away_teams = [t for t in team_names if t != home]
+
+    fixtures = []
+    if away in away_teams:
+        fixtures.append((home, away, referee))
+    fixtures += [(home, t, referee) for t in away_teams if t != away]
+    if away in away_teams:
+        fixtures += [(home, away, r) for r in referees if r != referee]
+    return fixtures
+
+
+class SpeculativePrecomputer:
+    """
+    Pool di thread per il precalcolo, con una sola selezione attiva per sessione.
+    I risultati sono salvati come speculativi in SharedDataStore.
+    """
+
+    def __init__(self, shared_store, max_workers=2, max_jobs=48, max_pending=256, session_ttl=1800):
+        self.shared_store = shared_store
+        self.max_jobs = max_jobs
+        self.max_pending = max_pending
+        self.session_ttl = session_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mostro-precompute')
+        self._lock = threading.Lock()
+        self._sessions = {} # sessione -> (selezione, generazione, futures, ultimo utilizzo)
+        self.stats = {'submitted': 0, 'computed': 0, 'cached': 0, 'cancelled': 0, 'stale': 0, 'evicted': 0, 'failed': 0}
+        self.last_error = None # (timestamp, messaggio) dell'ultimo precalcolo fallito
+
+    def _pending(self):
+        return sum(not f.done() for _, _, futures, _ in self._sessions.values() for f in futures)
+
+    def _evict_idle(self, now):
+        """Dimentica le sessioni inattive da oltre session_ttl con tutti i job terminati (chiamare con il lock)."""
+        idle = [
+            session_id for session_id, (_, _, futures, touched) in self._sessions.items()
+            if now - touched > self.session_ttl and all(f.done() for f in futures)
+        ]
+        for session_id in idle:
+            del self._sessions[session_id]
+        self.stats['evicted'] += len(idle)
+
+    def schedule(self, session_id, selection, jobs):
+        """
+        Sostituisce i job della sessione. jobs: iterabile di (data_version, fixture_key, compute),
+        dove compute() restituisce il risultato di predict_fixture. Con la stessa selezione non fa nulla.
+        Restituisce il numero di job accodati.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._evict_idle(now)
+            current = self._sessions.get(session_id)
+            if current is not None and current[0] == selection:
+                self._sessions[session_id] = current[:3] + (now,)
+                return 0
+            generation = current[1] + 1 if current is not None else 1
+            if current is not None:
+                self.stats['cancelled'] += sum(f.cancel() for f in current[2])
+
+            budget = max(0, min(self.max_jobs, self.max_pending - self._pending()))
+            # Generazione registrata prima dell'invio: un job avviato subito la trova già corrente
+            futures = []
+            self._sessions[session_id] = (selection, generation, futures, now)
+            futures.extend(
+                self._executor.submit(self._run, session_id, generation, data_version, fixture_key, compute)
+                for data_version, fixture_key, compute in islice(jobs, budget)
+            )
+            self.stats['submitted'] += len(futures)
+            return len(futures)
+
+    def cancel(self, session_id):
+        """Annulla i job in attesa della sessione e la dimentica."""
+        with self._lock:
+            current = self._sessions.pop(session_id, None)
+            if current is not None:
+                self.stats['cancelled'] += sum(f.cancel() for f in current[2])
+
+    def _is_current(self, session_id, generation):
+        current = self._sessions.get(session_id)
+        return current is not None and current[1] == generation
+
+    def _run(self, session_id, generation, data_version, fixture_key, compute):
+        if not self._is_current(session_id, generation):
+            self.stats['stale'] += 1
+            return
+        if self.shared_store.get_result(data_version, fixture_key) is not None:
+            self.stats['cached'] += 1
+            return
+
+        try:
+            result = compute()
+        except Exception as e:
+            # Nessuno legge la future di un job speculativo: l'errore va contato e registrato qui
+            # (una volta per messaggio, come il watcher del workbook)
+            message = f"{type(e).__name__}: {e}"
+            with self._lock:
+                self.stats['failed'] += 1
+                repeated = self.last_error is not None and self.last_error[1] == message
+                self.last_error = (time.time(), message)
+            if not repeated:
+                logger.exception("Precalcolo di '%s' non riuscito", fixture_key)
+            return
+        if not result[0].empty:
+            self.shared_store.put_result(data_version, fixture_key, result, speculative=True)
+            self.stats['computed'] += 1
+
+    def wait(self, session_id, timeout=None):
+        """Attende i job correnti della sessione (per test e script)."""
+        with self._lock:
+            current = self._sessions.get(session_id)
+        for future in (current[2] if current is not None else []):
+            if not future.cancelled():
+                future.exception(timeout=timeout)
+
+    def shutdown(self):
+        with self._lock:
+            for _, _, futures, _ in self._sessions.values():
+                for future in futures:
+                    future.cancel()
+            self._sessions.clear()
+        self._executor.shutdown(wait=False)
@@ -3,54 +3,24 @@ import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import warnings
+from mostro_config import load_config
+from feature_store import PlayerFeatureStore
 warnings.filterwarnings('ignore')
 
 class CardPredictionModel:
-    def __init__(self):
+    def __init__(self, history=None, config=None):
+        # Storico giornate (MatchHistoryStore) per il trend recente reale
+        self.history = history
+        self.config = (config or load_config()).modello_cartellini
         self.yellow_model = RandomForestRegressor(n_estimators=100, random_state=42)
         self.red_model = RandomForestRegressor(n_estimators=100, random_state=42)
         self.scaler = StandardScaler()
         self.is_trained = False
+        self.feature_store = PlayerFeatureStore(self.config, history)
         
-    def _calculate_base_features(self, df):
-        """Calcola features base per la predizione"""
-        features = df.copy()
-        
-        # Normalizzazione per minuti giocati
-        features['Falli_per_90min'] = (features['Falli_Commessi'] / features['Minuti_Giocati']) * 90
-        features['Gialli_per_90min'] = (features['Cartellini_Gialli'] / features['Minuti_Giocati']) * 90
-        features['Rossi_per_90min'] = (features['Cartellini_Rossi'] / features['Minuti_Giocati']) * 90
-        
-        # Sostituire infiniti e NaN con 0
-        features = features.replace([np.inf, -np.inf], 0).fillna(0)
-        
-        # Fattore età (giocatori giovani e vecchi più inclini ai cartellini)
-        features['Fattore_Eta'] = np.where(
-            (features['Età'] < 23) | (features['Età'] > 32), 1.2, 1.0
-        )
-        
-        # Fattore posizione (difensori e centrocampisti più a rischio)
-        position_risk = {
-            'Difensore': 1.3,
-            'Centrocampista': 1.2,
-            'Attaccante': 1.0,
-            'Portiere': 0.5
-        }
-        features['Fattore_Posizione'] = features['Posizione'].map(position_risk).fillna(1.0)
-        
-        # Indice aggressività
-        features['Indice_Aggressivita'] = (
-            features['Falli_per_90min'] * 0.4 +
-            features['Gialli_per_90min'] * 0.4 +
-            features['Rossi_per_90min'] * 0.2
-        )
-        
-        # Trend recente (simulato con variazione casuale)
-        np.random.seed(42)
-        features['Trend_Recente'] = np.random.normal(1.0, 0.2, len(features))
-        features['Trend_Recente'] = np.clip(features['Trend_Recente'], 0.5, 1.5)
-        
-        return features
+    def _calculate_base_features(self, df, version=None):
+        """Feature base per la predizione, dal feature store (una volta per versione dei dati)"""
+        return self.feature_store.features(df, version)
     
     def _get_position_weights(self, position):
         """Restituisce pesi specifici per posizione"""
@@ -62,54 +32,34 @@ class CardPredictionModel:
         }
         return weights.get(position, {'yellow': 1.0, 'red': 1.0})
     
-    def predict_cards(self, df):
-        """Predice la probabilità di cartellini per ogni giocatore"""
-        features_df = self._calculate_base_features(df)
-        
-        yellow_risks = []
-        red_risks = []
+    def predict_cards(self, df, version=None):
+        """Predice la probabilità di cartellini per ogni giocatore (calcolo vettoriale sulla tabella feature)"""
+        features = self._calculate_base_features(df, version)
+        
+        # Pesi per posizione
+        position_weights = df['Posizione'].map(self._get_position_weights)
+        yellow_weight = position_weights.map(lambda w: w['yellow']).to_numpy(dtype=float)
+        red_weight = position_weights.map(lambda w: w['red']).to_numpy(dtype=float)
+        correction = features['Fattore_Eta'].to_numpy() * features['Trend_Recente'].to_numpy()
+        
+        # Calcolo rischio cartellino giallo
+        yellow_base = (
+            features['Falli_per_90min'].to_numpy() * 8 +
+            features['Gialli_per_90min'].to_numpy() * 25 +
+            features['Indice_Aggressivita'].to_numpy() * 15
+        )
         
-        for idx, row in features_df.iterrows():
-            # Calcolo rischio cartellino giallo
-            yellow_base = (
-                row['Falli_per_90min'] * 8 +
-                row['Gialli_per_90min'] * 25 +
-                row['Indice_Aggressivita'] * 15
-            )
-            
-            # Applicazione fattori correttivi
-            position_weights = self._get_position_weights(row['Posizione'])
-            yellow_risk = (
-                yellow_base * 
-                row['Fattore_Eta'] * 
-                position_weights['yellow'] * 
-                row['Trend_Recente']
-            )
-            
-            # Calcolo rischio cartellino rosso
-            red_base = (
-                row['Rossi_per_90min'] * 50 +
-                row['Falli_per_90min'] * 2 +
-                row['Indice_Aggressivita'] * 5
-            )
-            
-            red_risk = (
-                red_base * 
-                row['Fattore_Eta'] * 
-                position_weights['red'] * 
-                row['Trend_Recente']
-            )
-            
-            # Normalizzazione e clipping
-            yellow_risk = np.clip(yellow_risk, 0, 100)
-            red_risk = np.clip(red_risk, 0, 50)  # I rossi sono più rari
-            
-            yellow_risks.append(yellow_risk)
-            red_risks.append(red_risk)
+        # Calcolo rischio cartellino rosso
+        red_base = (
+            features['Rossi_per_90min'].to_numpy() * 50 +
+            features['Falli_per_90min'].to_numpy() * 2 +
+            features['Indice_Aggressivita'].to_numpy() * 5
+        )
         
+        # Fattori correttivi, normalizzazione e clipping (i rossi sono più rari)
         return pd.DataFrame({
-            'Rischio_Giallo': yellow_risks,
-            'Rischio_Rosso': red_risks
+            'Rischio_Giallo': np.clip(yellow_base * correction * yellow_weight, 0, 100),
+            'Rischio_Rosso': np.clip(red_base * correction * red_weight, 0, 50)
         })
     
     def get_risk_explanation(self, player_data):
@@ -142,21 +92,24 @@ class CardPredictionModel:
         
         return explanations
     
-    def calculate_team_risk_profile(self, df):
-        """Calcola il profilo di rischio per squadra"""
-        team_profiles = {}
-        
-        for team in df['Squadra'].unique():
-            team_data = df[df['Squadra'] == team]
-            predictions = self.predict_cards(team_data)
-            
-            profile = {
-                'avg_yellow_risk': predictions['Rischio_Giallo'].mean(),
-                'avg_red_risk': predictions['Rischio_Rosso'].mean(),
-                'high_risk_players': len(predictions[predictions['Rischio_Giallo'] > 70]),
-                'total_players': len(team_data)
+    def calculate_team_risk_profile(self, df, version=None):
+        """Calcola il profilo di rischio per squadra (una sola predizione, poi aggregazione per squadra)"""
+        predictions = self.predict_cards(df, version)
+        predictions['Squadra'] = df['Squadra'].to_numpy()
+        predictions['Alto_Rischio'] = predictions['Rischio_Giallo'] > 70
+        
+        grouped = predictions.groupby('Squadra', sort=False).agg(
+            avg_yellow_risk=('Rischio_Giallo', 'mean'),
+            avg_red_risk=('Rischio_Rosso', 'mean'),
+            high_risk_players=('Alto_Rischio', 'sum'),
+            total_players=('Rischio_Giallo', 'size')
+        )
+        return {
+            team: {
+                'avg_yellow_risk': row.avg_yellow_risk,
+                'avg_red_risk': row.avg_red_risk,
+                'high_risk_players': int(row.high_risk_players),
+                'total_players': int(row.total_players)
             }
-            
-            team_profiles[team] = profile
-        
-        return team_profiles
\ No newline at end of file
+            for team, row in grouped.iterrows()
+        }
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Profilazione opzionale (cProfile + tracemalloc) di un rerun dell'app o di un job batch.
+
+Si attiva con la variabile d'ambiente MOSTRO_PROFILE=1, con l'interruttore
+nella sidebar o con --profile negli script. Ogni esecuzione profilata salva
+nella cartella dei profili (MOSTRO_PROFILE_DIR, predefinita 'profili'):
+- <id>.prof: statistiche cProfile, da aprire con pstats, snakeviz o simili;
+- <id>_memoria.txt: allocazioni principali per riga di codice e picco;
+- <id>.json: metadati (versione dati, parametri, durata, funzioni più costose).
+"""
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+
+PROFILE_ENV_VAR = 'MOSTRO_PROFILE'
+PROFILE_DIR_ENV_VAR = 'MOSTRO_PROFILE_DIR'
+PROFILE_DIR = 'profili'
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 30
+
+
+def profiling_enabled():
+    """True se MOSTRO_PROFILE è impostata a un valore diverso da vuoto/0/false."""
+    return os.environ.get(PROFILE_ENV_VAR, '').strip().lower() not in ('', '0', 'false', 'no')
+
+
+@dataclass
+class ProfileRun:
+    """Esecuzione profilata: i metadati si possono completare durante l'esecuzione."""
+    label: str
+    base_dir: str
+    metadata: dict = field(default_factory=dict)
+    run_id: str = ''
+    elapsed: float = 0.0
+    paths: dict = field(default_factory=dict)
+
+    def path(self, suffix):
+        return os.path.join(self.base_dir, f"{self.run_id}{suffix}")
+
+
+def _top_functions(profiler, limit):
+    """Funzioni più costose per tempo cumulativo (file:riga:funzione)."""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = [
+        {
+            'funzione': f"{os.path.basename(filename)}:{line}:{name}",
+            'chiamate': calls,
+            'tempo_proprio_s': round(total_time, 6),
+            'tempo_cumulativo_s': round(cumulative_time, 6),
+        }
+        for (filename, line, name), (_, calls, total_time, cumulative_time, _) in stats.stats.items()
+    ]
+    return sorted(rows, key=lambda row: row['tempo_cumulativo_s'], reverse=True)[:limit]
+
+
+def _write_allocations(path, snapshot, peak, limit):
+    stats = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ]).statistics('lineno')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"Picco memoria tracciata: {peak / 1e6:.2f} MB\n")
+        f.write(f"Allocazioni principali per riga (prime {limit}):\n\n")
+        for stat in stats[:limit]:
+            frame = stat.traceback[0]
+            f.write(f"{stat.size / 1024:10.1f} KiB  {stat.count:8d} blocchi  {frame.filename}:{frame.lineno}\n")
+    return sum(stat.size for stat in stats)
+
+
+@contextmanager
+def profile_session(label, metadata=None, base_dir=None):
+    """
+    Profila il blocco con cProfile e tracemalloc e salva i rapporti anche se il blocco fallisce.
+    Restituisce un ProfileRun: run.metadata può essere aggiornato dentro il blocco (es. data_version).
+    """
+    base_dir = base_dir or os.environ.get(PROFILE_DIR_ENV_VAR) or PROFILE_DIR
+    run = ProfileRun(label=label, base_dir=base_dir, metadata=dict(metadata or {}))
+    run.run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{label}"
+
+    # tracemalloc è di processo: se era già attivo (es. test di carico) non va fermato qui
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    else:
+        tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    error = None
+    profiler.enable()
+    try:
+        yield run
+    except BaseException as e:
+        error = repr(e)
+        raise
+    finally:
+        profiler.disable()
+        run.elapsed = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+
+        os.makedirs(base_dir, exist_ok=True)
+        run.paths = {'prof': run.path('.prof'), 'memoria': run.path('_memoria.txt'), 'metadati': run.path('.json')}
+        profiler.dump_stats(run.paths['prof'])
+        allocated = _write_allocations(run.paths['memoria'], snapshot, peak, TOP_ALLOCATIONS)
+        with open(run.paths['metadati'], 'w', encoding='utf-8') as f:
+            json.dump({
+                'etichetta': label,
+                'creato': datetime.now().isoformat(timespec='seconds'),
+                'durata_s': round(run.elapsed, 4),
+                'picco_memoria_mb': round(peak / 1e6, 3),
+                'memoria_allocata_mb': round(allocated / 1e6, 3),
+                'errore': error,
+                'parametri': run.metadata,
+                'file': {kind: os.path.basename(path) for kind, path in run.paths.items()},
+                'funzioni_principali': _top_functions(profiler, TOP_FUNCTIONS),
+            }, f, indent=2, ensure_ascii=False, default=str)
@@ -0,0 +1,132 @@
+"""
+Matrice di interazione arbitro × squadra ricavata dallo storico giornate.
+
+Per ogni coppia (arbitro, squadra) confronta i gialli presi dalla squadra con
+quell'arbitro con quelli attesi dalla media della squadra e dalla severità
+generale dell'arbitro. Il rapporto è ristretto verso 1 (shrinkage) in base al
+numero di partite dirette: con pochi precedenti il fattore resta vicino al
+valore globale. La matrice è un array NumPy denso (arbitri × squadre) con
+mappe nome -> indice, quindi il fattore per squadra è una lettura O(1).
+"""
+import os
+import numpy as np
+import pandas as pd
+
+from player_index import normalize_name
+
+MATRIX_FILE = '_arbitri_squadre.npz'
+
+
+class RefereeTeamMatrix:
+    """Fattori moltiplicativi arbitro × squadra (1.0 = nessuna interazione)."""
+
+    def __init__(self, referees, teams, matches, cards, factors, version=''):
+        self.referees = list(referees)
+        self.teams = list(teams)
+        self.referee_index = {normalize_name(r): i for i, r in enumerate(self.referees)}
+        self.team_index = {normalize_name(t): j for j, t in enumerate(self.teams)}
+        self.matches = matches
+        self.cards = cards
+        self.factors = factors
+        self.version = version
+
+    @classmethod
+    def empty(cls, version=''):
+        return cls([], [], np.zeros((0, 0), dtype=np.int64), np.zeros((0, 0)), np.ones((0, 0)), version)
+
+    @classmethod
+    def from_match_log(cls, log, shrinkage=5.0, lower=0.7, upper=1.4, version=''):
+        """
+        log: righe giocatore-partita con Giornata, Squadra, Arbitro, Gialli.
+        shrinkage: partite "virtuali" a fattore 1 aggiunte a ogni coppia.
+        """
+        log = log[log['Arbitro'].astype(str).str.strip() != '']
+        if log.empty:
+            return cls.empty(version)
+
+        # Una riga per squadra per partita: gialli presi dalla squadra
+        team_matches = log.groupby(['Giornata', 'Squadra', 'Arbitro'], as_index=False, sort=False)['Gialli'].sum()
+        referee_codes, referees = pd.factorize(team_matches['Arbitro'].astype(str).str.strip())
+        team_codes, teams = pd.factorize(team_matches['Squadra'].astype(str).str.strip())
+        yellows = team_matches['Gialli'].to_numpy(dtype=float)
+        n_ref, n_team = len(referees), len(teams)
+
+        matches = np.zeros((n_ref, n_team), dtype=np.int64)
+        cards = np.zeros((n_ref, n_team))
+        np.add.at(matches, (referee_codes, team_codes), 1)
+        np.add.at(cards, (referee_codes, team_codes), yellows)
+
+        # Atteso per coppia: media squadra × severità relativa dell'arbitro
+        league_mean = yellows.mean() if yellows.size else 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            team_mean = cards.sum(axis=0) / matches.sum(axis=0)
+            referee_ratio = (cards.sum(axis=1) / matches.sum(axis=1)) / league_mean
+            expected = matches * team_mean[None, :] * referee_ratio[:, None]
+            observed_ratio = np.where(expected > 0, cards / expected, 1.0)
+
+        factors = (matches * observed_ratio + shrinkage) / (matches + shrinkage)
+        factors = np.clip(np.nan_to_num(factors, nan=1.0), lower, upper)
+        return cls(list(referees), list(teams), matches, cards, factors, version)
+
+    @classmethod
+    def from_history(cls, history, **kwargs):
+        """Matrice dallo storico giornate (MatchHistoryStore); vuota senza colonna Arbitro."""
+        log = history.match_log(['Giornata', 'Squadra', 'Arbitro', 'Gialli'])
+        if log.empty or 'Arbitro' not in log.columns:
+            return cls.empty(history.version)
+        return cls.from_match_log(log, version=history.version, **kwargs)
+
+    # --- PERSISTENZA ---
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            referees=np.array(self.referees, dtype=str),
+            teams=np.array(self.teams, dtype=str),
+            matches=self.matches,
+            cards=self.cards,
+            factors=self.factors,
+            version=np.array(self.version)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data['referees'].tolist(), data['teams'].tolist(),
+                data['matches'], data['cards'], data['factors'], str(data['version'])
+            )
+
+    @classmethod
+    def for_history(cls, history):
+        """Matrice su disco accanto allo storico, ricalcolata solo se la versione è cambiata."""
+        path = os.path.join(history.base_dir, MATRIX_FILE)
+        if os.path.exists(path):
+            try:
+                matrix = cls.load(path)
+                if matrix.version == history.version:
+                    return matrix
+            except (OSError, ValueError, KeyError):
+                pass
+        matrix = cls.from_history(history)
+        if not history.is_empty:
+            os.makedirs(history.base_dir, exist_ok=True)
+            matrix.save(path)
+        return matrix
+
+    # --- LETTURA ---
+
+    def factor(self, referee, team):
+        """Fattore di interazione (1.0 se arbitro o squadra non sono nello storico)."""
+        i = self.referee_index.get(normalize_name(referee))
+        j = self.team_index.get(normalize_name(team))
+        if i is None or j is None:
+            return 1.0
+        return float(self.factors[i, j])
+
+    def matches_between(self, referee, team):
+        i = self.referee_index.get(normalize_name(referee))
+        j = self.team_index.get(normalize_name(team))
+        return 0 if i is None or j is None else int(self.matches[i, j])
@@ -0,0 +1,75 @@
+"""
+Indice di campionato del rischio cartellino.
+
+La 'Quota (%)' classica è scalata sul rischio massimo della singola partita,
+quindi non è confrontabile tra partite diverse. L'indice ordina una volta sola
+il rischio di tutti i giocatori del campionato prima di arbitro e minuti attesi
+e restituisce il percentile di un qualsiasi rischio con np.searchsorted, in
+O(log n): anche il rischio della partita viene confrontato prima di quei fattori,
+altrimenti un arbitro severo alzerebbe il percentile di tutti i giocatori. La quota calibrata sul campionato interpola il percentile tra
+quota massima (giocatore meno a rischio), media (mediana) e minima.
+"""
+import numpy as np
+import pandas as pd
+
+# Rischio del giocatore prima dei fattori della partita (arbitro, arbitro-squadra, minuti attesi)
+LEAGUE_RISK_COLUMN = 'Rischio Cartellino (Avanzato)'
+
+
+class LeagueRiskIndex:
+    """Valori di rischio del campionato ordinati, per percentili e quote di lega."""
+
+    def __init__(self, risks, version=None):
+        risks = np.asarray(risks, dtype=float)
+        self.sorted_risks = np.sort(risks[np.isfinite(risks)])
+        self.version = version
+
+    def __len__(self):
+        return len(self.sorted_risks)
+
+    @classmethod
+    def from_predictor(cls, predictor, history=None):
+        """Rischio di tutti i giocatori caricati con la formula del predittore, senza fattori della partita."""
+        frames = []
+        for team, df in predictor.teams_data.items():
+            df = df.copy()
+            df['Squadra'] = team
+            frames.append(df)
+        if not frames:
+            return cls([], predictor.data_version)
+
+        df_all = pd.concat(frames, ignore_index=True)
+        df_all, _ = predictor.apply_history_delay(df_all, history)
+        df_risk = predictor.calculate_enhanced_prediction(df_all, 'Home', 1.0, predictor.QUOTA_MINIMA)
+        return cls(df_risk[LEAGUE_RISK_COLUMN].to_numpy(dtype=float), predictor.data_version)
+
+    def percentile(self, risks):
+        """Percentuale di giocatori del campionato con rischio minore o uguale (0-100)."""
+        risks = np.asarray(risks, dtype=float)
+        if len(self.sorted_risks) == 0:
+            return np.full(risks.shape, 50.0)
+        return np.searchsorted(self.sorted_risks, risks, side='right') / len(self.sorted_risks) * 100
+
+    def quota(self, risks, minima, media, massima):
+        """Quota calibrata sul campionato: percentile 0 -> massima, 50 -> media, 100 -> minima."""
+        return np.interp(self.percentile(risks), [0, 50, 100], [massima, media, minima])
+
+    def annotate(self, df_prediction, minima, media, massima):
+        """
+        Classifica con 'Percentile Lega' e 'Quota Lega (%)'. Va applicata dopo la cache dei risultati:
+        dipende da tutto il campionato, non solo dalle due squadre della partita.
+        """
+        if not len(self) or df_prediction.empty:
+            return df_prediction
+        percentiles = self.percentile(df_prediction[LEAGUE_RISK_COLUMN].to_numpy(dtype=float))
+        return df_prediction.assign(**{
+            'Percentile Lega': percentiles,
+            'Quota Lega (%)': np.interp(percentiles, [0, 50, 100], [massima, media, minima]),
+        })
+
+
+def apply_quota_mode(df_prediction, mode):
+    """Classifica con la 'Quota (%)' della modalità scelta ('partita' o 'lega')."""
+    if mode != 'lega' or 'Quota Lega (%)' not in df_prediction.columns:
+        return df_prediction
+    return df_prediction.assign(**{'Quota (%)': df_prediction['Quota Lega (%)']})
@@ -0,0 +1,97 @@
+"""
+Selezione dei migliori ammoniti sull'intera giornata.
+
+Partendo dalle classifiche già calcolate per ogni partita si scelgono gli N
+giocatori con la probabilità combinata più alta (prodotto delle probabilità
+di ammonizione), con un massimo di scelte per partita e per squadra, i
+giocatori esclusi e una quota minima. Massimizzare il prodotto equivale a
+massimizzare la somma dei logaritmi; i vincoli per squadra sono annidati in
+quelli per partita (famiglia laminare), quindi i vincoli definiscono un
+matroide e l'algoritmo greedy per probabilità decrescente è esatto.
+Se una squadra compare in più partite l'annidamento non vale e il risultato
+è segnalato come non garantito.
+"""
+import time
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+from monte_carlo import risk_to_probability
+
+PICK_COLUMNS = ['Partita', 'Player', 'Squadra', 'Pos', 'Quota (%)', 'Rischio Finale', 'Probabilità']
+
+
+@dataclass
+class RoundPicks:
+    """Scelte della giornata e probabilità che vengano ammoniti tutti."""
+    picks: pd.DataFrame
+    combined_probability: float
+    expected_hits: float
+    exact: bool
+    candidates: int
+    elapsed: float = 0.0
+
+
+def round_candidates(fixtures, cards_per_match):
+    """
+    Tabella unica dei giocatori della giornata con la probabilità di ammonizione.
+    fixtures: iterabile di FixtureExport (classifica, fattore arbitro ed etichetta della partita).
+    """
+    frames = []
+    for fixture in fixtures:
+        df = fixture.df_prediction
+        if df.empty:
+            continue
+        probabilities = risk_to_probability(df['Rischio Finale'].to_numpy(), cards_per_match * fixture.ref_factor)
+        frames.append(pd.DataFrame({
+            'Partita': fixture.label,
+            'Player': df['Player'].astype(str).to_numpy(),
+            'Squadra': df['Squadra'].astype(str).to_numpy(),
+            'Pos': df['Pos'].astype(str).to_numpy() if 'Pos' in df.columns else '',
+            'player_id': df['player_id'].to_numpy() if 'player_id' in df.columns else -1,
+            'Quota (%)': df['Quota (%)'].to_numpy(dtype=float),
+            'Rischio Finale': df['Rischio Finale'].to_numpy(dtype=float),
+            'Probabilità': probabilities,
+        }))
+    if not frames:
+        return pd.DataFrame(columns=PICK_COLUMNS + ['player_id'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def optimise_round(candidates, n_picks=4, max_per_match=2, max_per_team=1, excluded_ids=(), min_quota=None):
+    """Le n_picks scelte migliori nel rispetto dei vincoli (RoundPicks)."""
+    start_time = time.perf_counter()
+    mask = candidates['Probabilità'].to_numpy(dtype=float) > 0
+    if excluded_ids:
+        mask &= ~candidates['player_id'].isin(list(excluded_ids)).to_numpy()
+    if min_quota is not None:
+        mask &= candidates['Quota (%)'].to_numpy(dtype=float) >= min_quota
+    pool = candidates[mask]
+
+    match_codes, _ = pd.factorize(pool['Partita'])
+    team_codes, _ = pd.factorize(pool['Squadra'])
+    # Annidamento squadra ⊂ partita: ogni squadra in una sola partita della giornata
+    exact = bool((pd.Series(match_codes).groupby(team_codes).nunique() <= 1).all())
+
+    match_counts = np.zeros(match_codes.max() + 1 if len(pool) else 0, dtype=np.int64)
+    team_counts = np.zeros(team_codes.max() + 1 if len(pool) else 0, dtype=np.int64)
+    chosen = []
+    for i in np.argsort(-pool['Probabilità'].to_numpy(dtype=float), kind='stable'):
+        if len(chosen) == n_picks:
+            break
+        m, t = match_codes[i], team_codes[i]
+        if match_counts[m] < max_per_match and team_counts[t] < max_per_team:
+            match_counts[m] += 1
+            team_counts[t] += 1
+            chosen.append(i)
+
+    picks = pool.iloc[chosen][PICK_COLUMNS].reset_index(drop=True)
+    probabilities = picks['Probabilità'].to_numpy(dtype=float)
+    return RoundPicks(
+        picks=picks,
+        combined_probability=float(np.prod(probabilities)) if len(picks) else 0.0,
+        expected_hits=float(probabilities.sum()),
+        exact=exact,
+        candidates=len(pool),
+        elapsed=time.perf_counter() - start_time
+    )
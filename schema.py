@@ -0,0 +1,124 @@
+"""
+Riconoscimento tollerante delle intestazioni dei fogli.
+
+Le varianti di un'intestazione (accenti, a capo, maiuscole, sinonimi italiani e
+inglesi) vengono ricondotte al nome canonico usato dal resto del codice. I
+sinonimi valgono solo per il tipo di foglio a cui appartengono (squadra, arbitri,
+quote, formazioni): 'Nome' o 'Quota' in un foglio squadra restano come sono.
+La mappatura si calcola una sola volta per ogni firma di intestazioni (tupla dei
+nomi di colonna e tipo di foglio) ed è poi riusata per tutti i fogli con la stessa struttura.
+"""
+from functools import lru_cache
+from types import MappingProxyType
+from player_index import normalize_name
+
+# Nomi canonici
+PLAYER = 'Player'
+POSITION = 'Pos'
+TEAM = 'Squadra'
+REFEREE_NAME = 'Nome'
+
+# Nome canonico -> varianti riconosciute (confronto su normalize_name)
+COLUMN_SYNONYMS = {
+    PLAYER: ['Player', 'Giocatore', 'Nome Giocatore', 'Calciatore', 'Player Name'],
+    POSITION: ['Pos', 'Position', 'Posizione', 'Ruolo', 'Role'],
+    TEAM: ['Squadra', 'Team', 'Club'],
+    'Nat': ['Nat', 'Nation', 'Nazione', 'Nazionalità', 'Nationality'],
+    'Minuti Giocati Totali': ['Minuti Giocati Totali', 'Minutes Played Total', 'Total Minutes'],
+    '90s Giocati Totali': ['90s Giocati Totali', '90s Played Total', '90s Totali', 'Total 90s'],
+    'Cartellini Gialli Totali': ['Cartellini Gialli Totali', 'Gialli Totali', 'Yellow Cards Total', 'Total Yellow Cards'],
+    'Cartellini Rossi Totali': ['Cartellini Rossi Totali', 'Rossi Totali', 'Red Cards Total', 'Total Red Cards'],
+    'Falli Fatti Totali': ['Falli Fatti Totali', 'Falli Totali', 'Fouls Committed Total', 'Total Fouls'],
+    'Media 90s per Cartellino Totale': ['Media 90s per Cartellino Totale', '90s per Yellow Card Total', '90s per Card Total'],
+    'Media Falli per Cartellino Totale': ['Media Falli per Cartellino Totale', 'Fouls per Yellow Card Total', 'Fouls per Card Total'],
+    'Ritardo Cartellino (Partite)': [
+        'Ritardo Cartellino (Partite)', 'Ritardo Cartellino Partite', 'Ritardo (Partite)', 'Ritardo Partite',
+        'Card Delay (Matches)', 'Matches Since Last Card'
+    ],
+    'Ritardo Cartellino (Minuti)': [
+        'Ritardo Cartellino (Minuti)', 'Ritardo Cartellino Minuti', 'Ritardo (Minuti)', 'Card Delay (Minutes)'
+    ],
+    'Minuti Attesi': ['Minuti Attesi', 'Minuti Previsti', 'Expected Minutes'],
+    'Quota Ammonito': ['Quota Ammonito', 'Quota', 'Quota Si', 'Odds', 'Odds Yes', 'Decimal Odds', 'Price'],
+    'Quota Non Ammonito': ['Quota Non Ammonito', 'Quota No', 'Odds No'],
+    REFEREE_NAME: ['Nome', 'Arbitro', 'Nome Arbitro', 'Referee', 'Referee Name', 'Name'],
+    'Gialli a partita': ['Gialli a partita', 'Gialli per partita', 'Yellow Cards per Match', 'Yellows per Game'],
+    'Rossi a partita': ['Rossi a partita', 'Rossi per partita', 'Red Cards per Match', 'Reds per Game'],
+    'Falli a partita': ['Falli a partita', 'Falli per partita', 'Fouls per Match', 'Fouls per Game'],
+}
+
+# Tipo di foglio -> nomi canonici riconosciuti in quel foglio
+SHEET_COLUMNS = {
+    'team': (
+        PLAYER, POSITION, TEAM, 'Nat', 'Minuti Giocati Totali', '90s Giocati Totali', 'Cartellini Gialli Totali',
+        'Cartellini Rossi Totali', 'Falli Fatti Totali', 'Media 90s per Cartellino Totale',
+        'Media Falli per Cartellino Totale', 'Ritardo Cartellino (Partite)', 'Ritardo Cartellino (Minuti)',
+    ),
+    'referee': (REFEREE_NAME, 'Gialli a partita', 'Rossi a partita', 'Falli a partita'),
+    'odds': (PLAYER, TEAM, 'Quota Ammonito', 'Quota Non Ammonito'),
+    'lineups': (PLAYER, TEAM, POSITION, 'Minuti Attesi'),
+}
+
+# Ultima risorsa per il nome arbitro (solo fogli arbitri): intestazioni che contengono queste parole
+REFEREE_NAME_KEYWORDS = ('nome', 'arbitro', 'referee')
+
+_VARIANTS = {
+    kind: {
+        normalize_name(variant): canonical
+        for canonical in canonicals
+        for variant in COLUMN_SYNONYMS[canonical]
+    }
+    for kind, canonicals in SHEET_COLUMNS.items()
+}
+
+
+def clean_header(column):
+    """Intestazione senza a capo e spazi superflui (per le colonne non riconosciute)."""
+    return ' '.join(str(column).replace('\n', ' ').split())
+
+
+@lru_cache(maxsize=256)
+def _compile_schema(signature, kind):
+    """Mappatura {intestazione originale: nome canonico} per una firma di intestazioni di un tipo di foglio."""
+    variants = _VARIANTS[kind]
+    mapping = {}
+    taken = set()
+    unmatched = []
+    for column in signature:
+        canonical = variants.get(normalize_name(column))
+        # Due intestazioni per lo stesso campo: vale la prima, l'altra resta com'è
+        if canonical is not None and canonical not in taken:
+            mapping[column] = canonical
+            taken.add(canonical)
+        else:
+            mapping[column] = clean_header(column)
+            unmatched.append(column)
+
+    if kind == 'referee' and REFEREE_NAME not in taken:
+        fallback = next((
+            column for column in unmatched
+            if any(kw in normalize_name(column).split() for kw in REFEREE_NAME_KEYWORDS)
+        ), None)
+        if fallback is not None:
+            mapping[fallback] = REFEREE_NAME
+    return MappingProxyType(mapping)
+
+
+def resolve_columns(columns, kind):
+    """Mappatura (in cache per firma) dalle intestazioni originali ai nomi canonici del tipo di foglio `kind`."""
+    if kind not in SHEET_COLUMNS:
+        raise ValueError(f"Tipo di foglio sconosciuto: {kind!r} (attesi: {', '.join(SHEET_COLUMNS)})")
+    return _compile_schema(tuple(str(c) for c in columns), kind)
+
+
+def apply_schema(df, kind):
+    """DataFrame con intestazioni canoniche per `kind` (vista rinominata; i dati si copiano solo con intestazioni doppie)."""
+    mapping = resolve_columns(df.columns, kind)
+    renamed = df.set_axis([mapping[str(c)] for c in df.columns], axis=1)
+    duplicated = renamed.columns.duplicated()
+    return renamed.loc[:, ~duplicated] if duplicated.any() else renamed
+
+
+def referee_name_column(df):
+    """Colonna canonica del nome arbitro o None se il foglio non la contiene."""
+    return REFEREE_NAME if REFEREE_NAME in df.columns else None
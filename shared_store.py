@@ -0,0 +1,162 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from types import MappingProxyType
+import pandas as pd
+
+
+def frame_version(df):
+    """Hash del contenuto di un DataFrame (valori e colonne, indice escluso)."""
+    digest = hashlib.sha1('|'.join(map(str, df.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class DataSnapshot:
+    """
+    Fotografia immutabile dei dati di campionato condivisa tra le sessioni.
+    I DataFrame non vanno modificati: chi deve alterarli lavora su una copia.
+    """
+    teams_data: MappingProxyType
+    referees_data: pd.DataFrame
+    player_index: object
+    data_version: str
+    sheet_versions: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+    referee_versions: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+    source_path: str = None
+    source_state: tuple = None
+    message: str = ''
+    quality_report: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+    loaded_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_predictor(cls, predictor, message=''):
+        """Congela i dati già caricati in un EnhancedMostroPredictor."""
+        return cls(
+            teams_data=MappingProxyType(dict(predictor.teams_data)),
+            referees_data=predictor.referees_data,
+            player_index=predictor.player_index,
+            data_version=predictor.data_version,
+            sheet_versions=MappingProxyType(dict(predictor.sheet_versions)),
+            referee_versions=MappingProxyType(dict(predictor.referee_versions)),
+            source_path=predictor.source_path,
+            source_state=predictor.source_state,
+            message=message,
+            quality_report=MappingProxyType(dict(predictor.quality_report))
+        )
+
+
+class SharedDataStore:
+    """
+    Archivio di processo, thread-safe, per i dati caricati e le predizioni calcolate.
+    Lettura senza lock sullo snapshot corrente; il ricaricamento costruisce un nuovo
+    snapshot e lo sostituisce in modo atomico (copy-on-reload).
+    """
+
+    def __init__(self, max_results=512):
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._results_lock = threading.Lock()
+        self._results = OrderedDict()
+        self._speculative = set() # Chiavi dei risultati precalcolati in background
+        self.max_results = max_results
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def get_snapshot(self, loader):
+        """Restituisce lo snapshot corrente, caricandolo una sola volta per processo."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        with self._load_lock:
+            # Un'altra sessione potrebbe averlo caricato mentre attendevamo il lock
+            if self._snapshot is None:
+                self._snapshot = loader()
+            return self._snapshot
+
+    def reload(self, loader):
+        """Ricarica tutti i dati fuori dal lock di lettura e sostituisce lo snapshot."""
+        with self._load_lock:
+            new_snapshot = loader()
+            if new_snapshot is not None:
+                self._snapshot = new_snapshot
+                self.invalidate_results(lambda key: True)
+            return self._snapshot
+
+    def apply_update(self, updater):
+        """
+        Aggiornamento parziale: `updater(snapshot)` restituisce
+        (nuovo_snapshot, squadre_cambiate, arbitri_cambiati). Lo snapshot viene
+        sostituito in modo atomico e si invalidano solo i risultati delle partite
+        che coinvolgono quelle squadre o quegli arbitri.
+        """
+        with self._load_lock:
+            if self._snapshot is None:
+                return set(), set()
+            new_snapshot, changed_teams, changed_referees = updater(self._snapshot)
+            self._snapshot = new_snapshot
+
+        def _is_stale(key):
+            home, away, referee = key[1].split('|', 2)
+            return home in changed_teams or away in changed_teams or referee in changed_referees
+
+        self.invalidate_results(_is_stale)
+        return changed_teams, changed_referees
+
+    # --- CACHE RISULTATI ---
+
+    def get_result(self, data_version, fixture_key, include_speculative=True):
+        """
+        Restituisce il risultato in cache (df_prediction, ref_factor, ref_category, error_msg) o None.
+        Con include_speculative=False ignora i risultati precalcolati non ancora richiesti da nessuno.
+        """
+        if not data_version:
+            return None
+        key = (data_version, fixture_key)
+        with self._results_lock:
+            result = self._results.get(key)
+            if result is None or (not include_speculative and key in self._speculative):
+                return None
+            self._results.move_to_end(key)
+            return result
+
+    def is_speculative(self, data_version, fixture_key):
+        """True se il risultato in cache è stato solo precalcolato."""
+        with self._results_lock:
+            return (data_version, fixture_key) in self._speculative
+
+    def put_result(self, data_version, fixture_key, result, speculative=False):
+        """
+        Salva un risultato; oltre `max_results` elimina i meno usati di recente.
+        Un risultato speculativo non sostituisce uno già presente; uno normale lo rende definitivo.
+        """
+        if not data_version:
+            return
+        key = (data_version, fixture_key)
+        with self._results_lock:
+            if speculative and key in self._results:
+                return
+            self._results[key] = result
+            self._results.move_to_end(key)
+            if speculative:
+                self._speculative.add(key)
+            else:
+                self._speculative.discard(key)
+            while len(self._results) > self.max_results:
+                evicted, _ = self._results.popitem(last=False)
+                self._speculative.discard(evicted)
+
+    def invalidate_results(self, predicate):
+        """Rimuove i risultati la cui chiave (data_version, fixture_key) soddisfa `predicate`."""
+        with self._results_lock:
+            stale = [key for key in self._results if predicate(key)]
+            for key in stale:
+                del self._results[key]
+                self._speculative.discard(key)
+        return len(stale)
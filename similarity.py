@@ -0,0 +1,87 @@
+"""
+Ricerca di giocatori con profilo cartellini simile.
+
+Le feature (media 90' per giallo, media falli per giallo, ritardo) sono
+standardizzate sull'intero campionato e affiancate dal ruolo in codifica
+one-hot; un KDTree di scikit-learn costruito al caricamento risponde alle
+query k-NN in frazioni di millisecondo.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from schema import PLAYER, POSITION
+
+SIMILARITY_FEATURES = {
+    'Media 90s per Cartellino Totale': 'Media 90s/Giallo',
+    'Media Falli per Cartellino Totale': 'Media Falli/Giallo',
+    'Ritardo Cartellino (Partite)': 'Ritardo (Partite)',
+}
+ROLES = ('GK', 'DF', 'MF', 'FW')
+ROLE_WEIGHT = 1.5 # Peso del ruolo rispetto a una deviazione standard delle feature
+
+
+def _role_matrix(positions):
+    """One-hot del ruolo principale (primo codice di 'Pos', es. 'MF,FW' -> MF)."""
+    main_role = pd.Series(positions).astype(str).str.split(',').str[0].str.strip().str.upper()
+    return np.column_stack([(main_role == role).to_numpy(dtype=float) for role in ROLES]) * ROLE_WEIGHT
+
+
+class PlayerSimilarityIndex:
+    """KDTree sui profili dei giocatori di tutto il campionato."""
+
+    def __init__(self, players, vectors, version=None):
+        self.players = players.reset_index(drop=True) # Player, Squadra, Pos, player_id e feature leggibili
+        self.vectors = vectors
+        self.tree = KDTree(vectors, leaf_size=16) if len(vectors) else None
+        self.row_of_id = {int(pid): i for i, pid in enumerate(self.players['player_id']) if pid >= 0}
+        self.version = version
+
+    def __len__(self):
+        return len(self.players)
+
+    @classmethod
+    def from_teams_data(cls, teams_data, version=None):
+        frames = []
+        for team, df in teams_data.items():
+            if PLAYER not in df.columns:
+                continue
+            frame = pd.DataFrame({
+                'Player': df[PLAYER].astype(str).to_numpy(),
+                'Squadra': team,
+                'Pos': df[POSITION].astype(str).to_numpy() if POSITION in df.columns else '',
+                'player_id': df['player_id'].to_numpy() if 'player_id' in df.columns else -1,
+            })
+            for source, label in SIMILARITY_FEATURES.items():
+                frame[label] = pd.to_numeric(df[source], errors='coerce').to_numpy(dtype=float) if source in df.columns else np.nan
+            frames.append(frame)
+        if not frames:
+            return cls(pd.DataFrame(columns=['Player', 'Squadra', 'Pos', 'player_id', *SIMILARITY_FEATURES.values()]),
+                       np.empty((0, len(SIMILARITY_FEATURES) + len(ROLES))), version)
+
+        players = pd.concat(frames, ignore_index=True)
+        features = players[list(SIMILARITY_FEATURES.values())].to_numpy(dtype=float)
+        # Medie a 0 (nessun cartellino) o mancanti: mediana del campionato
+        features = np.where(np.isfinite(features) & (features > 0), features, np.nan)
+        features[:, -1] = players['Ritardo (Partite)'].fillna(0).to_numpy(dtype=float) # Il ritardo può valere 0
+        medians = np.nan_to_num(np.nanmedian(features, axis=0), nan=0.0)
+        features = np.where(np.isnan(features), medians, features)
+
+        std = features.std(axis=0)
+        standardised = (features - features.mean(axis=0)) / np.where(std > 0, std, 1.0)
+        vectors = np.hstack([standardised, _role_matrix(players['Pos'])])
+        return cls(players, vectors, version)
+
+    def neighbours(self, player_id, k=5, same_role_only=False):
+        """I k giocatori più simili (escluso il giocatore stesso), con la distanza."""
+        row = self.row_of_id.get(int(player_id))
+        if row is None or self.tree is None:
+            return self.players.iloc[0:0].assign(Distanza=pd.Series(dtype=float))
+        distances, rows = self.tree.query(self.vectors[row:row + 1], k=min(k + 1, len(self)))
+        distances, rows = distances[0], rows[0]
+        keep = rows != row
+        result = self.players.iloc[rows[keep][:k]].assign(Distanza=distances[keep][:k])
+        if same_role_only:
+            same = (self.vectors[rows[keep][:k], -len(ROLES):] == self.vectors[row, -len(ROLES):]).all(axis=1)
+            result = result[same]
+        return result
@@ -0,0 +1,113 @@
+import io
+import time
+import sqlite3
+from contextlib import contextmanager
+import pandas as pd
+
+STATE_DB_PATH = 'mostro_state.db'
+
+
+def make_fixture_key(home_team, away_team, referee):
+    """Chiave testuale di una partita (casa|trasferta|arbitro)."""
+    return f"{home_team}|{away_team}|{referee}"
+
+
+class StateStore:
+    """
+    Persistenza locale (SQLite in modalità WAL) dello stato dell'app:
+    esclusioni per partita e predizioni calcolate per versione dei dati.
+    Condivisa tra le sessioni dello stesso server.
+    """
+
+    def __init__(self, db_path=STATE_DB_PATH):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS exclusions (
+                    fixture_key TEXT NOT NULL,
+                    player_key TEXT NOT NULL,
+                    PRIMARY KEY (fixture_key, player_key)
+                )
+            """)
+            # Le vecchie predizioni erano DataFrame in pickle: non vengono più lette
+            conn.execute("DROP TABLE IF EXISTS predictions")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fixture_results (
+                    data_version TEXT NOT NULL,
+                    fixture_key TEXT NOT NULL,
+                    ref_factor REAL NOT NULL,
+                    ref_category TEXT NOT NULL,
+                    error_msg TEXT,
+                    payload BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (data_version, fixture_key)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        """Connessione breve per operazione (commit automatico, chiusura garantita)."""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- ESCLUSIONI ---
+
+    def load_exclusions(self, fixture_key, player_index):
+        """Restituisce l'insieme degli ID esclusi per la partita (chiavi stabili -> ID correnti)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT player_key FROM exclusions WHERE fixture_key = ?", (fixture_key,)
+            ).fetchall()
+
+        excluded = set()
+        for (player_key,) in rows:
+            team_key, _, name_key = player_key.partition('|')
+            player_id = player_index.ids.get((team_key, name_key))
+            if player_id is not None:
+                excluded.add(player_id)
+        return excluded
+
+    def save_exclusions(self, fixture_key, excluded_ids, player_index):
+        """Sostituisce le esclusioni salvate per la partita."""
+        keys = [(fixture_key, player_index.key_of(i)) for i in excluded_ids if 0 <= i < len(player_index)]
+        with self._connect() as conn:
+            conn.execute("DELETE FROM exclusions WHERE fixture_key = ?", (fixture_key,))
+            conn.executemany("INSERT INTO exclusions (fixture_key, player_key) VALUES (?, ?)", keys)
+
+    # --- PREDIZIONI ---
+
+    def load_prediction(self, data_version, fixture_key):
+        """Restituisce (df_prediction, ref_factor, ref_category, error_msg) o None se non in cache."""
+        if not data_version:
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload, ref_factor, ref_category, error_msg FROM fixture_results "
+                "WHERE data_version = ? AND fixture_key = ?",
+                (data_version, fixture_key)
+            ).fetchone()
+
+        if row is None:
+            return None
+        payload, ref_factor, ref_category, error_msg = row
+        return pd.read_parquet(io.BytesIO(payload)), ref_factor, ref_category, error_msg
+
+    def save_prediction(self, data_version, fixture_key, df_prediction, ref_factor, ref_category, error_msg=None):
+        """Salva il risultato di una predizione (DataFrame in Parquet) con l'eventuale avviso sui dati."""
+        if not data_version:
+            return
+        buffer = io.BytesIO()
+        df_prediction.to_parquet(buffer)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO fixture_results "
+                "(data_version, fixture_key, ref_factor, ref_category, error_msg, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (data_version, fixture_key, float(ref_factor), ref_category, error_msg, buffer.getvalue(), time.time())
+            )
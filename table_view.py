@@ -0,0 +1,95 @@
+import math
+import numpy as np
+import streamlit as st
+
+# Formato numerico delle colonne della classifica (al posto di Styler.format)
+RANKING_FORMATS = {
+    'Quota (%)': "%.2f",
+    'Percentile Lega': "%.1f",
+    'Rischio': "%.3f",
+    'Media 90s/Giallo': "%.2f",
+    'Media Falli/Giallo': "%.2f",
+    'Ritardo (Partite)': "%.2f",
+    'Quota Book': "%.2f",
+    'Prob. Book (%)': "%.1f",
+    'Prob. Mostro (%)': "%.1f",
+    'Edge (%)': "%+.1f",
+    'Valore Atteso': "%+.2f",
+}
+
+
+def number_column_config(formats):
+    """column_config di st.dataframe con il formato numerico per colonna."""
+    return {col: st.column_config.NumberColumn(col, format=fmt) for col, fmt in formats.items()}
+
+
+def filter_sort_page(df, query='', search_cols=(), filters=None, sort_col=None, ascending=False,
+                     page=1, page_size=50):
+    """
+    Filtro, ordinamento e paginazione lato server.
+    Si lavora sugli array delle colonne interessate; viene materializzata solo la pagina richiesta.
+    Restituisce (pagina, righe_filtrate, numero_pagine).
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if query:
+        text_match = np.zeros(len(df), dtype=bool)
+        for col in search_cols:
+            text_match |= df[col].astype(str).str.contains(query, case=False, regex=False).to_numpy()
+        mask &= text_match
+    for col, values in (filters or {}).items():
+        if values:
+            mask &= df[col].isin(values).to_numpy()
+
+    positions = np.flatnonzero(mask)
+    if sort_col is not None and len(positions):
+        keys = df[sort_col].to_numpy()[positions]
+        if keys.dtype.kind in 'fiub':
+            keys = -keys if not ascending else keys
+            order = np.argsort(keys, kind='stable')
+        else:
+            order = np.argsort(keys.astype(str), kind='stable')
+            order = order if ascending else order[::-1]
+        positions = positions[order]
+
+    n_rows = len(positions)
+    n_pages = max(1, math.ceil(n_rows / page_size))
+    page = min(max(1, int(page)), n_pages)
+    page_positions = positions[(page - 1) * page_size: page * page_size]
+    return df.iloc[page_positions], n_rows, n_pages
+
+
+def paginated_dataframe(df, key, column_config=None, search_cols=(), filter_cols=(),
+                        default_sort=None, page_sizes=(25, 50, 100, 250)):
+    """
+    st.dataframe paginato: ricerca, filtri, ordinamento e pagina sono widget Streamlit,
+    e al browser arriva solo la pagina visibile.
+    """
+    sortable = [col for col in df.columns if col != 'Escluso']
+    col_search, col_filter, col_sort, col_order = st.columns([3, 3, 2, 1])
+    query = col_search.text_input("🔎 Cerca", key=f"{key}_query")
+    filters = {}
+    for col in filter_cols:
+        options = sorted(df[col].dropna().astype(str).unique())
+        filters[col] = col_filter.multiselect(col, options=options, key=f"{key}_filter_{col}")
+    sort_col = col_sort.selectbox(
+        "Ordina per", options=sortable,
+        index=sortable.index(default_sort) if default_sort in sortable else 0, key=f"{key}_sort"
+    )
+    ascending = col_order.toggle("Crescente", key=f"{key}_asc")
+
+    col_size, col_page, col_info = st.columns([1, 1, 3])
+    page_size = col_size.selectbox("Righe per pagina", options=list(page_sizes), index=1, key=f"{key}_size")
+    page_placeholder = col_page.empty()
+    page = st.session_state.get(f"{key}_page", 1)
+
+    page_df, n_rows, n_pages = filter_sort_page(
+        df, query, search_cols, filters, sort_col, ascending, page, page_size
+    )
+    # Pagina riportata nell'intervallo valido quando i filtri riducono le righe
+    page = min(page, n_pages)
+    if f"{key}_page" in st.session_state:
+        st.session_state[f"{key}_page"] = page
+    page_placeholder.number_input("Pagina", min_value=1, max_value=n_pages, step=1, key=f"{key}_page")
+    col_info.caption(f"{n_rows} righe su {len(df)} · pagina {page} di {n_pages}")
+
+    st.dataframe(page_df, column_config=column_config, use_container_width=True, hide_index=True)
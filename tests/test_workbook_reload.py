@@ -0,0 +1,48 @@
+import os
+import sys
+import shutil
+
+import openpyxl
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKBOOK = 'Il Mostro 5.0.xlsx'
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def workbook_dir(tmp_path, monkeypatch):
+    if not os.path.exists(os.path.join(ROOT, WORKBOOK)):
+        pytest.skip("workbook non disponibile")
+    shutil.copy(os.path.join(ROOT, WORKBOOK), tmp_path / WORKBOOK)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_update_workbook_snapshot_rereads_changed_sheet(workbook_dir):
+    from mostrominimal import load_workbook_snapshot, update_workbook_snapshot
+
+    snapshot = load_workbook_snapshot()
+    assert snapshot is not None
+    team = sorted(snapshot.teams_data)[0]
+    old_version = snapshot.sheet_versions[team]
+
+    workbook = openpyxl.load_workbook(WORKBOOK)
+    sheet = workbook[team]
+    header = [cell.value for cell in sheet[1]]
+    delay_col = header.index('Ritardo Cartellino (Partite)') + 1
+    sheet.cell(row=2, column=delay_col).value = 42
+    workbook.save(WORKBOOK)
+
+    new_snapshot, changed_teams, changed_referees = update_workbook_snapshot(snapshot, {team}, set())
+
+    assert changed_teams == {team}
+    assert not changed_referees
+    assert new_snapshot.sheet_versions[team] != old_version
+    assert new_snapshot.teams_data[team]['Ritardo Cartellino (Partite)'].iloc[0] == 42
+    assert new_snapshot.data_version != snapshot.data_version
+    # Rapporto qualità sostituito per il foglio riletto, invariato per gli altri
+    assert team in new_snapshot.quality_report
+    assert set(new_snapshot.quality_report) == set(snapshot.quality_report)
+    # Lo snapshot originale resta immutato
+    assert snapshot.sheet_versions[team] == old_version
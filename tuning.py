@@ -0,0 +1,220 @@
+"""
+Ricerca dei parametri della formula del Mostro sui risultati storici.
+
+Le feature del backtest sono calcolate una sola volta e pubblicate in memoria
+condivisa; i processi del pool valutano i candidati leggendo gli stessi array
+senza copiarli. La configurazione migliore viene scritta in un file JSON
+versionato, legato al campionato configurato, che EnhancedMostroPredictor carica
+all'avvio solo se il campionato coincide.
+
+Uso: python tuning.py storico/ --arbitri "Il Mostro 5.0.xlsx" --metodo random --iterazioni 300
+"""
+import os
+import json
+import time
+import random
+import argparse
+import itertools
+from dataclasses import asdict, fields, replace
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+from backtest import FormulaParams, load_results, prepare_features, quick_metrics, valid_rows
+from mostro_config import load_config
+
+TUNED_PARAMS_PATH = 'mostro_params.json'
+
+# Colonne numeriche del backtest condivise con i worker
+SHARED_COLUMNS = [
+    'rischio_90s', 'rischio_falli', 'ritardo_90s',
+    'fattore_arbitro', 'ammonito', 'match_id', 'team_id'
+]
+
+# Spazio di ricerca predefinito. Il rischio conta solo in proporzione all'interno della partita,
+# quindi dei due pesi si cerca la quota del rischio per 90' (la somma resta quella configurata)
+DEFAULT_GRID = {
+    'quota_rischio_90s': [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8],
+    'ritardo_max': [1.5, 2.0, 2.5, 3.0],
+    'media_partite_per_giallo': [4.0, 4.6, 5.2, 5.8, 6.4],
+    'cartellini_per_partita': [3.5, 4.0, 4.5, 5.0],
+}
+
+
+def candidate_params(candidate, base=None):
+    """FormulaParams di un candidato: la quota del rischio per 90' ripartisce la somma dei due pesi di `base`."""
+    base = base or FormulaParams.from_config()
+    candidate = dict(candidate)
+    share = candidate.pop('quota_rischio_90s', None)
+    if share is not None:
+        total = base.peso_rischio_90s + base.peso_rischio_falli
+        candidate['peso_rischio_90s'] = share * total
+        candidate['peso_rischio_falli'] = (1 - share) * total
+    return replace(base, **candidate)
+
+
+def load_tuned_params(path=TUNED_PARAMS_PATH, config=None):
+    """
+    Parametri ottimizzati salvati su disco per il campionato di `config` (load_config se None).
+    None se il file non esiste, non è valido o è stato ottimizzato per un altro campionato.
+    """
+    if not os.path.exists(path):
+        return None
+    config = config or load_config()
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('lega') != config.lega:
+            return None
+        known = {f.name for f in fields(FormulaParams)}
+        params = {k: v for k, v in data.get('params', {}).items() if k in known}
+        return replace(FormulaParams.from_config(config), **params)
+    except (OSError, ValueError, TypeError, AttributeError):
+        return None
+
+
+def save_tuned_params(params, metrics, path=TUNED_PARAMS_PATH, lega=None):
+    """Scrive la configurazione migliore del campionato `lega` incrementando la versione del file."""
+    version = 0
+    if os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                version = int(json.load(f).get('version', 0))
+        except (OSError, ValueError, TypeError):
+            version = 0
+
+    payload = {
+        'version': version + 1,
+        'lega': lega or load_config().lega,
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'metrics': metrics,
+        'params': asdict(params),
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return payload['version']
+
+
+# --- MEMORIA CONDIVISA ---
+
+def publish_arrays(arrays):
+    """Copia gli array in blocchi di memoria condivisa; restituisce (blocchi, descrittori)."""
+    blocks = []
+    specs = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+_WORKER_ARRAYS = {}
+_WORKER_BLOCKS = []
+
+
+def _attach_worker(specs):
+    """Inizializzatore dei worker: collega gli array condivisi senza copiarli."""
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _WORKER_BLOCKS.append(block)
+        _WORKER_ARRAYS[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def _evaluate_candidate(candidate):
+    params = candidate_params(candidate)
+    brier, hit_rate = quick_metrics(_WORKER_ARRAYS, params, _WORKER_ARRAYS['valid'])
+    return candidate, brier, hit_rate
+
+
+# --- RICERCA ---
+
+def grid_candidates(grid):
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def random_candidates(grid, n_iter, seed=42):
+    """Campionamento casuale uniforme negli intervalli della griglia."""
+    rng = random.Random(seed)
+    for _ in range(n_iter):
+        yield {k: round(rng.uniform(min(v), max(v)), 3) for k, v in grid.items()}
+
+
+def search(features, candidates, objective='brier', warmup_rounds=3, workers=None):
+    """
+    Valuta i candidati in parallelo. objective: 'brier' (minimizza) o 'hit_rate' (massimizza).
+    Restituisce il DataFrame dei risultati ordinato dal migliore.
+    """
+    arrays = {col: features[col].to_numpy() for col in SHARED_COLUMNS}
+    arrays['valid'] = valid_rows(features, warmup_rounds)
+    blocks, specs = publish_arrays(arrays)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_worker, initargs=(specs,)) as pool:
+            results = list(pool.map(_evaluate_candidate, candidates, chunksize=8))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    df = pd.DataFrame([{**c, 'brier': b, 'hit_rate': h} for c, b, h in results])
+    ascending = objective == 'brier'
+    return df.sort_values(objective, ascending=ascending).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('risultati', help='File CSV/Parquet o cartella dei risultati per giornata')
+    parser.add_argument('--arbitri', help='Workbook o CSV con le statistiche arbitri')
+    parser.add_argument('--metodo', choices=['grid', 'random'], default='grid')
+    parser.add_argument('--iterazioni', type=int, default=300, help='Candidati per la ricerca casuale')
+    parser.add_argument('--obiettivo', choices=['brier', 'hit_rate'], default='brier')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=TUNED_PARAMS_PATH)
+    args = parser.parse_args()
+
+    referees = None
+    if args.arbitri:
+        if args.arbitri.endswith('.csv'):
+            referees = pd.read_csv(args.arbitri)
+        else:
+            sheets = pd.read_excel(args.arbitri, sheet_name=None)
+            referees = next((df for name, df in sheets.items() if 'arbitri' in name.lower()), None)
+
+    features = prepare_features(load_results(args.risultati), referees)
+    candidates = (
+        list(grid_candidates(DEFAULT_GRID)) if args.metodo == 'grid'
+        else list(random_candidates(DEFAULT_GRID, args.iterazioni))
+    )
+
+    start = time.perf_counter()
+    ranking = search(features, candidates, objective=args.obiettivo, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    best = ranking.iloc[0]
+    best_params = candidate_params({k: float(best[k]) for k in DEFAULT_GRID})
+    baseline_brier, baseline_hit = quick_metrics(features, FormulaParams.from_config(), valid_rows(features))
+    version = save_tuned_params(best_params, {
+        'obiettivo': args.obiettivo,
+        'brier': float(best['brier']),
+        'hit_rate_top4': float(best['hit_rate']),
+        'brier_parametri_attuali': baseline_brier,
+        'hit_rate_parametri_attuali': baseline_hit,
+        'candidati': len(candidates),
+    }, args.output)
+
+    print(f"{len(candidates)} candidati valutati in {elapsed:.1f} s")
+    print(f"Parametri attuali: Brier {baseline_brier:.4f}, hit rate {baseline_hit:.3f}")
+    print(f"Migliore: Brier {best['brier']:.4f}, hit rate {best['hit_rate']:.3f}")
+    print(ranking.head(10).to_string(index=False))
+    print(f"Configurazione salvata in '{args.output}' (versione {version})")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,6 @@
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import pandas as pd
-import numpy as np
 
 def create_prediction_charts(df):
     """Crea grafici per l'analisi delle predizioni"""
@@ -204,51 +202,47 @@ def create_risk_gauge(risk_value, title, color_scheme='yellow'):
     fig.update_layout(height=300)
     return fig
 
-def create_timeline_chart(df):
-    """Crea un grafico temporale delle predizioni (simulato)"""
-    # Simula dati temporali
-    dates = pd.date_range('2024-01-01', periods=10, freq='W')
-    
-    # Calcola rischio medio per settimana (simulato)
-    avg_yellow_risk = []
-    avg_red_risk = []
-    
-    np.random.seed(42)
-    base_yellow = df['Rischio_Giallo'].mean()
-    base_red = df['Rischio_Rosso'].mean()
-    
-    for i in range(10):
-        # Simula variazione settimanale
-        yellow_var = base_yellow + np.random.normal(0, 5)
-        red_var = base_red + np.random.normal(0, 2)
-        
-        avg_yellow_risk.append(max(0, min(100, yellow_var)))
-        avg_red_risk.append(max(0, min(50, red_var)))
-    
+def create_timeline_chart(df, history=None):
+    """Crea il grafico temporale del rischio cartellini dallo storico delle giornate"""
     fig = go.Figure()
     
-    fig.add_trace(go.Scatter(
-        x=dates,
-        y=avg_yellow_risk,
-        mode='lines+markers',
-        name='Rischio Giallo',
-        line=dict(color='#FFD700', width=3),
-        marker=dict(size=8)
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=dates,
-        y=avg_red_risk,
-        mode='lines+markers',
-        name='Rischio Rosso',
-        line=dict(color='#FF6B6B', width=3),
-        marker=dict(size=8)
-    ))
+    # Trend reale per giornata delle squadre presenti nel DataFrame
+    trend = None
+    if history is not None and not history.is_empty:
+        teams = df['Squadra'].unique() if 'Squadra' in df.columns else None
+        trend = history.team_trend(teams)
+    
+    if trend is None or trend.empty:
+        fig.add_annotation(
+            text="Nessuno storico giornate disponibile",
+            xref='paper', yref='paper', x=0.5, y=0.5,
+            showarrow=False, font=dict(size=16)
+        )
+    else:
+        x_values = trend['Data'] if trend['Data'].notna().all() else trend['Giornata']
+        
+        fig.add_trace(go.Scatter(
+            x=x_values,
+            y=trend['Gialli per 90'],
+            mode='lines+markers',
+            name='Gialli ogni 90\'',
+            line=dict(color='#FFD700', width=3),
+            marker=dict(size=8)
+        ))
+        
+        fig.add_trace(go.Scatter(
+            x=x_values,
+            y=trend['Rossi per 90'],
+            mode='lines+markers',
+            name='Rossi ogni 90\'',
+            line=dict(color='#FF6B6B', width=3),
+            marker=dict(size=8)
+        ))
     
     fig.update_layout(
-        title='📈 Trend Rischio Cartellini nel Tempo',
-        xaxis_title='Data',
-        yaxis_title='Rischio Medio (%)',
+        title='📈 Trend Cartellini per Giornata',
+        xaxis_title='Giornata',
+        yaxis_title='Cartellini ogni 90\' (media)',
         template='plotly_white',
         height=400
     )
@@ -0,0 +1,133 @@
+import os
+import time
+import hashlib
+import logging
+import zipfile
+import threading
+import xml.etree.ElementTree as ET
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+logger = logging.getLogger(__name__)
+
+
+def workbook_sheet_hashes(path):
+    """
+    Hash del contenuto XML di ogni foglio di un .xlsx, senza leggere le celle.
+    Restituisce ({nome_foglio: hash}, hash_shared_strings).
+    """
+    with zipfile.ZipFile(path) as zf:
+        workbook = ET.fromstring(zf.read('xl/workbook.xml'))
+        rels = ET.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+        targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(f'{PKG_REL_NS}Relationship')}
+
+        hashes = {}
+        for sheet in workbook.iter(f'{MAIN_NS}sheet'):
+            target = targets.get(sheet.get(f'{REL_NS}id'), '')
+            member = target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+            hashes[sheet.get('name')] = hashlib.sha1(zf.read(member)).hexdigest()
+
+        names = set(zf.namelist())
+        shared = hashlib.sha1(zf.read('xl/sharedStrings.xml')).hexdigest() if 'xl/sharedStrings.xml' in names else ''
+
+    return hashes, shared
+
+
+def file_signature(path):
+    """Firma economica del file (mtime, dimensione) per il polling."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class WorkbookWatcher:
+    """
+    Osserva il workbook e segnala quali fogli sono cambiati.
+    Il controllo è un semplice os.stat; gli hash XML dei fogli si calcolano
+    solo quando mtime o dimensione cambiano.
+    """
+
+    def __init__(self, path, signature=None, sheet_hashes=None, shared_hash=None):
+        self.path = path
+        self.signature = signature
+        self.sheet_hashes = dict(sheet_hashes or {})
+        self.shared_hash = shared_hash
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None # (timestamp, messaggio) dell'ultimo aggiornamento fallito, None se riuscito
+
+    @classmethod
+    def from_file(cls, path):
+        """Watcher inizializzato con lo stato corrente del file."""
+        signature = file_signature(path)
+        sheet_hashes, shared_hash = workbook_sheet_hashes(path)
+        return cls(path, signature, sheet_hashes, shared_hash)
+
+    def _check(self):
+        """Confronta il file con lo stato noto; restituisce (changed, removed, nuovo_stato) o None."""
+        try:
+            signature = file_signature(self.path)
+        except OSError:
+            return None
+        if signature == self.signature:
+            return None
+
+        try:
+            sheet_hashes, shared_hash = workbook_sheet_hashes(self.path)
+        except (OSError, zipfile.BadZipFile, KeyError, ET.ParseError):
+            # File in scrittura: si riprova al prossimo controllo
+            return None
+
+        if shared_hash != self.shared_hash:
+            changed = set(sheet_hashes)
+        else:
+            changed = {name for name, h in sheet_hashes.items() if self.sheet_hashes.get(name) != h}
+        removed = set(self.sheet_hashes) - set(sheet_hashes)
+        return changed, removed, (signature, sheet_hashes, shared_hash)
+
+    def _commit(self, state):
+        self.signature, self.sheet_hashes, self.shared_hash = state
+
+    def poll(self, on_change=None):
+        """
+        Restituisce None se il file è invariato, altrimenti (fogli_da_rileggere, fogli_rimossi).
+        Se cambiano le stringhe condivise tutti i fogli vanno riletti: il confronto
+        del contenuto effettivo è demandato al chiamante. Con `on_change` lo stato
+        viene aggiornato solo se la callback termina senza errori.
+        """
+        with self._lock:
+            result = self._check()
+            if result is None:
+                return None
+
+            changed, removed, state = result
+            if (changed or removed) and on_change is not None:
+                on_change(changed, removed)
+            self._commit(state)
+            return (changed, removed) if changed or removed else None
+
+    def start(self, on_change, interval=2.0):
+        """Avvia il polling in un thread di background; `on_change(changed, removed)` ad ogni modifica."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def _run():
+            while not self._stop.wait(interval):
+                try:
+                    if self.poll(on_change) is not None:
+                        self.last_error = None
+                except Exception as e:
+                    # Il watcher continua (si riprova al giro successivo), ma l'errore resta visibile;
+                    # lo stesso errore ripetuto a ogni controllo viene registrato una volta sola
+                    message = f"{type(e).__name__}: {e}"
+                    if self.last_error is None or self.last_error[1] != message:
+                        logger.exception("Aggiornamento del workbook '%s' non riuscito", self.path)
+                    self.last_error = (time.time(), message)
+
+        self._thread = threading.Thread(target=_run, name='workbook-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()